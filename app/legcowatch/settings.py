@@ -152,5 +152,25 @@ SCRAPY_FILES_PATH = './legco-data/files'
 #SCRAPY_FILES_PATH = '/legco-data/files'
 #SCRAPY_FILES_PATH = '/home/long/Desktop/legco-watch/files'
 
+# Where the parsed Hansards, agendas and questions are cached.  Set to None to disable the cache
+PARSE_CACHE_PATH = './legco-data/parse-cache'
+
+# Where DOC and DOCX files converted to html are cached, and the most space the cache may use, in bytes
+CONVERSION_CACHE_PATH = './legco-data/conversion-cache'
+CONVERSION_CACHE_MAX_SIZE = 2 * 1024 ** 3
+
+# Number of processes that parse question files to find missing askers after questions are processed
+ASKER_FIX_WORKERS = 1
+
+# Number of processes that merge the parts of hansards
+HANSARD_MERGE_WORKERS = 4
+
+# Save the intermediate html trees of parsed documents, gzipped, for debugging the parsers
+DEBUG_ARTIFACTS = False
+DEBUG_ARTIFACTS_PATH = './legco-data/debug-artifacts'
+
+# Record the time each stage and section of the document parsers takes, see raw.docs.profiling
+PARSER_PROFILING = False
+
 # Import settings local to this machine
 from .local import *
@@ -0,0 +1,23 @@
+"""
+Micro-benchmarks for the hot paths of the raw app.  Run from the app directory, e.g.
+
+python -m raw.benchmarks.names
+"""
+from contextlib import contextmanager
+
+
+@contextmanager
+def test_database():
+    """
+    Runs the block on a throwaway test database
+    """
+    # Let syncdb create the tables from the models, as the test runner does with SOUTH_TESTS_MIGRATE off
+    from django.db import connection
+    from south.management.commands import patch_for_test_db_setup
+    patch_for_test_db_setup()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
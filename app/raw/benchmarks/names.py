@@ -0,0 +1,131 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of NameMatcher against the previous implementation, which bucketed names by the first letter
+of the last name and compared against every name in the bucket
+
+python -m raw.benchmarks.names [repeat]
+"""
+import sys
+import timeit
+from raw.names import MemberName, NameMatcher, parse_name
+
+
+# The names used in raw/tests/test_names.py
+TEST_NAMES = [
+    u'Jasper Tsang', u'Hon Jasper TSANG Yok-sing, GBS, JP', u'Tsang Yok-sing', u'Jasper TSANG Yok-sing, GBS, JP',
+    u'Hon Jasper TSANG Yok-sing, JS', u'Mr Jasper TSANG Yok-sing', u'Tsang, Jasper', u'曾鈺成', u'曾鈺成議員',
+    u'潘兆平', u'WEI Yuk', u'梁劉柔芬', u'J. R. YOUNG', u'Alfred Gascoyne WISE', u'Anthony Henry Reginald COOMBES',
+    u'Julius C. POWER', u'Mary WONG  Wing-cheung', u'Charles William Robert ST. JOHN', u'Percy Selwyn SELWYN-CLARKE',
+    u'George William DES VOEUX', u"Edward Loughlin O'MALLEY", u'Richard Graves MacDONNELL', u'Dr Hon KWOK Ka-ki',
+    u'Ir Dr Hon LO Wai-kwok', u'Chi-wai Wu', u'Christopher WONG Kim-kam', u'Youde Edward',
+]
+
+# A Legislative Council sized member list, built from common surnames so the first letter buckets are crowded
+SURNAMES = [(u'Wong', u'黃'), (u'Chan', u'陳'), (u'Leung', u'梁'), (u'Cheung', u'張'), (u'Lau', u'劉'),
+            (u'Lee', u'李'), (u'Ho', u'何'), (u'Wu', u'胡'), (u'Tsang', u'曾'), (u'Kwok', u'郭')]
+GIVEN = [(u'Kwok-hing', u'國興'), (u'Wai-kwok', u'偉國'), (u'Ka-ki', u'家麒'), (u'Yok-sing', u'鈺成'),
+         (u'Chi-wai', u'志偉'), (u'Kin-por', u'健波'), (u'Siu-hung', u'兆雄')]
+ENGLISH = [u'Jasper', u'Emily', u'Alan', u'James', u'Michael', u'Claudia', u'Albert']
+
+
+def get_members():
+    members_e = []
+    members_c = []
+    for i, (surname, surname_c) in enumerate(SURNAMES):
+        for j, (given, given_c) in enumerate(GIVEN):
+            english = ENGLISH[(i + j) % len(ENGLISH)]
+            members_e.append((MemberName(last_name=surname, english_name=english, chinese_name=given), (i, j)))
+            members_c.append((MemberName(u'{}{}'.format(surname_c, given_c)), (i, j)))
+    return members_e, members_c
+
+
+def get_queries():
+    queries = list(TEST_NAMES)
+    for i, (surname, surname_c) in enumerate(SURNAMES):
+        for j, (given, given_c) in enumerate(GIVEN):
+            english = ENGLISH[(i + j) % len(ENGLISH)]
+            queries.append(u'Hon {} {} {}, JP'.format(english, surname.upper(), given))
+            queries.append(u'{} {}'.format(surname, given))
+            queries.append(u'{}{}議員'.format(surname_c, given_c))
+    return queries
+
+
+class BucketNameMatcher(object):
+    """
+    The previous NameMatcher, kept as the reference for benchmarks and equivalence tests
+    """
+    def __init__(self, names):
+        self._index = {}
+        for n in names:
+            if isinstance(n, MemberName):
+                name_obj = n
+            else:
+                name_obj = n[0]
+            if not name_obj.is_valid():
+                continue
+            first_letter = name_obj.last_name[0].lower()
+            if self._index.get(first_letter, None) is None:
+                self._index[first_letter] = []
+            self._index[first_letter].append(n)
+
+    def match(self, name):
+        if not name.is_valid():
+            return None
+        first_letter = name.last_name[0].lower()
+        if self._index.get(first_letter, None) is None:
+            return None
+        for n in self._index[first_letter]:
+            if isinstance(n, MemberName):
+                if n == name:
+                    return n
+            else:
+                if n[0] == name:
+                    return n
+        return None
+
+
+def run(repeat=20):
+    members_e, members_c = get_members()
+    queries = get_queries()
+    old = [BucketNameMatcher(members_e), BucketNameMatcher(members_c)]
+    new = [NameMatcher(members_e), NameMatcher(members_c)]
+
+    # Check that both give the same answers before timing them
+    for q in queries:
+        for old_matcher, new_matcher in zip(old, new):
+            assert old_matcher.match(MemberName(q)) is new_matcher.match(parse_name(q)), q
+
+    def run_old():
+        for q in queries:
+            name = MemberName(q)
+            for matcher in old:
+                matcher.match(name)
+
+    def run_new_uncached():
+        for q in queries:
+            name = MemberName(q)
+            for matcher in new:
+                matcher.match(name)
+
+    def run_new():
+        for q in queries:
+            for matcher in new:
+                matcher.match_string(q)
+
+    print u'{} members, {} queries, best of {} runs'.format(len(members_e), len(queries), repeat)
+    results = [
+        ('bucket scan + MemberName()', run_old),
+        ('hash index + MemberName()', run_new_uncached),
+        ('hash index + match_string()', run_new),
+    ]
+    baseline = None
+    for label, func in results:
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        if baseline is None:
+            baseline = best
+        print u'{:<30} {:8.2f} ms  {:5.1f}x'.format(label, best * 1000, baseline / best)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
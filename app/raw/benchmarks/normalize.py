@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the single pass normalization in raw.docs.normalize against the chains of re.sub and replace
+that the parsers' _load methods used before.  The sources are made up of the html fixtures, repeated up to
+the size of a large merged hansard
+
+python -m raw.benchmarks.normalize [megabytes] [repeat]
+"""
+import glob
+import os
+import re
+import sys
+import timeit
+from raw.docs import normalize
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'fixtures', '*.html')
+
+
+def legacy_normalize_text(source):
+    """
+    The previous normalization of CouncilHansard._load and CouncilAgenda._load, kept as the reference
+    for benchmarks and equivalence tests
+    """
+    double_quotes = ur'[\u201c\u201d]'
+    source = re.sub(double_quotes, u'"', source)
+    single_quotes = ur'[\u2019\u2018]'
+    source = re.sub(single_quotes, u"'", source)
+    source = source.replace(u'\uff1a', u':')
+    source = source.replace(u'\n', u'')
+    source = source.replace(u'\t', u'')
+    zero_width_joiners = u'\u200d'
+    source = source.replace(zero_width_joiners, u'')
+    return source
+
+
+def legacy_decode_question(htm):
+    """
+    The previous cleanup and decoding in CouncilQuestion._load
+    """
+    list_undesired = [{'\x83\xdc': ''}, {'\x84P': ''}, {'\x84h': ''}]
+    for item in list_undesired:
+        htm = htm.replace(item.keys()[0], item.values()[0])
+    return htm.decode('hkscs', errors='ignore')
+
+
+def get_sources(megabytes):
+    text = u''
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path, 'rb') as f:
+            text += f.read().decode('utf-8')
+    # Make sure every mapped character shows up
+    text += u''.join(normalize.CHARACTER_MAP.keys())
+    source = text * max(1, int(megabytes * 1024 * 1024 / len(text.encode('utf-8'))))
+    question = source.encode('hkscs', 'ignore') + '\x83\xdc\x84P\x84h'
+    return source, question
+
+
+def run(megabytes=8, repeat=5):
+    source, question = get_sources(megabytes)
+    assert normalize.normalize_text(source) == legacy_normalize_text(source)
+    assert normalize.decode_question(question) == legacy_decode_question(question)
+    print u'{:.1f} MB of text, best of {} runs'.format(len(source.encode('utf-8')) / 1024.0 ** 2, repeat)
+    cases = [
+        (u'hansard/agenda text', lambda: legacy_normalize_text(source), lambda: normalize.normalize_text(source)),
+        (u'question page', lambda: legacy_decode_question(question), lambda: normalize.decode_question(question)),
+    ]
+    print u'{:<22} {:>12} {:>12} {:>7}'.format(u'', u'before', u'after', u'')
+    for label, before, after in cases:
+        t_before = min(timeit.repeat(before, number=1, repeat=repeat))
+        t_after = min(timeit.repeat(after, number=1, repeat=repeat))
+        print u'{:<22} {:9.2f} ms {:9.2f} ms {:6.2f}x'.format(label, t_before * 1000, t_after * 1000, t_before / t_after)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:3]
+    run(*([float(args[0])] if args else []) + [int(xx) for xx in args[1:]])
@@ -0,0 +1,238 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the document parsers over the html fixtures in raw/tests/fixtures, and optionally a local corpus
+directory.  Runs CouncilHansard, CouncilAgenda and CouncilQuestion over every document, and reports the documents
+parsed per second, the median and 95th percentile time per document, and the peak RSS of the process.
+
+The kind of a document is told from its file name, which is its uid: council_agenda-*, council_hansard-*
+or question-*, with an .html or .htm extension.  Hansards and agendas are the html converted from their
+DOC or DOCX files, and questions are the reply pages as downloaded.  Hansards look up the questions they mention,
+so the benchmark runs on a throwaway test database, and everything works offline.
+
+With --save, the results are written to a JSON file.  With --baseline, they are compared against a saved
+file, and the benchmark exits with status 1 if any kind got slower, or the peak RSS grew, by more than
+--threshold (a fraction, 0.2 by default), if more documents failed to parse, or if a kind in the
+baseline has no results.
+
+With --profile, the parsers are profiled, see raw.docs.profiling, and the slowest stages and sections
+are listed as well.  Profiling slows the parsers down, so don't compare those timings against a baseline
+taken without it.
+
+DJANGO_SETTINGS_MODULE=legcowatch.settings python -m raw.benchmarks.parsers [--corpus DIR] [--repeat N] \\
+    [--save FILE] [--baseline FILE] [--threshold 0.2] [--profile]
+"""
+from collections import OrderedDict
+import json
+import logging
+import math
+from optparse import OptionParser
+import os
+import resource
+import sys
+import time
+from raw.benchmarks import test_database
+from raw.models.constants import LANG_CN, LANG_EN
+from raw.docs.agenda import CouncilAgenda
+from raw.docs.hansard import CouncilHansard
+from raw.docs.question import CouncilQuestion
+from raw.docs import profiling
+
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'fixtures')
+EXTENSIONS = ('.html', '.htm')
+KINDS = OrderedDict((
+    ('council_hansard', 'hansard'),
+    ('council_agenda', 'agenda'),
+    ('question', 'question'),
+))
+
+
+def get_kind(filename):
+    prefix = os.path.basename(filename).split('-', 1)[0]
+    return KINDS.get(prefix, None)
+
+
+def find_documents(dirs):
+    """
+    Returns a list of (kind, uid, path) of the documents in the directories, and their subdirectories
+    """
+    res = []
+    for dirname in dirs:
+        for root, subdirs, files in os.walk(dirname):
+            subdirs.sort()
+            for name in sorted(files):
+                uid, ext = os.path.splitext(name)
+                kind = get_kind(name)
+                if ext.lower() in EXTENSIONS and kind is not None:
+                    res.append((kind, uid, os.path.join(root, name)))
+    return res
+
+
+def build_parser(kind, uid, src, **kwargs):
+    """
+    Parses the source of a document the way its raw model would.  kwargs are passed on to the parser
+    """
+    if kind == 'agenda':
+        return CouncilAgenda(uid, src.decode('utf-8'), **kwargs)
+    if kind == 'hansard':
+        # council_hansard-20140709-e, with the date in the same form as RawCouncilHansard.raw_date
+        lang = LANG_CN if uid.endswith(u'c') else LANG_EN
+        return CouncilHansard(uid, lang, src.decode('utf-8'), uid.split('-')[1], **kwargs)
+    # Questions decode their own source
+    return CouncilQuestion(uid, None, False, False, src, None, None, **kwargs)
+
+
+def percentile(values, fraction):
+    # Nearest rank percentile of a non empty list
+    values = sorted(values)
+    return values[max(0, int(math.ceil(fraction * len(values))) - 1)]
+
+
+def peak_rss_kb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(documents, repeat=3, profiles=None):
+    """
+    Parses each document repeat times, and keeps its best time.  Returns the results as a dict of kind ->
+    {'documents', 'failed', 'docs_per_sec', 'p50_ms', 'p95_ms'}, and the 'peak_rss_kb' of the process.
+    documents counts the documents that were parsed.  There is an entry for every kind that had documents,
+    with the timings set to None if none of them could be parsed.  If profiles is a list, the parsers are
+    profiled, and the profile of the best run of each document is added to it
+    """
+    timings = OrderedDict((kind, []) for kind in KINDS.values())
+    failed = dict((kind, 0) for kind in KINDS.values())
+    found = set(xx[0] for xx in documents)
+    for kind, uid, path in documents:
+        with open(path, 'rb') as f:
+            src = f.read()
+        best = None
+        best_profile = None
+        for i in range(repeat):
+            start = time.time()
+            try:
+                parser = build_parser(kind, uid, src, profile=profiles is not None)
+            except Exception:
+                failed[kind] += 1
+                break
+            seconds = time.time() - start
+            if best is None or seconds < best:
+                best = seconds
+                best_profile = parser.profile
+        if best is not None:
+            timings[kind].append(best)
+            if profiles is not None:
+                profiles.append(best_profile.to_dict())
+    res = OrderedDict()
+    for kind, values in timings.items():
+        if kind not in found:
+            continue
+        res[kind] = OrderedDict((
+            ('documents', len(values)),
+            ('failed', failed[kind]),
+            ('docs_per_sec', (len(values) / sum(values) if sum(values) else 0.0) if values else None),
+            ('p50_ms', percentile(values, 0.5) * 1000 if values else None),
+            ('p95_ms', percentile(values, 0.95) * 1000 if values else None),
+        ))
+    res['peak_rss_kb'] = peak_rss_kb()
+    return res
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Returns a list of messages, one for each measure that regressed by more than threshold against the baseline,
+    and for each kind in the baseline that has no results.  Kinds that are only in the results are not compared
+    """
+    regressions = []
+
+    def check(label, now, before, higher_is_worse=True):
+        # Kinds with no parsed documents have no timings, and are caught by the failed count
+        if not before or now is None:
+            return
+        change = (now - before) / float(before)
+        if not higher_is_worse:
+            change = -change
+        if change > threshold:
+            regressions.append(u'{}: {:.2f} against {:.2f} in the baseline ({:+.0%})'.format(
+                label, now, before, change if higher_is_worse else -change))
+
+    for kind in KINDS.values():
+        if kind not in baseline:
+            continue
+        if kind not in results:
+            regressions.append(u'{}: no results, against {} documents in the baseline'.format(
+                kind, baseline[kind]['documents']))
+            continue
+        check(u'{} documents per second'.format(kind), results[kind]['docs_per_sec'],
+              baseline[kind]['docs_per_sec'], higher_is_worse=False)
+        check(u'{} median ms'.format(kind), results[kind]['p50_ms'], baseline[kind]['p50_ms'])
+        check(u'{} 95th percentile ms'.format(kind), results[kind]['p95_ms'], baseline[kind]['p95_ms'])
+        if results[kind]['failed'] > baseline[kind]['failed']:
+            regressions.append(u'{}: {} documents failed to parse, against {} in the baseline'.format(
+                kind, results[kind]['failed'], baseline[kind]['failed']))
+    check(u'peak RSS kB', results['peak_rss_kb'], baseline.get('peak_rss_kb', None))
+    return regressions
+
+
+def report(results):
+    print u'{:<10} {:>6} {:>7} {:>10} {:>10} {:>10}'.format(u'', u'docs', u'failed', u'docs/sec', u'p50 ms', u'p95 ms')
+    for kind, entry in results.items():
+        if kind == 'peak_rss_kb':
+            continue
+        if entry['p50_ms'] is None:
+            print u'{:<10} {:6d} {:7d} {:>10} {:>10} {:>10}'.format(kind, entry['documents'], entry['failed'], u'-', u'-', u'-')
+            continue
+        print u'{:<10} {:6d} {:7d} {:10.2f} {:10.2f} {:10.2f}'.format(
+            kind, entry['documents'], entry['failed'], entry['docs_per_sec'], entry['p50_ms'], entry['p95_ms'])
+    print u'peak RSS {} kB'.format(results['peak_rss_kb'])
+
+
+def report_profiles(profiles, top=10):
+    totals = profiling.aggregate(profiles, top)
+    for group in (profiling.STAGE, profiling.SECTION):
+        print u'\nSlowest {}'.format(group)
+        for parser, name, entry in totals[group][:top]:
+            print u'{:10.2f} ms  {}.{}'.format(entry['seconds'] * 1000, parser, name)
+
+
+def main(argv):
+    opts = OptionParser(usage='python -m raw.benchmarks.parsers [options]')
+    opts.add_option('--corpus', action='append', default=[], help='Another directory of documents')
+    opts.add_option('--repeat', type='int', default=3, help='Parse each document this many times and keep the best')
+    opts.add_option('--save', default=None, help='Write the results to this JSON file')
+    opts.add_option('--baseline', default=None, help='Compare against the results saved in this JSON file')
+    opts.add_option('--threshold', type='float', default=0.2, help='Largest slowdown allowed against the baseline')
+    opts.add_option('--profile', action='store_true', default=False,
+                    help='Profile the parsers, and list their slowest stages and sections')
+    options, args = opts.parse_args(argv)
+    documents = find_documents([FIXTURES_PATH] + options.corpus)
+    if not documents:
+        opts.error(u'No documents found')
+
+    logging.disable(logging.CRITICAL)
+    profiles = [] if options.profile else None
+    with test_database():
+        results = run(documents, options.repeat, profiles)
+
+    print u'{} documents, best of {} runs'.format(len(documents), options.repeat)
+    report(results)
+    if profiles is not None:
+        report_profiles(profiles)
+    if options.save is not None:
+        with open(options.save, 'wb') as f:
+            json.dump(results, f, indent=2)
+    if options.baseline is not None:
+        with open(options.baseline, 'rb') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, options.threshold)
+        for message in regressions:
+            print u'REGRESSION {}'.format(message)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the lightweight sanitizer in raw.docs.sanitize against lxml's Cleaner, over the same documents
+as raw.benchmarks.parsers.  For each document, times loading the html, and parsing the whole document, with
+each method, and checks that both give the same tree and the same parse results.  Exits with status 1 if any
+document comes out differently
+
+DJANGO_SETTINGS_MODULE=legcowatch.settings python -m raw.benchmarks.sanitize [--corpus DIR] [--repeat N]
+"""
+import cPickle as pickle
+import logging
+from optparse import OptionParser
+import sys
+import timeit
+from lxml import etree
+from raw.benchmarks import test_database
+from raw.benchmarks.parsers import FIXTURES_PATH, build_parser, find_documents
+from raw.docs import cache, normalize, sanitize
+from raw.utils import to_string
+
+
+METHODS = (sanitize.CLEANER, sanitize.LIGHTWEIGHT)
+
+
+def get_html(kind, src):
+    # The html as the parser's _load hands it to the sanitizer, and whether it keeps all attributes
+    if kind == 'question':
+        return normalize.decode_question(src), True
+    return to_string(normalize.normalize_text(src.decode('utf-8'))), kind != 'hansard'
+
+
+def get_result(parser):
+    # What the parse cache would keep of a parser, which is everything the rest of the app uses
+    try:
+        return pickle.dumps(cache.freeze(parser), pickle.HIGHEST_PROTOCOL)
+    except cache.UncacheableValue:
+        return None
+
+
+def run(documents, repeat=3):
+    """
+    Returns a list of (kind, uid, {method: (load seconds, parse seconds)}, identical)
+    """
+    res = []
+    for kind, uid, path in documents:
+        with open(path, 'rb') as f:
+            src = f.read()
+        html, safe_attrs_only = get_html(kind, src)
+        timings = {}
+        trees = {}
+        results = {}
+        for method in METHODS:
+            load = lambda: sanitize.load_html(html, method, safe_attrs_only)
+            trees[method] = etree.tostring(load(), encoding='utf-8')
+            t_load = min(timeit.repeat(load, number=1, repeat=repeat))
+            try:
+                results[method] = get_result(build_parser(kind, uid, src, sanitizer=method))
+                t_parse = min(timeit.repeat(lambda: build_parser(kind, uid, src, sanitizer=method),
+                                            number=1, repeat=repeat))
+            except Exception as e:
+                results[method] = repr(e)
+                t_parse = None
+            timings[method] = (t_load, t_parse)
+        identical = len(set(trees.values())) == 1 and len(set(results.values())) == 1
+        res.append((kind, uid, timings, identical))
+    return res
+
+
+def report(rows):
+    print u'{:<36} {:>22} {:>22} {:>10}'.format(u'', u'load (Cleaner/light)', u'parse (Cleaner/light)', u'')
+    totals = dict((method, [0.0, 0.0]) for method in METHODS)
+    for kind, uid, timings, identical in rows:
+        (cl_load, cl_parse), (lw_load, lw_parse) = [timings[xx] for xx in METHODS]
+        for method in METHODS:
+            totals[method][0] += timings[method][0]
+            totals[method][1] += timings[method][1] or 0.0
+        parse = u'{:9.1f} {:9.1f} ms'.format(cl_parse * 1000, lw_parse * 1000) if cl_parse and lw_parse else u'failed'
+        print u'{:<36} {:9.1f} {:9.1f} ms {:>22} {:>10}'.format(
+            uid, cl_load * 1000, lw_load * 1000, parse, u'same' if identical else u'DIFFERENT')
+    (cl_load, cl_parse), (lw_load, lw_parse) = [totals[xx] for xx in METHODS]
+    print u'load {:.2f}x faster, whole parse {:.2f}x faster'.format(
+        cl_load / lw_load, cl_parse / lw_parse if lw_parse else 0.0)
+
+
+def main(argv):
+    opts = OptionParser(usage='python -m raw.benchmarks.sanitize [options]')
+    opts.add_option('--corpus', action='append', default=[], help='Another directory of documents')
+    opts.add_option('--repeat', type='int', default=3, help='Time each document this many times and keep the best')
+    options, args = opts.parse_args(argv)
+    documents = find_documents([FIXTURES_PATH] + options.corpus)
+    if not documents:
+        opts.error(u'No documents found')
+    logging.disable(logging.CRITICAL)
+    with test_database():
+        rows = run(documents, options.repeat)
+    print u'{} documents, best of {} runs'.format(len(rows), options.repeat)
+    report(rows)
+    if not all(xx[3] for xx in rows):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the lookups that the uid, language and Override indexes are for.  Seeds a throwaway test
+database, times the lookups and counts their queries with the indexes, then drops the indexes and times
+them again.  Without the indexes, the language filter is the old uid__endswith filter
+
+DJANGO_SETTINGS_MODULE=legcowatch.settings python -m raw.benchmarks.uid_lookups [questions] [repeat]
+"""
+import re
+import sys
+import timeit
+from django.core.management.color import no_style
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from raw.benchmarks import test_database
+from raw.models.constants import LANG_CN, LANG_EN
+from raw.models import RawCouncilQuestion, Override
+
+
+INDEX_NAME_RE = re.compile(r'CREATE INDEX "?(\w+)"?')
+
+
+def get_index_names():
+    """
+    The names Django gave the indexes being benchmarked, as (table, name)
+    """
+    creation = connection.creation
+    style = no_style()
+    statements = []
+    for field_name in ('uid', 'language'):
+        field = RawCouncilQuestion._meta.get_field(field_name)
+        statements += creation.sql_indexes_for_field(RawCouncilQuestion, field, style)
+    fields = [Override._meta.get_field(xx) for xx in ('ref_model', 'ref_uid')]
+    statements += creation.sql_indexes_for_fields(Override, fields, style)
+    res = []
+    for sql in statements:
+        table = RawCouncilQuestion._meta.db_table if 'question' in sql else Override._meta.db_table
+        res.append((table, INDEX_NAME_RE.match(sql).group(1)))
+    return res
+
+
+def drop_indexes():
+    cursor = connection.cursor()
+    for table, name in get_index_names():
+        cursor.execute(u'DROP INDEX {}'.format(connection.ops.quote_name(name)))
+
+
+def seed(questions):
+    objs = []
+    overrides = []
+    for i in range(questions):
+        for suffix, lang in ((u'e', LANG_EN), (u'c', LANG_CN)):
+            uid = u'question-{}.{}.2014-{}{}'.format(i % 28 + 1, i % 12 + 1, i, suffix)
+            objs.append(RawCouncilQuestion(uid=uid, language=lang, raw_date=u'1.1.2014'))
+        if i % 10 == 0:
+            overrides.append(Override(ref_model=u'rawcouncilquestion', ref_uid=objs[-1].uid))
+    RawCouncilQuestion.objects.bulk_create(objs, batch_size=500)
+    Override.objects.bulk_create(overrides, batch_size=500)
+    return objs, overrides
+
+
+def get_cases(objs, indexed):
+    lookups = objs[::max(1, len(objs) // 200)]
+    references = [xx for xx in objs if xx.uid.endswith(u'c')][::max(1, len(objs) // 400)]
+
+    def by_uid():
+        for obj in lookups:
+            RawCouncilQuestion.objects.get_by_uid(obj.uid)
+
+    def english():
+        if indexed:
+            list(RawCouncilQuestion.objects.filter(language=LANG_EN).values_list('id', flat=True))
+        else:
+            list(RawCouncilQuestion.objects.filter(uid__endswith=u'e').values_list('id', flat=True))
+
+    def overrides():
+        for obj in references:
+            Override.objects.get_from_reference(obj)
+
+    return [
+        ('get_by_uid x{}'.format(len(lookups)), by_uid),
+        ('English questions', english),
+        ('get_from_reference x{}'.format(len(references)), overrides),
+    ]
+
+
+def measure(cases, repeat):
+    res = []
+    for label, func in cases:
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        res.append((label, len(ctx.captured_queries), best))
+    return res
+
+
+def run(questions=20000, repeat=5):
+    with test_database():
+        objs, overrides = seed(questions)
+        print u'{} questions, {} overrides, best of {} runs'.format(len(objs), len(overrides), repeat)
+        after = measure(get_cases(objs, True), repeat)
+        drop_indexes()
+        before = measure(get_cases(objs, False), repeat)
+        print u'{:<28} {:>18} {:>18} {:>7}'.format(u'', u'no index', u'indexed', u'')
+        for (label, queries_before, t_before), (_, queries_after, t_after) in zip(before, after):
+            print u'{:<28} {:8.2f} ms {:3d} q {:8.2f} ms {:3d} q {:6.1f}x'.format(
+                label, t_before * 1000, queries_before, t_after * 1000, queries_after, t_before / t_after)
+        # Override.ref_uid is unique, so it has an index of its own either way
+
+
+if __name__ == '__main__':
+    run(*[int(xx) for xx in sys.argv[1:3]])
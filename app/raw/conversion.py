@@ -0,0 +1,338 @@
+"""
+Cache of DOC and DOCX files converted to html
+
+Converting a document is the slowest step of getting a parser for it.  DOC files are run through
+abiword, and DOCX files through PyDocX.  The html is kept in CONVERSION_CACHE_PATH, keyed on a hash
+of the contents of the source file and the version of the converter, so copies of a file share an
+entry and a moved file doesn't need converting again.  Entries are written to a temporary file and
+renamed into place, so several processes can fill the cache at once.
+
+The cache is capped at CONVERSION_CACHE_MAX_SIZE bytes.  Reading an entry touches its mtime,
+and once the cap is passed the entries that were used least recently are deleted first.
+
+convert_batch() warms the cache for a list of files on a process pool.  DOC files are sent to
+abiword in chunks, so that one abiword process converts many files instead of starting once per file.
+"""
+import hashlib
+from itertools import groupby
+import logging
+from multiprocessing import Pool
+import os
+import shutil
+import subprocess
+import tempfile
+from django.conf import settings
+from pydocx import PyDocX
+import pydocx
+from raw.docs.cache import file_hash
+from raw.files import atomic_file
+
+
+logger = logging.getLogger('legcowatch')
+
+KIND_DOC = 'doc'
+KIND_DOCX = 'docx'
+
+# Bump this whenever the layout of the cache entries changes
+CACHE_FORMAT = 1
+
+# Entries are evicted until the cache is this fraction of the cap, so that eviction doesn't run on every write
+EVICT_TO = 0.9
+
+# kind -> version string of its converter
+_converter_versions = {}
+
+
+class ConversionError(Exception):
+    """
+    Raised when a converter fails on a file
+    """
+    pass
+
+
+def abiword_version():
+    try:
+        return subprocess.check_output(['abiword', '--version']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return u'unknown'
+
+
+def converter_version(kind):
+    version = _converter_versions.get(kind, None)
+    if version is None:
+        if kind == KIND_DOC:
+            version = abiword_version()
+        else:
+            version = pydocx.__version__
+        _converter_versions[kind] = version
+    return version
+
+
+def abiword_to_html(filepath):
+    """
+    Converts a doc file with abiword.  Returns a unicode string
+    """
+    cmd = ['abiword', '--to=html', '--to-name=fd://1', filepath]
+    try:
+        res = subprocess.check_output(cmd)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise ConversionError(u'abiword failed on {}: {}'.format(filepath, e))
+    return res.decode('utf-8')
+
+
+def pydocx_to_html(filepath):
+    """
+    Converts a docx file with PyDocX.  Returns a unicode string
+    """
+    try:
+        return PyDocX.to_html(filepath)
+    except Exception as e:
+        # PyDocX raises all sorts of things on malformed files
+        raise ConversionError(u'PyDocX failed on {}: {}'.format(filepath, e))
+
+
+CONVERTERS = {
+    KIND_DOC: abiword_to_html,
+    KIND_DOCX: pydocx_to_html,
+}
+
+
+class ConversionCache(object):
+    """
+    Directory of converted html files, with a size cap
+    """
+    def __init__(self, path, max_size=None):
+        self.path = path
+        self.max_size = max_size
+        # Bytes in the cache as far as this process knows.  None until the directory is first scanned
+        self._size = None
+
+    def key(self, kind, filepath):
+        h = hashlib.sha1()
+        for part in (CACHE_FORMAT, kind, converter_version(kind), file_hash(filepath)):
+            h.update(repr(part))
+            h.update('\0')
+        return h.hexdigest()
+
+    def entry_path(self, kind, key):
+        return os.path.join(self.path, kind, key[:2], u'{}.html'.format(key))
+
+    def get(self, kind, key):
+        """
+        Returns the cached html, or None
+        """
+        path = self.entry_path(kind, key)
+        try:
+            with open(path, 'rb') as f:
+                res = f.read()
+        except IOError:
+            return None
+        try:
+            # Mark as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return res.decode('utf-8')
+
+    def has(self, kind, key):
+        return os.path.exists(self.entry_path(kind, key))
+
+    def put(self, kind, key, html):
+        path = self.entry_path(kind, key)
+        data = html.encode('utf-8')
+        try:
+            with atomic_file(path) as f:
+                f.write(data)
+        except (IOError, OSError) as e:
+            logger.warn(u'Could not write conversion cache entry {}: {}'.format(path, e))
+            return
+        if self.max_size is not None:
+            if self._size is None:
+                self._size = self.scan()[0]
+            else:
+                self._size += len(data)
+            if self._size > self.max_size:
+                self.evict()
+
+    def scan(self):
+        """
+        Returns the total size of the cache, and a list of (mtime, size, path) of its entries
+        """
+        total = 0
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                total += st.st_size
+                entries.append((st.st_mtime, st.st_size, path))
+        return total, entries
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache is under EVICT_TO of its cap
+        """
+        total, entries = self.scan()
+        target = self.max_size * EVICT_TO
+        entries.sort()
+        removed = 0
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Another process got to it first
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        logger.info(u'Evicted {} conversion cache entries, {} bytes left'.format(removed, total))
+
+    def convert(self, kind, filepath, overwrite=False):
+        """
+        Returns the html for a file, converting it only if it isn't cached
+        """
+        try:
+            key = self.key(kind, filepath)
+        except (IOError, OSError) as e:
+            raise ConversionError(u'Could not read {}: {}'.format(filepath, e))
+        if not overwrite:
+            res = self.get(kind, key)
+            if res is not None:
+                return res
+        res = CONVERTERS[kind](filepath)
+        self.put(kind, key, res)
+        return res
+
+
+_caches = {}
+
+
+def get_cache():
+    """
+    The ConversionCache for the current settings, or None if the cache is disabled
+    """
+    path = getattr(settings, 'CONVERSION_CACHE_PATH', None)
+    if path is None:
+        return None
+    max_size = getattr(settings, 'CONVERSION_CACHE_MAX_SIZE', None)
+    cache = _caches.get((path, max_size), None)
+    if cache is None:
+        cache = ConversionCache(path, max_size)
+        _caches[(path, max_size)] = cache
+    return cache
+
+
+def convert(kind, filepath, overwrite=False):
+    """
+    Converts a file of the given kind to a unicode html string, through the cache if it is enabled.
+    Raises ConversionError if the file can't be converted
+    """
+    cache = get_cache()
+    if cache is None:
+        return CONVERTERS[kind](filepath)
+    return cache.convert(kind, filepath, overwrite=overwrite)
+
+
+def _convert_docs_with_abiword(cache, filepaths):
+    """
+    Converts a list of doc files with a single abiword process.  Returns the paths that worked
+    """
+    tmpdir = tempfile.mkdtemp()
+    try:
+        # abiword names its output after its input, so give each file a name we can find again
+        for i, filepath in enumerate(filepaths):
+            os.symlink(os.path.abspath(filepath), os.path.join(tmpdir, '{}.doc'.format(i)))
+        cmd = ['abiword', '--to=html'] + ['{}.doc'.format(i) for i in range(len(filepaths))]
+        try:
+            with open(os.devnull, 'wb') as devnull:
+                subprocess.check_call(cmd, cwd=tmpdir, stdout=devnull, stderr=devnull)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warn(u'abiword failed on a batch of {} files: {}'.format(len(filepaths), e))
+        done = []
+        for i, filepath in enumerate(filepaths):
+            try:
+                with open(os.path.join(tmpdir, '{}.html'.format(i)), 'rb') as f:
+                    html = f.read().decode('utf-8')
+            except IOError:
+                continue
+            cache.put(KIND_DOC, cache.key(KIND_DOC, filepath), html)
+            done.append(filepath)
+        return done
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def convert_chunk(args):
+    """
+    Runs in a worker process.  Converts a list of files of one kind into the cache, and returns
+    (number converted, list of paths that failed)
+    """
+    kind, filepaths, overwrite = args
+    cache = get_cache()
+    pending = filepaths
+    converted = 0
+    if kind == KIND_DOC and len(filepaths) > 1:
+        done = _convert_docs_with_abiword(cache, filepaths)
+        converted += len(done)
+        done = set(done)
+        # Whatever the batch missed is tried again one by one, which gives a proper error
+        pending = [xx for xx in filepaths if xx not in done]
+    failed = []
+    for filepath in pending:
+        try:
+            cache.convert(kind, filepath, overwrite=overwrite)
+            converted += 1
+        except ConversionError as e:
+            logger.warn(unicode(e))
+            failed.append(filepath)
+    return converted, failed
+
+
+def convert_batch(files, workers=1, chunk_size=20, overwrite=False):
+    """
+    Converts a list of (kind, filepath) into the cache on a pool of worker processes.
+    Files that are already cached are skipped unless overwrite is True.
+    Returns a dict of counts of the cached, converted and failed files
+    """
+    cache = get_cache()
+    if cache is None:
+        raise ValueError(u'The conversion cache is disabled, set CONVERSION_CACHE_PATH')
+    counts = {'cached': 0, 'converted': 0, 'failed': 0}
+    todo = []
+    for kind, filepath in files:
+        try:
+            if not overwrite and cache.has(kind, cache.key(kind, filepath)):
+                counts['cached'] += 1
+                continue
+        except (IOError, OSError) as e:
+            logger.warn(u'Could not read {}: {}'.format(filepath, e))
+            counts['failed'] += 1
+            continue
+        todo.append((kind, filepath))
+    todo.sort()
+
+    chunks = []
+    for kind, group in groupby(todo, lambda xx: xx[0]):
+        paths = [xx[1] for xx in group]
+        for start in range(0, len(paths), chunk_size):
+            chunks.append((kind, paths[start:start + chunk_size], overwrite))
+    logger.info(u'Converting {} files in {} chunks'.format(len(todo), len(chunks)))
+
+    if workers <= 1:
+        results = [convert_chunk(chunk) for chunk in chunks]
+    else:
+        pool = Pool(workers)
+        try:
+            results = pool.map(convert_chunk, chunks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+    for converted, failed in results:
+        counts['converted'] += converted
+        counts['failed'] += len(failed)
+    return counts
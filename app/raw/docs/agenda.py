@@ -7,14 +7,11 @@ Document wrappers for LegCo Agendas
 
 from collections import OrderedDict
 import logging
-import lxml
-import lxml.html
 from lxml import etree
-from lxml.html.clean import clean_html, Cleaner
 import re
-from lxml.html import HTMLParser
 import itertools
 from raw.utils import to_string, to_unicode, grouper
+from . import normalize, profiling, sanitize
 
 
 logger = logging.getLogger('legcowatch-docs')
@@ -56,6 +53,10 @@ class CouncilAgenda(object):
             ('motions', [u'Motion', u'議案']),
         )
     )
+    # Attributes kept by the parse cache, see raw.docs.cache.
+    # The sections that aren't parsed yet are still lists of elements, so they are left out
+    CACHED_ATTRIBUTES = ('uid', 'english', 'tabled_papers', 'questions', 'question_map', 'bills')
+    SANITIZER = sanitize.LIGHTWEIGHT
 
     def __init__(self, uid, source, *args, **kwargs):
         logger.debug(u'** Parsing agenda {}'.format(uid))
@@ -66,6 +67,8 @@ class CouncilAgenda(object):
             self.english = False
         # Raw html string
         self.source = source
+        # How the html is sanitized, see raw.docs.sanitize
+        self.sanitizer = kwargs.get('sanitizer', self.SANITIZER)
         self.tree = None
         self.tabled_papers = None
         self.questions = None
@@ -76,6 +79,8 @@ class CouncilAgenda(object):
         self.members_motions = None
         self.other = None
         self._headers = []
+        # Timings of each stage and section, or None unless profiling is on, see raw.docs.profiling
+        self.profile = profiling.new_profile(self, kwargs.get('profile', None))
         self._load()
         self._clean()
         self._parse()
@@ -83,35 +88,23 @@ class CouncilAgenda(object):
     def __repr__(self):
         return u'<CouncilAgenda: {}>'.format(self.uid)
 
+    @profiling.profiled()
     def _load(self):
         """
         Load the ElementTree from the source
         """
-        # Convert directional quotation marks to regular quotes
-        double_quotes = ur'[\u201c\u201d]'
-        self.source = re.sub(double_quotes, u'"', self.source)
-        single_quotes = ur'[\u2019\u2018]'
-        self.source = re.sub(single_quotes, u"'", self.source)
-        # Convert colons
-        self.source = self.source.replace(u'\uff1a', u':')
-        # Remove line breaks and tabs
-        self.source = self.source.replace(u'\n', u'')
-        self.source = self.source.replace(u'\t', u'')
-        # There are also some "zero width joiners" in random places in the text
-        # Should remove them here, since they make string search unreliable
-        # these are the codes: &#8205, &#160 (nbsp), \xa0 (nbsp), \u200d
-        zero_width_joiners = u'\u200d'
-        self.source = self.source.replace(zero_width_joiners, u'')
+        # Convert directional quotation marks to regular quotes and full width colons to colons,
+        # and remove line breaks, tabs and zero width joiners, in one pass.  See raw.docs.normalize
+        self.source = normalize.normalize_text(self.source)
         # Also previously had some non breaking spaces in unicode \u00a0, but this
         # may have been fixed by changing the parser below
 
-        # Use the lxml cleaner
-        cleaner = Cleaner()
-        parser = HTMLParser(encoding='utf-8')
         # Finally, load the cleaned string to an ElementTree
-        self.tree = cleaner.clean_html(lxml.html.fromstring(to_string(self.source), parser=parser))
+        self.tree = sanitize.load_html(to_string(self.source), self.sanitizer,
+                                       profiled=self.profile is not None)
         # self.tree = lxml.html.fromstring(to_string(self.source))
 
+    @profiling.profiled()
     def _clean(self):
         """
         Removes some of extraneous tags to make parsing easier
@@ -120,6 +113,7 @@ class CouncilAgenda(object):
         for xx in self.tree.find_class('pydocx-tab'):
             xx.drop_tag()
 
+    @profiling.profiled()
     def _parse(self):
         """
         Parse the source document and populate this object's properties
@@ -163,6 +157,7 @@ class CouncilAgenda(object):
                 getattr(self, "_parse_{}".format(section))()
         # We won't parse others, since we don't know what those are
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_tabled_papers(self):
         """
         Parse elements for tabled papers
@@ -262,12 +257,15 @@ class CouncilAgenda(object):
             parsed_papers.append(parsed)
         return parsed_papers
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_members_bills(self):
         pass
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_members_motions(self):
         pass
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_questions(self):
         """
         Parse question lxml elements into AgendaQuestions.
@@ -323,6 +321,7 @@ class CouncilAgenda(object):
                 else:
                     self.question_map[question.number] = [val, question]
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_bills(self):
         """
 
@@ -368,6 +367,7 @@ class CouncilAgenda(object):
         else:
             self._parse_chinese_bills()
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_chinese_bills(self):
         logger.debug(u"Parsing bills from {} elements".format(len(self.bills)))
         parsed_bills = []
@@ -440,6 +440,7 @@ class CouncilAgenda(object):
 
         self.bills = parsed_bills
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_english_bills(self):
         logger.debug(u"Parsing bills from {} elements".format(len(self.bills)))
         parsed_bills = []
@@ -507,6 +508,7 @@ class CouncilAgenda(object):
                 logger.warning(u'Unknown bills table header: {}'.format(header))
         self.bills = parsed_bills
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_motions(self):
         pass
 
@@ -545,6 +547,8 @@ class AgendaQuestion(object):
     RESPONDER_PATTERN = ur':\s?(.+)$'
     QTYPE_ORAL = 1
     QTYPE_WRITTEN = 2
+    # Everything but the source elements is kept by the parse cache
+    CACHED_ATTRIBUTES = ('number', 'asker', 'type', 'replier', 'body')
 
     def __init__(self, elements, english=True):
         self._elements = elements
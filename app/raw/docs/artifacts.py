@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Debug artifacts of the document parsers
+
+Parsers can save intermediate states of a document, such as the cleaned lxml tree of a Hansard,
+for inspection in a browser.  This is off unless the DEBUG_ARTIFACTS setting is True, or the
+parser is asked for it when it is created.  Serializing the tree has to happen while the parser
+waits, since it goes on to change the tree, but compressing and writing the file is left to a
+background thread.  Artifacts are gzipped and stored under DEBUG_ARTIFACTS_PATH as
+<kind>/<uid>_<stage>.html.gz
+"""
+import atexit
+import gzip
+import logging
+import os
+import Queue
+import threading
+from django.conf import settings
+from lxml import etree
+from raw.files import atomic_file
+
+
+logger = logging.getLogger('legcowatch-docs')
+
+# Most artifacts waiting to be written before the parsers have to wait for the writer
+MAX_PENDING = 16
+
+
+def is_enabled(enabled=None):
+    """
+    Whether to save artifacts.  enabled is the choice made for a single parser, and
+    the DEBUG_ARTIFACTS setting applies if it is None
+    """
+    if enabled is not None:
+        return enabled
+    return getattr(settings, 'DEBUG_ARTIFACTS', False)
+
+
+def get_artifacts_path():
+    return getattr(settings, 'DEBUG_ARTIFACTS_PATH', './legco-data/debug-artifacts')
+
+
+class ArtifactWriter(object):
+    """
+    Writes artifacts on a daemon thread, which is started on the first write in each process
+    """
+    def __init__(self, max_pending=MAX_PENDING):
+        self._queue = Queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def write(self, path, data):
+        """
+        Queues a string of data to be gzipped to path
+        """
+        self._ensure_thread()
+        self._queue.put((path, data))
+
+    def flush(self):
+        """
+        Waits until all of the queued artifacts are written
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def _ensure_thread(self):
+        # A forked worker inherits the writer, but not its thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = Queue.Queue(self._queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name='debug-artifacts')
+            self._thread.daemon = True
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            path, data = self._queue.get()
+            try:
+                self._write(path, data)
+            except (IOError, OSError) as e:
+                logger.warn(u'Could not write debug artifact {}: {}'.format(path, e))
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, data):
+        # Written to a temporary file and renamed, so that a half written artifact is never left behind
+        with atomic_file(path) as f:
+            with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+                gz.write(data)
+
+
+writer = ArtifactWriter()
+atexit.register(writer.flush)
+
+
+def dump_tree(kind, uid, stage, tree, enabled=None):
+    """
+    Saves an lxml tree as the artifact of a stage of parsing the document uid, if artifacts are enabled.
+    Returns the path it will be written to, or None
+    """
+    if not is_enabled(enabled) or tree is None:
+        return None
+    path = os.path.join(get_artifacts_path(), kind, u'{}_{}.html.gz'.format(uid, stage))
+    writer.write(path, etree.tostring(tree, encoding='utf-8'))
+    return path
@@ -0,0 +1,219 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of parsed documents
+
+Parsing a Hansard or an agenda means converting the source document to html and running
+the whole lxml pipeline over it, which is far too slow to do on every page view.
+The attributes that a parser extracts are pickled to disk instead, keyed on the uid of the
+document, a hash of the source file and a hash of the parser code.  Editing either the
+source file or the parser changes the key, so stale entries are simply never read again.
+
+Parser classes list the attributes worth keeping in CACHED_ATTRIBUTES.  Everything else,
+like the lxml tree, is set to None on the rehydrated object.  Parsers may define a
+_rehydrate method to rebuild anything that should not be kept, such as lookups of
+database objects.
+"""
+import cPickle as pickle
+from datetime import date
+import hashlib
+import logging
+import os
+import sys
+from django.conf import settings
+from django.db.models import Model
+from lxml import etree
+from raw.files import atomic_file
+
+
+logger = logging.getLogger('legcowatch-docs')
+
+# Bump this whenever the layout of the cache entries changes
+CACHE_FORMAT = 1
+
+# path -> ((size, mtime), sha1), so unchanged files aren't hashed again on every request
+_file_hashes = {}
+# parser class -> hash of its code
+_parser_versions = {}
+
+
+class UncacheableValue(Exception):
+    """
+    Raised when a parser attribute holds something that can't be stored, like an lxml element
+    """
+    pass
+
+
+def get_cache_path():
+    """
+    The directory for cache entries, or None if the cache is disabled
+    """
+    return getattr(settings, 'PARSE_CACHE_PATH', None)
+
+
+def file_hash(path):
+    """
+    Returns the sha1 of a file's contents
+    """
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime)
+    cached = _file_hashes.get(path, None)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_hashes[path] = (stamp, digest)
+    return digest
+
+
+def parser_version(cls):
+    """
+    Returns a hash of the code that a parser class depends on, which is the module
+    the class is defined in, raw.utils, which converts the source documents to html,
+    and the normalization and sanitizing of the html that the parsers share
+    """
+    version = _parser_versions.get(cls, None)
+    if version is None:
+        from raw import utils
+        from raw.docs import normalize, sanitize
+        h = hashlib.sha1(str(CACHE_FORMAT))
+        for module in (sys.modules[cls.__module__], utils, normalize, sanitize):
+            filename = os.path.splitext(module.__file__)[0] + '.py'
+            if not os.path.exists(filename):
+                filename = module.__file__
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        version = h.hexdigest()
+        _parser_versions[cls] = version
+    return version
+
+
+def cache_key(cls, uid, filename, inputs=()):
+    """
+    The key for a parse of a source file.  inputs are any other values that are
+    passed to the parser, and so also change the result
+    """
+    h = hashlib.sha1()
+    for part in (cls.__name__, uid, file_hash(filename), parser_version(cls)) + tuple(inputs):
+        h.update(repr(part))
+        h.update('\0')
+    return h.hexdigest()
+
+
+def get_or_build(cls, uid, filename, build, inputs=()):
+    """
+    Returns the parser of class cls for the document uid from the cache.
+    On a miss, build() is called to parse the document, and the result is stored.
+    """
+    cache_path = get_cache_path()
+    if cache_path is None or filename is None or not os.path.isfile(filename):
+        return build()
+    try:
+        key = cache_key(cls, uid, filename, inputs)
+    except (IOError, OSError) as e:
+        logger.warn(u'Could not compute parse cache key for {}: {}'.format(uid, e))
+        return build()
+    path = os.path.join(cache_path, cls.__name__.lower(), key[:2], u'{}.pickle'.format(key))
+
+    parser = load(cls, path)
+    if parser is not None:
+        logger.debug(u'Parse cache hit for {}'.format(uid))
+        return parser
+    logger.debug(u'Parse cache miss for {}'.format(uid))
+    parser = build()
+    if parser is not None:
+        store(parser, path)
+    return parser
+
+
+def load(cls, path):
+    """
+    Reads a cached parser from path.  Returns None if there is no usable entry
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            fmt, parser = pickle.load(f)
+    except Exception as e:
+        logger.warn(u'Could not read parse cache entry {}: {}'.format(path, e))
+        return None
+    if fmt != CACHE_FORMAT or not isinstance(parser, cls):
+        return None
+    rehydrate = getattr(parser, '_rehydrate', None)
+    if rehydrate is not None:
+        rehydrate()
+    return parser
+
+
+def store(parser, path):
+    """
+    Writes the cacheable attributes of a parser to path.  The entry is written to a temporary file
+    and renamed into place, so concurrent readers never see half of an entry
+    """
+    try:
+        frozen = freeze(parser)
+    except UncacheableValue as e:
+        logger.warn(u'Not caching {} {}: {}'.format(parser.__class__.__name__, getattr(parser, 'uid', u''), e))
+        return
+    try:
+        with atomic_file(path) as f:
+            pickle.dump((CACHE_FORMAT, frozen), f, pickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError) as e:
+        logger.warn(u'Could not write parse cache entry {}: {}'.format(path, e))
+
+
+def freeze(value, memo=None):
+    """
+    Returns a copy of value that only contains plain data, and can be pickled.
+    Objects are copied without calling __init__, and only keep their CACHED_ATTRIBUTES if they
+    define them.  Shared references, like questions that appear both in a list and in a map,
+    stay shared in the copy.
+    """
+    if memo is None:
+        memo = {}
+    if value is None or isinstance(value, (bool, int, long, float, date)):
+        return value
+    # The strings from lxml's text_content() and xpath() keep a reference to their element,
+    # and with it the whole tree, so store them as plain strings
+    if isinstance(value, unicode):
+        return unicode(value)
+    if isinstance(value, str):
+        return str(value)
+    key = id(value)
+    if key in memo:
+        return memo[key]
+    if isinstance(value, etree._Element):
+        raise UncacheableValue(u'found lxml element <{}>'.format(value.tag))
+    if isinstance(value, Model):
+        raise UncacheableValue(u'found model instance {}'.format(value.__class__.__name__))
+
+    if isinstance(value, list):
+        res = []
+        memo[key] = res
+        res.extend(freeze(xx, memo) for xx in value)
+    elif isinstance(value, tuple):
+        res = tuple(freeze(xx, memo) for xx in value)
+    elif isinstance(value, dict):
+        res = value.__class__()
+        memo[key] = res
+        for k, v in value.iteritems():
+            res[freeze(k, memo)] = freeze(v, memo)
+    elif hasattr(value, '__dict__'):
+        cls = value.__class__
+        res = cls.__new__(cls)
+        memo[key] = res
+        keep = getattr(cls, 'CACHED_ATTRIBUTES', None)
+        for name, attr in value.__dict__.iteritems():
+            if keep is None or name in keep:
+                res.__dict__[name] = freeze(attr, memo)
+            else:
+                res.__dict__[name] = None
+    else:
+        raise UncacheableValue(u'cannot store {}'.format(type(value).__name__))
+    memo[key] = res
+    return res
@@ -7,15 +7,12 @@ Document wrappers for LegCo Hansard (formal and floor)
 import pdb
 #pdb.set_trace()
 import logging
-import lxml
 from lxml import etree
-import lxml.html
-from lxml.html import HTMLParser
-from lxml.html.clean import clean_html, Cleaner
 import re
 import itertools
 from collections import OrderedDict
 from raw.utils import to_string, to_unicode, grouper
+from . import artifacts, normalize, profiling, sanitize
 from ..models.constants import *
 from lxml.etree import tostring
 #from ..models import *
@@ -80,11 +77,28 @@ class CouncilHansard(object):
     Object representing the **formal/translated** Council Hansard document.  This class
     parses the document source and makes all of the individual elements easily accessible
     """
+    # Attributes kept by the parse cache, see raw.docs.cache
+    CACHED_ATTRIBUTES = (
+        'uid', 'language', 'raw_date', 'date_and_time', 'president', 'members_present',
+        'members_absent', 'public_officers', 'clerks', 'before_meeting', 'tabled_papers',
+        'tabled_legislation', 'tabled_other_papers', 'urgent_questions', 'oral_questions',
+        'written_questions', 'bills', 'motions', 'ce_q_and_a', 'suspension', 'sections', '_count_errors',
+    )
+
+    SANITIZER = sanitize.LIGHTWEIGHT
+
     def __init__(self, uid, lang, source, raw_date, *args, **kwargs):
         logger.debug(u'** Parsing hansard {}'.format(uid))
         self.uid = uid
         self.language = lang
         self.raw_date = raw_date
+        # Whether to save the tree after cleaning and parsing, see raw.docs.artifacts.
+        # None leaves it to the DEBUG_ARTIFACTS setting
+        self.debug_artifacts = kwargs.get('debug_artifacts', None)
+        # How the html is sanitized, see raw.docs.sanitize
+        self.sanitizer = kwargs.get('sanitizer', self.SANITIZER)
+        # Timings of each stage and section, or None unless profiling is on, see raw.docs.profiling
+        self.profile = profiling.new_profile(self, kwargs.get('profile', None))
 
         # Raw html string
         self.source = source
@@ -130,28 +144,16 @@ class CouncilHansard(object):
     def __repr__(self):
         return u'<CouncilHansard: {}>'.format(self.uid)
     
+    @profiling.profiled()
     def _load(self):
         """
         Load the ElementTree from the source
         """
-        # Convert directional quotation marks to regular quotes
-        double_quotes = ur'[\u201c\u201d]'
-        self.source = re.sub(double_quotes, u'"', self.source)
-        single_quotes = ur'[\u2019\u2018]'
-        self.source = re.sub(single_quotes, u"'", self.source)
-        # Convert colons
-        self.source = self.source.replace(u'\uff1a', u':')
-        #self.source = self.source.replace(u'：', u':')
+        # Convert directional quotation marks to regular quotes and full width colons to colons,
+        # and remove line breaks, tabs and zero width joiners, in one pass.  See raw.docs.normalize
+        self.source = normalize.normalize_text(self.source)
         # Convert commas
         #self.source = self.source.replace(u'\u2C', u',')
-        # Remove line breaks and tabs
-        self.source = self.source.replace(u'\n', u'')
-        self.source = self.source.replace(u'\t', u'')
-        # There are also some "zero width joiners" in random places in the text
-        # Should remove them here, since they make string search unreliable
-        # these are the codes: &#8205, &#160 (nbsp), \xa0 (nbsp), \u200d
-        zero_width_joiners = u'\u200d'
-        self.source = self.source.replace(zero_width_joiners, u'')
         # Also previously had some non breaking spaces in unicode \u00a0, but this
         # may have been fixed by changing the parser below
         
@@ -165,16 +167,14 @@ class CouncilHansard(object):
         #if self.language == LANG_CN:
         #    self.source = self.source.encode('utf-8',errors='ignore')
         
-        # Use the lxml cleaner
-        cleaner = Cleaner()
-        cleaner.safe_attrs_only = False # Preserve styles
-        parser = HTMLParser(encoding='utf-8')
-        # Finally, load the cleaned string to an ElementTree
-        self.tree = cleaner.clean_html(lxml.html.fromstring(to_string(self.source), parser=parser))
+        # Finally, load the cleaned string to an ElementTree.  Preserve styles
+        self.tree = sanitize.load_html(to_string(self.source), self.sanitizer, safe_attrs_only=False,
+                                       profiled=self.profile is not None)
         self._convert_bold_to_strong()
         
         logger.info(u'Finished _load().')
     
+    @profiling.profiled()
     def _clean(self):
         """
         Removes/combines some of tags to make parsing easier
@@ -294,9 +294,10 @@ class CouncilHansard(object):
         #Notice that this html is not the same as from RawCouncilHansard._dump_as_fixture(),
         #and is stored in a different folder
 
-        self._dump_as_fixture(append_str='cleaned')
+        self._dump_artifact('cleaned')
         logger.info(u'Finished _clean().')
                 
+    @profiling.profiled()
     def _parse(self):
         """
         Parse the source document and populate this object's properties
@@ -446,10 +447,10 @@ class CouncilHansard(object):
                 logger.info(u'Done.')
                 
         logger.info(u'Done parsing all recognised sections.')
-        self._dump_as_fixture(append_str='end')
-        #self._dump_as_fixture()
+        self._dump_artifact('end')
         
     ## Parsers for sections
+    @profiling.profiled(profiling.SECTION)
     def _parse_main_heading(self,heading_list):  
         """
         Parser for main heading of Hansard.
@@ -706,6 +707,7 @@ class CouncilHansard(object):
         return main_content
         #Done.
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_before_meeting(self,elem_list):
         """
         Parse the dialogue before council meeting commences.
@@ -716,6 +718,7 @@ class CouncilHansard(object):
             self.before_meeting = self.parse_dialogs(elem_list)
         
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_tabled_papers(self,elem_list):
         BEGINNING_E = u'The following papers were laid'
         BEGINNING_C = u'下列文件是根據'
@@ -831,6 +834,7 @@ class CouncilHansard(object):
         self.tabled_other_papers = self._parse_other_papers_table(elem_list)
         
         
+    @profiling.profiled(profiling.SECTION)
     def _parse_legislation_table(self,elem_list):
         # Chinese and English tables have different characteristics
         # which can be used for our advantage
@@ -888,6 +892,7 @@ class CouncilHansard(object):
         return legislation_list
     
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_other_papers_table(self,elem_list):
         """
         Parser for Other Papers portion of Tabling of Papers section.
@@ -1096,6 +1101,7 @@ class CouncilHansard(object):
     # Output a question_obj - a list of 3-tuples:
     # [(Question number, Question title, Question content), ...] 
     ####################################################
+    @profiling.profiled(profiling.SECTION)
     def _parse_urgent_questions(self,elem_list):
         if elem_list[0].text_content().strip().startswith(u'主席') or\
         elem_list[0].text_content().strip().startswith(u'PRESIDENT'):
@@ -1109,6 +1115,7 @@ class CouncilHansard(object):
         #self.oral_questions_map = self._build_question_map(self.oral_questions)
     
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_oral_answers_to_questions(self,elem_list):
         """
         Choose parser for oral_answers_to_questions according to language
@@ -1127,6 +1134,7 @@ class CouncilHansard(object):
             self.oral_questions = self._parse_answers_to_questions_c(elem_list)
         self.oral_questions_map = self._build_question_map(self.oral_questions)
             
+    @profiling.profiled(profiling.SECTION)
     def _parse_written_answers_to_questions(self,elem_list):
         """
         Choose parser for written_answers_to_questions according to language
@@ -1143,6 +1151,7 @@ class CouncilHansard(object):
             self.written_questions = self._parse_answers_to_questions_c(elem_list,disable_event= True)
         self.written_questions_map = self._build_question_map(self.written_questions)
 
+    @profiling.profiled(profiling.SECTION)
     def _parse_answers_to_questions_e(self,elem_list,disable_event = False, allow_zero=False):
         """
         Parse English xxx_answers to questions.
@@ -1302,6 +1311,7 @@ class CouncilHansard(object):
         """
         
         
+    @profiling.profiled(profiling.SECTION)
     def _parse_answers_to_questions_c(self,elem_list,disable_event = False,allow_zero=False):
         """
         Parser for Chinese xxx_answers_to_questions section.
@@ -1459,6 +1469,7 @@ class CouncilHansard(object):
         return question_obj
         """
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_bills(self,elem_list):
         """
         Choose parser for bills according to language
@@ -1491,6 +1502,7 @@ class CouncilHansard(object):
         elif self.language==LANG_CN:
             self.bills = self._parse_bills_c(elem_list)
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_bills_e(self,elem_list):
         first_reading_e = r'First Reading of Bills'
         second_reading_e = r'Second Reading of Bills'
@@ -1579,6 +1591,7 @@ class CouncilHansard(object):
         return bills_obj
         
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_bills_c(self,elem_list):
         first_reading_c = ur'法案首讀'
         second_reading_c = ur'法案二讀'
@@ -1675,6 +1688,7 @@ class CouncilHansard(object):
         
         return bills_obj
         
+    @profiling.profiled(profiling.SECTION)
     def _parse_motions(self,elem_list):
         
         if self.language==LANG_EN:
@@ -1683,6 +1697,7 @@ class CouncilHansard(object):
             self._parse_motions_c(elem_list)
         return
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_motions_e(self,elem_list):
         """
         Parser for motions in English Hansard.
@@ -1719,6 +1734,7 @@ class CouncilHansard(object):
         #print motions_obj[1][2][0][1]
         self.motions = motions_obj
     
+    @profiling.profiled(profiling.SECTION)
     def _parse_motions_c(self,elem_list):
         """
         Parser for motions in Chinese Hansard.
@@ -1767,10 +1783,12 @@ class CouncilHansard(object):
         self.motions = motions_obj
         
         
+    @profiling.profiled(profiling.SECTION)
     def _parse_CE_Q_AND_A(self,elem_list):
         self.ce_q_and_a = self.parse_dialogs(elem_list)
         
         
+    @profiling.profiled(profiling.SECTION)
     def _parse_ending(self,elem_list):
         # There may be an <hr> - but do not use it for splitting footnotes
         # look for class 'pydocx-list-style-type-decimal' instead
@@ -1934,40 +1952,50 @@ class CouncilHansard(object):
         lang_char = u'e' if self.language==LANG_EN else u'c'
         question_map = []
         
+        # Load all of the questions that could match in one query, instead of one or two per question
+        candidate_uids = []
         for question in question_list:
-            question_number = question[0]
-            # Generate an uid
-            #example: question-20150603-u3-e
-            q_obj = None
-            try:
-                question_uid = u'{}-{}-{}-{}'.format(UID_PREFIX,raw_date,question_number,lang_char)
-                q_obj = RawCouncilQuestion.objects.get_by_uid(question_uid)
-            except:
+            candidate_uids.append(u'{}-{}-{}-{}'.format(UID_PREFIX,raw_date,question[0],lang_char))
+            candidate_uids.append(u'{}-{}-u{}-{}'.format(UID_PREFIX,raw_date,question[0],lang_char))
+        
+        with RawCouncilQuestion.objects.uid_index(uids=candidate_uids):
+            for question in question_list:
+                question_number = question[0]
+                # Generate an uid
+                #example: question-20150603-u3-e
+                q_obj = None
                 try:
-                # Perhaps it is an urgent question
-                    question_uid = u'{}-{}-u{}-{}'.format(UID_PREFIX,raw_date,question_number,lang_char)
-                    q_obj = RawCouncilQuestion.objects.get_by_uid(question_uid)    
+                    question_uid = u'{}-{}-{}-{}'.format(UID_PREFIX,raw_date,question_number,lang_char)
+                    q_obj = RawCouncilQuestion.objects.get_by_uid(question_uid)
                 except:
-                    # Cannot find a matching
-                    logger.warn(u"Cannot find a matching question for Oral question: {}-{}".format(question_number,question[1]))
-            
-            # Append anyway
-            question_map.append(q_obj)
-            #print q_obj
+                    try:
+                    # Perhaps it is an urgent question
+                        question_uid = u'{}-{}-u{}-{}'.format(UID_PREFIX,raw_date,question_number,lang_char)
+                        q_obj = RawCouncilQuestion.objects.get_by_uid(question_uid)    
+                    except:
+                        # Cannot find a matching
+                        logger.warn(u"Cannot find a matching question for Oral question: {}-{}".format(question_number,question[1]))
+                
+                # Append anyway
+                question_map.append(q_obj)
+                #print q_obj
             
         return question_map            
                     
                     
-    def _dump_as_fixture(self,append_str='cleaned'):
+    def _rehydrate(self):
         """
-        Saves the raw html to a fixture for testing
+        Called by the parse cache on a cached parser.  The question maps point at database objects,
+        so they are looked up again rather than cached
         """
-        try:
-            print 'raw/tests/fixtures/docs/{}_{}.html'.format(self.uid,append_str)
-            with open('raw/tests/fixtures/docs/{}_{}.html'.format(self.uid,append_str), 'wb') as f:
-                f.write(etree.tostring(self.tree))
-        except:
-            print "Cannot open the file"
+        self.oral_questions_map = self._build_question_map(self.oral_questions)
+        self.written_questions_map = self._build_question_map(self.written_questions)
+
+    def _dump_artifact(self, stage):
+        """
+        Saves the html tree at a stage of parsing, if debug artifacts are enabled
+        """
+        artifacts.dump_tree('hansard', self.uid, stage, self.tree, self.debug_artifacts)
     
     def _convert_bold_to_strong(self):
         """
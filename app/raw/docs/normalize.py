@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Character normalization of document sources, shared by the parsers
+
+Hansards and agendas had their quotes, colons, line breaks and zero width joiners replaced with a
+chain of re.sub and replace calls, each a full pass over a source that can be several megabytes.
+normalize_text() does all of the mapping in one pass of unicode.translate.  Question pages have a few
+stray byte sequences removed with one regular expression before they are decoded.
+"""
+import re
+
+
+# Character -> replacement, or None to remove it
+CHARACTER_MAP = {
+    # Directional quotation marks to regular quotes
+    u'\u201c': u'"',
+    u'\u201d': u'"',
+    u'\u2018': u"'",
+    u'\u2019': u"'",
+    # Full width colons
+    u'\uff1a': u':',
+    # Line breaks and tabs
+    u'\n': None,
+    u'\t': None,
+    # There are also some "zero width joiners" in random places in the text, which make string search unreliable
+    u'\u200d': None,
+}
+
+
+def build_table(mapping):
+    """
+    The table for unicode.translate.  Looking up every character in a dict is several times slower than the
+    replace calls it stands in for, so the table is a list indexed by code point.  The characters past the end
+    of the list raise IndexError, which translate takes to mean they are left as they are
+    """
+    table = range(max(ord(xx) for xx in mapping) + 1)
+    for char, replacement in mapping.items():
+        table[ord(char)] = replacement
+    return table
+
+TRANSLATE_TABLE = build_table(CHARACTER_MAP)
+
+# Byte sequences that occasionally stand between newlines in question pages, such as '财' and '绊'
+QUESTION_UNDESIRED_RE = re.compile(r'\x83\xdc|\x84P|\x84h')
+
+
+def normalize_text(source):
+    """
+    Maps the characters in CHARACTER_MAP in one pass.  Byte strings are taken to be utf-8
+    """
+    if isinstance(source, str):
+        source = source.decode('utf-8')
+    return source.translate(TRANSLATE_TABLE)
+
+
+def decode_question(src):
+    """
+    Removes the stray byte sequences from the source of a question page, and decodes it.
+    The pages seem to use big5hkscs (香港增補字符集) as their charset
+    """
+    return QUESTION_UNDESIRED_RE.sub('', src).decode('hkscs', 'ignore')
@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Per stage timings of the document parsers
+
+Profiling is off unless the PARSER_PROFILING setting is True, or the parser is created with
+profile=True, since it costs a walk of the tree after each stage and a Python call around each
+xpath() call.  A parser that is profiled keeps a ParserProfile in its profile attribute, which is
+None otherwise.  The methods decorated with profiled()
+record their wall time, the number of elements they worked on and the number of xpath() calls made
+while they ran.  Stages are the top level steps, such as _load, _clean and _parse, and sections are
+the parsers of each part of a document, such as CouncilHansard._parse_answers_to_questions_c.
+Timings are inclusive, so a section's time also counts towards the _parse stage that called it, and
+a method that runs more than once is added up.
+
+The xpath() calls are counted by the elements themselves: html_parser(counted=True) returns an HTMLParser
+whose elements count their calls, and the trees copied by Cleaner keep the element classes of their parser.
+
+Profiles are not kept by the parse cache, so parsers from the cache have none.
+"""
+from collections import OrderedDict
+from functools import wraps
+import json
+import threading
+import time
+from django.conf import settings
+from lxml.html import HTMLParser, HtmlElementClassLookup
+
+
+STAGE = 'stages'
+SECTION = 'sections'
+
+
+class _Counter(threading.local):
+    calls = 0
+
+_xpath_counter = _Counter()
+
+# element class -> subclass that counts its xpath() calls
+_counting_classes = {}
+
+
+def _get_counting_class(cls):
+    res = _counting_classes.get(cls, None)
+    if res is None:
+        def xpath(self, _path, **kwargs):
+            _xpath_counter.calls += 1
+            return cls.xpath(self, _path, **kwargs)
+        res = type(cls.__name__, (cls,), {'xpath': xpath, '__module__': cls.__module__})
+        _counting_classes[cls] = res
+    return res
+
+
+class CountingClassLookup(HtmlElementClassLookup):
+    """
+    The usual lxml.html element classes, with xpath() calls counted
+    """
+    def lookup(self, node_type, document, namespace, name):
+        cls = super(CountingClassLookup, self).lookup(node_type, document, namespace, name)
+        if cls is None:
+            return None
+        return _get_counting_class(cls)
+
+_lookup = CountingClassLookup()
+
+# Parsers can't be shared between threads, so each thread keeps its own
+_parsers = threading.local()
+
+
+def html_parser(counted=False, **kwargs):
+    """
+    An lxml HTMLParser, whose elements count their xpath() calls if counted is True.  It is reused
+    by later calls with the same arguments in the same thread
+    """
+    key = (counted,) + tuple(sorted(kwargs.items()))
+    cached = getattr(_parsers, 'parsers', None)
+    if cached is None:
+        cached = _parsers.parsers = {}
+    parser = cached.get(key, None)
+    if parser is None:
+        parser = HTMLParser(**kwargs)
+        if counted:
+            parser.set_element_class_lookup(_lookup)
+        cached[key] = parser
+    return parser
+
+
+def count_elements(tree):
+    if tree is None:
+        return 0
+    return sum(1 for _ in tree.iter())
+
+
+def is_enabled(enabled=None):
+    """
+    Whether to profile a parser.  enabled is the choice made for a single parser, and
+    the PARSER_PROFILING setting applies if it is None
+    """
+    if enabled is not None:
+        return enabled
+    return getattr(settings, 'PARSER_PROFILING', False)
+
+
+def new_profile(parser, enabled=None):
+    """
+    A ParserProfile for the parser if it is to be profiled, see is_enabled, or None
+    """
+    return ParserProfile(parser) if is_enabled(enabled) else None
+
+
+class ParserProfile(object):
+    def __init__(self, parser):
+        self.parser = parser.__class__.__name__
+        self.uid = getattr(parser, 'uid', None)
+        self.stages = OrderedDict()
+        self.sections = OrderedDict()
+
+    def record(self, group, name, seconds, elements, xpath_calls):
+        entries = getattr(self, group)
+        entry = entries.get(name, None)
+        if entry is None:
+            entry = entries[name] = OrderedDict((('calls', 0), ('seconds', 0.0), ('elements', 0), ('xpath_calls', 0)))
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['elements'] += elements or 0
+        entry['xpath_calls'] += xpath_calls
+
+    @property
+    def seconds(self):
+        return sum(xx['seconds'] for xx in self.stages.values())
+
+    def to_dict(self):
+        return OrderedDict((
+            ('parser', self.parser),
+            ('uid', self.uid),
+            ('seconds', self.seconds),
+            (STAGE, self.stages),
+            (SECTION, self.sections),
+        ))
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def profiled(group=STAGE):
+    """
+    Decorator for the methods of a parser that are recorded in its profile, if it has one.  For stages, elements
+    is the size of the tree once the stage is done.  For sections, it is the length of the list of
+    elements the section parser is given, if it is given one
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            profile = getattr(self, 'profile', None)
+            if profile is None:
+                return func(self, *args, **kwargs)
+            start_calls = _xpath_counter.calls
+            start = time.time()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                seconds = time.time() - start
+                xpath_calls = _xpath_counter.calls - start_calls
+                if group == STAGE:
+                    elements = count_elements(getattr(self, 'tree', None))
+                elif args and isinstance(args[0], (list, tuple)):
+                    elements = len(args[0])
+                else:
+                    elements = None
+                profile.record(group, func.__name__, seconds, elements, xpath_calls)
+        return wrapper
+    return decorator
+
+
+def aggregate(profiles, top=10):
+    """
+    Adds up a list of profiles, as given by ParserProfile.to_dict().  Returns a dict with the
+    'slowest' documents as (seconds, parser, uid), and the totals of each 'stage' and 'section'
+    as a list of (parser, name, totals) sorted by time, slowest first
+    """
+    res = {'documents': 0, 'slowest': [], STAGE: {}, SECTION: {}}
+    for profile in profiles:
+        res['documents'] += 1
+        res['slowest'].append((profile['seconds'], profile['parser'], profile['uid']))
+        for group in (STAGE, SECTION):
+            for name, entry in profile[group].items():
+                key = (profile['parser'], name)
+                totals = res[group].get(key, None)
+                if totals is None:
+                    totals = res[group][key] = {'documents': 0, 'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                'elements': 0, 'xpath_calls': 0}
+                totals['documents'] += 1
+                totals['calls'] += entry['calls']
+                totals['seconds'] += entry['seconds']
+                totals['max_seconds'] = max(totals['max_seconds'], entry['seconds'])
+                totals['elements'] += entry['elements']
+                totals['xpath_calls'] += entry['xpath_calls']
+    res['slowest'] = sorted(res['slowest'], reverse=True)[:top]
+    for group in (STAGE, SECTION):
+        res[group] = sorted(((parser, name, totals) for (parser, name), totals in res[group].items()),
+                            key=lambda xx: xx[2]['seconds'], reverse=True)
+    return res
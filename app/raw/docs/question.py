@@ -6,16 +6,13 @@ Document wrappers for LegCo questions (and replies)
 """
 
 import logging
-import lxml
 from lxml import etree
-import lxml.html
-from lxml.html.clean import clean_html, Cleaner
 import re
-from lxml.html import HTMLParser
 
 import urllib2
 from urllib2 import HTTPError
 from ..scraper.settings import USER_AGENT
+from . import normalize, profiling, sanitize
 
 logger = logging.getLogger('legcowatch-docs')
 
@@ -35,6 +32,13 @@ class CouncilQuestion(object):
     Question_content
     Reply_content
     """
+    # Attributes kept by the parse cache, see raw.docs.cache
+    CACHED_ATTRIBUTES = (
+        'uid', 'english', 'date', 'urgent', 'oral', 'subject', 'link', 'question_title',
+        'question_content', 'asker', 'reply_content', 'repliers',
+    )
+    SANITIZER = sanitize.LIGHTWEIGHT
+
     def __init__(self, uid, date, urgent, oral, src, subject, link,*args, **kwargs):
         logger.debug(u'** Parsing question {}'.format(uid))
         self.uid = uid
@@ -48,6 +52,8 @@ class CouncilQuestion(object):
         self.oral = oral
         self.subject = subject ### this is the title used by asker
         self.link = link
+        # How the html is sanitized, see raw.docs.sanitize
+        self.sanitizer = kwargs.get('sanitizer', self.SANITIZER)
         
         self.tree = None
         self.tree_content = None
@@ -57,12 +63,15 @@ class CouncilQuestion(object):
         self.asker = None
         self.reply_content = None
         self.repliers = None
+        # Timings of each stage, or None unless profiling is on, see raw.docs.profiling
+        self.profile = profiling.new_profile(self, kwargs.get('profile', None))
         self._load()
         self._parse()
         
     def __repr__(self):
         return u'<CouncilQuestion: {}>'.format(self.uid)
     
+    @profiling.profiled()
     def _load(self):
         """
         Load the ElementTree from the source
@@ -95,29 +104,18 @@ class CouncilQuestion(object):
         
         # Use the lxml cleaner
         if htm:
-            #Get rid of undesired characters here
-            #use a list of dict to replace them differently (optional)
-            list_undesired = [{'\x83\xdc':''},{'\x84P':''},{'\x84h':''},] #occasionally a character '财','绊' etc. is placed between newlines
-            #replace different types of colons
-            #list_undesired.append({'\xef\xbc\x9a':':'})
-            #list_undesired.append({'\xef\xb8\xb0':':'})
-            #list_undesired.append({'\xef\xb9\x95':':'})
-            #list_undesired.append({'\xa0':' '})
-            for item in list_undesired:
-                htm=htm.replace(item.keys()[0],item.values()[0])
-            
-            # Assume 香港增補字符集(big5hkscs) is used
-            htm = htm.decode('hkscs',errors='ignore')
+            #Get rid of undesired characters, and decode assuming 香港增補字符集(big5hkscs) is used.
+            #See raw.docs.normalize
+            htm = normalize.decode_question(htm)
             
-            cleaner = Cleaner()
-            parser = HTMLParser(encoding='utf-8')
             # Finally, load the cleaned string to an ElementTree
-            self.tree = cleaner.clean_html(lxml.html.fromstring(htm, parser=parser))
+            self.tree = sanitize.load_html(htm, self.sanitizer, profiled=self.profile is not None)
             self.src = htm
             #print('HTML source prepared.')
         else:
             self.tree = None
         
+    @profiling.profiled()
     def _parse(self):
         #only the 'pressrelease' part is needed
         try:
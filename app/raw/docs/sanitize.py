@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Loading and sanitizing the html of documents
+
+The parsers used to run lxml's Cleaner over every tree.  Cleaner copies the whole tree, then walks it
+several times to rewrite links and sanitize CSS, none of which the parsers look at.  sanitize() makes the
+same changes to the structure of the tree that Cleaner does with its default options, in one walk and in place:
+
+- comments, processing instructions, scripts, javascript styles, links, meta tags, frames, applets
+  and form controls are removed along with their contents
+- the html, head and title tags, embedded objects, forms, blink, marquee and unknown tags are removed,
+  but their contents are kept.  The root html element becomes a div, as Cleaner does
+- with safe_attrs_only, the attributes that aren't in lxml's safe list are removed.  Otherwise only the
+  javascript event attributes are
+- <image> is renamed to <img>
+
+What it leaves out is the rewriting of javascript: links and the sanitizing of inline and embedded CSS.
+Each parser picks a method in its SANITIZER attribute, which can be overridden per parser with its
+sanitizer argument, and CLEANER falls back to lxml's Cleaner.
+"""
+import lxml.html
+from lxml import etree
+from lxml.html import defs
+from lxml.html.clean import Cleaner
+from . import profiling
+
+
+LIGHTWEIGHT = 'lightweight'
+CLEANER = 'cleaner'
+
+# Removed with their contents
+KILL_TAGS = frozenset(['script', 'link', 'meta', 'applet', 'button', 'input', 'select', 'textarea']) | defs.frame_tags
+# Removed, keeping their contents
+REMOVE_TAGS = frozenset(['html', 'head', 'title', 'iframe', 'embed', 'layer', 'object', 'param', 'form',
+                         'blink', 'marquee'])
+KNOWN_TAGS = frozenset(defs.tags)
+SAFE_ATTRS = frozenset(defs.safe_attrs)
+
+
+def _in_object(el):
+    parent = el.getparent()
+    while parent is not None:
+        if parent.tag in ('applet', 'object'):
+            return True
+        parent = parent.getparent()
+    return False
+
+
+def sanitize(root, safe_attrs_only=True):
+    """
+    Sanitizes the tree under root in place, and returns root
+    """
+    kill = []
+    remove = []
+    for el in root.iter():
+        tag = el.tag
+        if not isinstance(tag, basestring):
+            if tag is etree.Comment or tag is etree.ProcessingInstruction:
+                kill.append(el)
+            continue
+        if tag == 'image':
+            el.tag = tag = 'img'
+        if tag in KILL_TAGS:
+            kill.append(el)
+        elif tag == 'style' and el.get('type', '').lower().strip() == 'text/javascript':
+            kill.append(el)
+        elif tag == 'param' and not _in_object(el):
+            # Params are only kept inside applets and objects
+            kill.append(el)
+        elif tag in REMOVE_TAGS or tag not in KNOWN_TAGS:
+            remove.append(el)
+        attrib = el.attrib
+        if safe_attrs_only:
+            for name in attrib.keys():
+                if name not in SAFE_ATTRS:
+                    del attrib[name]
+        else:
+            for name in attrib.keys():
+                if name.startswith('on'):
+                    del attrib[name]
+
+    if remove and remove[0] is root:
+        # The root can't be dropped, so it is rewritten instead
+        remove.pop(0)
+        root.tag = 'div'
+        root.attrib.clear()
+    # Innermost first
+    for el in reversed(kill):
+        el.drop_tree()
+    for el in remove:
+        el.drop_tag()
+    return root
+
+
+def clean(root, method=LIGHTWEIGHT, safe_attrs_only=True):
+    """
+    Sanitizes a tree with the given method.  sanitize() works in place, while Cleaner returns a copy,
+    so use the returned tree
+    """
+    if method == LIGHTWEIGHT:
+        return sanitize(root, safe_attrs_only)
+    if method == CLEANER:
+        cleaner = Cleaner()
+        cleaner.safe_attrs_only = safe_attrs_only
+        return cleaner.clean_html(root)
+    raise ValueError(u'Unknown sanitizer {}'.format(method))
+
+
+def load_html(source, method=LIGHTWEIGHT, safe_attrs_only=True, profiled=False):
+    """
+    Parses an html string, with a parser that is reused within the thread, and sanitizes it.
+    If profiled is True, the xpath() calls on the tree are counted, see raw.docs.profiling
+    """
+    parser = profiling.html_parser(counted=profiled, encoding='utf-8')
+    return clean(lxml.html.fromstring(source, parser=parser), method, safe_attrs_only)
@@ -0,0 +1,43 @@
+"""
+Writing files atomically, for the caches, the debug artifacts and the merged hansards, which may
+be read by another process while they are being written
+"""
+from contextlib import contextmanager
+import os
+import tempfile
+
+
+# The mode that open() would give a new file.  Read once, since os.umask can only be read by setting it
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0666 & ~_umask
+
+
+@contextmanager
+def atomic_file(path):
+    """
+    Yields a temporary file in the directory of path, creating the directory if need be, which is
+    renamed to path once the block is done, so readers never see half of a file.  If the block
+    raises, the temporary file is removed.  E.g.
+
+    with atomic_file(path) as f:
+        f.write(data)
+    """
+    dirname = os.path.dirname(path)
+    try:
+        os.makedirs(dirname)
+    except OSError:
+        # Already exists, or another process just made it
+        pass
+    f = tempfile.NamedTemporaryFile(dir=dirname, suffix='.tmp', delete=False)
+    try:
+        with f:
+            yield f
+        # Temporary files are only readable by their owner, which would keep out the web
+        # and worker processes if they run as another user
+        os.chmod(f.name, FILE_MODE)
+        os.rename(f.name, path)
+    except:
+        if os.path.exists(f.name):
+            os.remove(f.name)
+        raise
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Fills in the filetype of RawCouncilHansard and RawCouncilAgenda objects that were processed
+before it was stored, or whose files have changed since.  libmagic runs on a pool of workers.
+
+$ python manage.py backfill_filetypes --workers 4
+"""
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from multiprocessing import Pool
+from optparse import make_option
+from raw import utils
+from raw.models import RawCouncilHansard, RawCouncilAgenda
+import logging
+
+logging.disable(logging.CRITICAL)
+
+
+def detect_filetypes(rows):
+    """
+    Runs in a worker process.  Takes a list of (pk, full path) and returns a list of (pk, filetype, stamp)
+    """
+    res = []
+    for pk, full_file in rows:
+        try:
+            stamp = utils.file_stamp(full_file)
+        except OSError:
+            continue
+        filetype = utils.check_file_type(full_file)
+        res.append((pk, filetype if filetype is not None else utils.UNKNOWN, stamp))
+    return res
+
+
+class Command(BaseCommand):
+    help = 'Store the file types of downloaded hansards and agendas'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=1,
+                    help='Number of worker processes'),
+        make_option('--chunk-size', type='int', default=100, dest='chunk_size',
+                    help='Number of files sent to a worker at a time'),
+        make_option('--all', action='store_true', default=False, dest='check_all',
+                    help='Check every file again, not only the ones without a type or that have changed'),
+    )
+
+    def handle(self, *args, **options):
+        for model in (RawCouncilHansard, RawCouncilAgenda):
+            rows = self._get_rows(model, options['check_all'])
+            chunks = [rows[start:start + options['chunk_size']] for start in range(0, len(rows), options['chunk_size'])]
+            if options['workers'] <= 1:
+                results = map(detect_filetypes, chunks)
+            else:
+                # Don't let the workers inherit an open connection
+                connection.close()
+                pool = Pool(options['workers'])
+                try:
+                    results = pool.map(detect_filetypes, chunks)
+                finally:
+                    pool.terminate()
+                    pool.join()
+            updated = 0
+            for chunk in results:
+                with transaction.atomic():
+                    for pk, filetype, stamp in chunk:
+                        model.objects.filter(pk=pk).update(filetype=filetype, filetype_stamp=stamp)
+                        updated += 1
+            self.stdout.write(u'{}: {} checked, {} updated'.format(model.__name__, len(rows), updated))
+
+    def _get_rows(self, model, check_all):
+        # (pk, full path) of the objects that need checking.  Comparing stamps is cheap, so that is done here
+        rows = []
+        objs = model.objects.exclude(local_filename=None).exclude(local_filename=u'') \
+            .values_list('pk', 'local_filename', 'filetype', 'filetype_stamp')
+        for pk, local_filename, filetype, stamp in objs:
+            try:
+                full_file = utils.get_file_path(local_filename)
+                if not check_all and filetype is not None and stamp == utils.file_stamp(full_file):
+                    continue
+            except (RuntimeError, OSError):
+                continue
+            rows.append((pk, full_file))
+        return rows
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Converts the DOC and DOCX files of the hansards and agendas into the conversion cache,
+so that the parsers don't have to wait for abiword or PyDocX.
+
+$ python manage.py convert_docs --workers 4
+"""
+from django.core.management import BaseCommand, CommandError
+from optparse import make_option
+from raw import conversion, utils
+from raw.models import RawCouncilHansard, RawCouncilAgenda
+import logging
+
+logging.disable(logging.CRITICAL)
+
+KINDS = {
+    utils.DOC: conversion.KIND_DOC,
+    utils.DOCX: conversion.KIND_DOCX,
+}
+
+
+class Command(BaseCommand):
+    help = 'Convert hansard and agenda documents to html ahead of parsing'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=1,
+                    help='Number of worker processes'),
+        make_option('--chunk-size', type='int', default=20, dest='chunk_size',
+                    help='Number of files sent to a worker at a time.  DOC files in a chunk share one abiword process'),
+        make_option('--overwrite', action='store_true', default=False,
+                    help='Convert files again even if they are cached'),
+    )
+
+    def handle(self, *args, **options):
+        if conversion.get_cache() is None:
+            raise CommandError(u'The conversion cache is disabled, set CONVERSION_CACHE_PATH')
+        files = []
+        for model in (RawCouncilHansard, RawCouncilAgenda):
+            for local_filename in model.objects.exclude(local_filename=None).exclude(local_filename=u'') \
+                    .values_list('local_filename', flat=True):
+                try:
+                    filepath = utils.get_file_path(local_filename)
+                except RuntimeError:
+                    continue
+                kind = KINDS.get(utils.check_file_type(filepath), None)
+                if kind is not None:
+                    files.append((kind, filepath))
+        self.stdout.write(u'Found {} documents'.format(len(files)))
+        counts = conversion.convert_batch(files, workers=options['workers'], chunk_size=options['chunk_size'],
+                                          overwrite=options['overwrite'])
+        self.stdout.write(u'{} already cached, {} converted, {} failed'.format(
+            counts['cached'], counts['converted'], counts['failed']))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk corrections of parsed objects through Overrides, e.g. to deactivate a list of duplicates.
+The uids are given as arguments, or read one per line from a file ('-' for stdin).
+
+$ python manage.py override_parsed parsedperson --deactivate --file duplicates.txt
+$ python manage.py override_parsed parsedcommittee --set name_e="Finance Committee" committee-1
+"""
+from django.core.management import BaseCommand, CommandError
+from django.db.models import get_model
+from optparse import make_option
+from raw.models.parsed import BaseParsedModel, Override
+import codecs
+import logging
+import sys
+
+logging.disable(logging.CRITICAL)
+
+
+class Command(BaseCommand):
+    help = 'Merge changes into the Overrides of many parsed objects at once'
+    args = 'model [uid uid ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--file', default=None,
+                    help='File with one uid per line, or - for stdin'),
+        make_option('--deactivate', action='store_true', default=False,
+                    help='Deactivate the objects'),
+        make_option('--reactivate', action='store_true', default=False,
+                    help='Reactivate the objects that have overrides'),
+        make_option('--set', action='append', default=[], dest='values',
+                    help='Override a field, as name=value.  Can be given more than once'),
+        make_option('--batch-size', type='int', default=500, dest='batch_size',
+                    help='Number of overrides loaded or written per query'),
+    )
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError(u'Give the name of a parsed model, e.g. parsedperson')
+        model = get_model('raw', args[0])
+        if model is None or not issubclass(model, BaseParsedModel):
+            raise CommandError(u'{} is not a parsed model'.format(args[0]))
+        if options['deactivate'] and options['reactivate']:
+            raise CommandError(u'Choose one of --deactivate and --reactivate')
+
+        data = self._get_data(model, options)
+        if not data:
+            raise CommandError(u'Nothing to change.  Use --deactivate, --reactivate or --set')
+        ref_uids = list(args[1:])
+        if options['file'] is not None:
+            ref_uids += self._read_uids(options['file'])
+        if not ref_uids:
+            raise CommandError(u'No uids given')
+
+        known = set()
+        for start in range(0, len(ref_uids), options['batch_size']):
+            batch = ref_uids[start:start + options['batch_size']]
+            known.update(model.objects.filter(uid__in=batch).values_list('uid', flat=True))
+        missing = [xx for xx in ref_uids if xx not in known]
+        for uid in missing:
+            self.stderr.write(u'No {} with uid {}'.format(model.__name__, uid))
+
+        counts = Override.objects.merge_payloads(model, [xx for xx in ref_uids if xx in known], data,
+                                                 create=not options['reactivate'], batch_size=options['batch_size'])
+        self.stdout.write(u'{}: {} created, {} updated, {} unchanged, {} not found'.format(
+            model.__name__, counts['created'], counts['updated'], counts['unchanged'], len(missing)))
+
+    def _get_data(self, model, options):
+        # The dict to merge into the payloads
+        fields = dict((xx.name, xx) for xx in model().get_overridable_fields())
+        data = {}
+        for value in options['values']:
+            name, sep, value = value.partition('=')
+            if not sep:
+                raise CommandError(u'--set takes name=value, not {}'.format(name))
+            if name not in fields or name == 'deactivate':
+                raise CommandError(u'{} is not an overridable field of {}'.format(name, model.__name__))
+            data[name] = value.decode('utf-8')
+        if options['deactivate']:
+            data['deactivate'] = True
+        if options['reactivate']:
+            data['deactivate'] = False
+        return data
+
+    def _read_uids(self, filename):
+        if filename == '-':
+            lines = codecs.getreader('utf-8')(sys.stdin).readlines()
+        else:
+            with codecs.open(filename, 'r', 'utf-8') as f:
+                lines = f.readlines()
+        return [xx.strip() for xx in lines if xx.strip()]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Processes the latest scrapes of all of the spiders, running processors that don't depend
+on each other at the same time.
+
+$ python manage.py process_all --workers 4
+$ python manage.py process_all library_member council_question
+"""
+from django.core.management import BaseCommand, CommandError
+from optparse import make_option
+from raw.processors import PROCESS_MAP
+from raw.processors import runner
+
+
+class Command(BaseCommand):
+    help = 'Load the latest scrapes of the spiders into the raw models'
+    args = '[spider spider ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=4,
+                    help='Number of processors that may run at the same time'),
+        make_option('--threads', action='store_true', default=False, dest='use_threads',
+                    help='Run the processors on threads instead of processes'),
+    )
+
+    def handle(self, *args, **options):
+        for name in args:
+            if name not in PROCESS_MAP:
+                raise CommandError(u'Unknown spider {}.  Choose from {}'.format(name, u', '.join(PROCESS_MAP.keys())))
+        spiders = list(args) if args else PROCESS_MAP.keys()
+        with runner.sql_logging_disabled():
+            timings = runner.run_stages(spiders, workers=options['workers'], use_threads=options['use_threads'])
+        for name, timing in timings.items():
+            seconds = u'{:.1f}s'.format(timing['seconds']) if timing['seconds'] is not None else u'-'
+            line = u'{:<30} {:<8} {:>10}'.format(name, timing['status'], seconds)
+            if timing['error']:
+                line += u'  {}'.format(timing['error'])
+            self.stdout.write(line)
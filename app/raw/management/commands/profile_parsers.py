@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Parses the hansards, agendas and questions again, bypassing the parse cache, and ranks the slowest
+documents and the stages and sections of the parsers that take the most time overall.
+See raw.docs.profiling.  The profiles can be saved as JSON lines with --output, and a saved
+file can be ranked again with --input instead of parsing everything.
+
+$ python manage.py profile_parsers --kind hansard --output hansard-profiles.jsonl
+$ python manage.py profile_parsers --input hansard-profiles.jsonl --top 20
+"""
+from django.core.management import BaseCommand, CommandError
+from optparse import make_option
+from raw.docs import profiling
+from raw.models import RawCouncilHansard, RawCouncilAgenda, RawCouncilQuestion
+import json
+import logging
+
+logging.disable(logging.CRITICAL)
+
+KINDS = {
+    'hansard': RawCouncilHansard,
+    'agenda': RawCouncilAgenda,
+    'question': RawCouncilQuestion,
+}
+
+
+class Command(BaseCommand):
+    help = 'Profile the document parsers over the whole corpus'
+    option_list = BaseCommand.option_list + (
+        make_option('--kind', action='append', default=[], dest='kinds',
+                    help='Only parse this kind of document, one of {}.  Can be given more than once'.format(
+                        u', '.join(sorted(KINDS.keys())))),
+        make_option('--limit', type='int', default=None,
+                    help='Parse at most this many documents of each kind'),
+        make_option('--output', default=None,
+                    help='Write the profile of each document to this file, one JSON object per line'),
+        make_option('--input', default=None,
+                    help='Rank the profiles saved in this file instead of parsing the documents'),
+        make_option('--top', type='int', default=10,
+                    help='Number of documents, stages and sections to list'),
+    )
+
+    def handle(self, *args, **options):
+        for kind in options['kinds']:
+            if kind not in KINDS:
+                raise CommandError(u'Unknown kind {}.  Choose from {}'.format(kind, u', '.join(sorted(KINDS.keys()))))
+        if options['input'] is not None:
+            with open(options['input'], 'rb') as f:
+                profiles = [json.loads(line) for line in f if line.strip()]
+        else:
+            profiles = self._profile(options['kinds'] or sorted(KINDS.keys()), options['limit'], options['output'])
+        self._report(profiling.aggregate(profiles, options['top']), options['top'])
+
+    def _profile(self, kinds, limit, output):
+        profiles = []
+        out = open(output, 'wb') if output is not None else None
+        try:
+            for kind in kinds:
+                objs = KINDS[kind].objects.exclude(local_filename=None).exclude(local_filename=u'').order_by('uid')
+                if limit is not None:
+                    objs = objs[:limit]
+                failed = 0
+                for obj in objs.iterator():
+                    try:
+                        parser = obj.get_parser(use_cache=False, profile=True)
+                    except Exception:
+                        parser = None
+                    if parser is None or getattr(parser, 'profile', None) is None:
+                        failed += 1
+                        continue
+                    profile = parser.profile.to_dict()
+                    profiles.append(profile)
+                    if out is not None:
+                        out.write(json.dumps(profile) + '\n')
+                self.stdout.write(u'{}: {} failed to parse'.format(kind, failed))
+        finally:
+            if out is not None:
+                out.close()
+        return profiles
+
+    def _report(self, totals, top):
+        self.stdout.write(u'{} documents'.format(totals['documents']))
+        self.stdout.write(u'\nSlowest documents')
+        for seconds, parser, uid in totals['slowest']:
+            self.stdout.write(u'{:10.3f}s  {:<16} {}'.format(seconds, parser, uid))
+        for group in (profiling.STAGE, profiling.SECTION):
+            self.stdout.write(u'\nSlowest {}'.format(group))
+            self.stdout.write(u'{:>11} {:>11} {:>6} {:>10} {:>9}  {}'.format(
+                u'total', u'max', u'docs', u'elements', u'xpath', u'name'))
+            for parser, name, entry in totals[group][:top]:
+                self.stdout.write(u'{:10.3f}s {:10.3f}s {:6d} {:10d} {:9d}  {}.{}'.format(
+                    entry['seconds'], entry['max_seconds'], entry['documents'], entry['elements'],
+                    entry['xpath_calls'], parser, name))
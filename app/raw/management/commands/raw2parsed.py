@@ -1,19 +1,43 @@
 # -*- coding: utf-8 -*-
 
-from django.core.management import BaseCommand
-import raw.models
-from raw.models import ParsedCommittee, ParsedCommitteeMembership, ParsedCouncilMeeting, ParsedMembership, ParsedPerson, ParsedPerson, ParsedQuestion
+from django.core.management import BaseCommand, CommandError
+from optparse import make_option
+from raw.populate import POPULATE_STEPS, DEFAULT_STEPS, run_serial, run_parallel
 import logging
 
 logging.disable(logging.CRITICAL)
 
 class Command(BaseCommand):
     help = 'Create parsed models from their raw correspondences'
-    
+    args = '[step step ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=1,
+                    help='Number of worker processes.  With more than 1, the raw objects are parsed in parallel'),
+        make_option('--chunk-size', type='int', default=50, dest='chunk_size',
+                    help='Number of raw objects sent to a worker at a time'),
+        make_option('--batch-size', type='int', default=500, dest='batch_size',
+                    help='Number of parsed objects saved per transaction'),
+        make_option('--questions', action='store_true', default=False,
+                    help='Also populate ParsedQuestion'),
+        make_option('--full', action='store_true', default=False,
+                    help='Parse all raw objects again, instead of only those updated since the last run'),
+    )
+
     def handle(self, *args, **options):
-        raw.models.ParsedCommittee.objects.populate()
-        raw.models.ParsedPerson.objects.populate()
-        raw.models.ParsedMembership.objects.populate()
-        raw.models.ParsedCommitteeMembership.objects.populate()
-        raw.models.ParsedCouncilMeeting.objects.populate()
-        #raw.models.ParsedQuestion.objects.populate()
\ No newline at end of file
+        steps = list(DEFAULT_STEPS)
+        if options['questions']:
+            steps.append('questions')
+        for name in args:
+            # Specific steps can be given as arguments, e.g. raw2parsed persons memberships
+            if name not in POPULATE_STEPS:
+                raise CommandError(u'Unknown step {}.  Choose from {}'.format(name, u', '.join(POPULATE_STEPS.keys())))
+        if args:
+            steps = list(args)
+
+        if options['workers'] <= 1:
+            run_serial(steps, full=options['full'])
+        else:
+            counts = run_parallel(steps, options['workers'], chunk_size=options['chunk_size'],
+                                  batch_size=options['batch_size'], full=options['full'])
+            for name, count in counts.items():
+                self.stdout.write(u'{}: {} saved, {} errors'.format(name, count['saved'], count['error']))
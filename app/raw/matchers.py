@@ -0,0 +1,102 @@
+"""
+Process wide registry of the NameMatchers for member models
+
+Building a NameMatcher loads every member from the database and parses all of their names,
+and the detail views used to do that on every request, sometimes twice.  The registry builds
+the English and Chinese matchers of a model once and hands out the same objects until the
+model's rows change.
+
+Saving or deleting a registered model bumps its version, through the post_save and post_delete
+signals.  Signals are only seen by the process that sent them, so the version is a
+raw.versions.SharedVersion, which is also kept in the database, and a save in one process makes
+the others rebuild too.  bulk_create and queryset updates don't send signals, so code that writes
+members that way has to call invalidate() itself.
+"""
+import logging
+import threading
+from django.db.models.signals import post_save, post_delete
+from raw.versions import SharedVersion
+
+
+logger = logging.getLogger('legcowatch')
+
+
+class MatcherRegistry(object):
+    """
+    Thread safe cache of NameMatchers, keyed on (model, english)
+    """
+    VERSION_KEY = u'matchers-{}'
+
+    def __init__(self, check_interval=1.0):
+        self._lock = threading.Lock()
+        self.check_interval = check_interval
+        # (model, english) -> (version, matcher)
+        self._matchers = {}
+        # model -> SharedVersion
+        self._versions = {}
+        self._registered = set()
+        self.hits = 0
+        self.builds = 0
+
+    def register(self, model):
+        """
+        Invalidates the model's matchers whenever one of its rows is saved or deleted
+        """
+        self._registered.add(model)
+        uid = u'matcher-registry-{}'.format(model._meta.db_table)
+        post_save.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+
+    def _on_change(self, sender, **kwargs):
+        self.invalidate(sender)
+
+    def is_registered(self, model):
+        return model in self._registered
+
+    def _get_shared_version(self, model):
+        version = self._versions.get(model, None)
+        if version is None:
+            version = self._versions.setdefault(
+                model, SharedVersion(self.VERSION_KEY.format(model._meta.db_table), self.check_interval))
+        return version
+
+    def get_version(self, model):
+        return self._get_shared_version(model).get()
+
+    def get(self, model, english=True):
+        """
+        Returns the shared matcher for model, building it if there is none or its rows have changed
+        """
+        key = (model, english)
+        entry = self._matchers.get(key, None)
+        if entry is not None and entry[0] == self.get_version(model):
+            self.hits += 1
+            return entry[1]
+        with self._lock:
+            # Another thread may have built it while we were waiting
+            version = self.get_version(model)
+            entry = self._matchers.get(key, None)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            # The version is read before building, so a save during the build
+            # leaves a stale version on the entry, and the next get() builds again
+            matcher = model.build_matcher(english)
+            self._matchers[key] = (version, matcher)
+            self.builds += 1
+            logger.debug(u'Built {} name matcher for {}'.format(u'English' if english else u'Chinese', model.__name__))
+            return matcher
+
+    def invalidate(self, model):
+        """
+        Marks the model's matchers as stale, in this process and, once the current transaction
+        is committed, in the others
+        """
+        self._get_shared_version(model).bump()
+
+    def clear(self):
+        with self._lock:
+            self._matchers.clear()
+
+
+matcher_registry = MatcherRegistry()
@@ -4,15 +4,19 @@ from datetime import datetime, date, time
 import json
 import logging
 from django.conf import settings
-from django.db import models, IntegrityError
+from django.db import models, transaction, IntegrityError, DatabaseError
 from django.db.backends import BaseDatabaseWrapper
 from django.db.backends.util import CursorWrapper
-from django.db.models import get_model, Q
+from django.db.models import get_model, Q, Max
 from django.utils.encoding import force_unicode
+from django.utils import timezone
 from django.utils.text import slugify
 import re
-from constants import GENDER_CHOICES, LANG_EN
-from .raw import RawMember, RawCommittee, RawCommitteeMembership, RawCouncilAgenda, RawCouncilQuestion
+from constants import GENDER_CHOICES, LANG_EN, LANG_CN
+from .raw import RawMember, RawCommittee, RawCommitteeMembership, RawCouncilAgenda, RawCouncilQuestion, \
+    RawScheduleMember
+from ..matchers import matcher_registry
+from ..overrides import override_resolver, decode_payload, encode_payload, is_deactivated
 from ..names import MemberName, NameMatcher
 from ..docs.agenda import logger as agenda_logger
 from ..docs.question import logger as question_logger
@@ -27,6 +31,10 @@ class TimestampMixin(object):
 
 
 class BaseParsedManager(models.Manager):
+    # Other raw models that the parsed objects are built from, besides RAW_MODEL.
+    # Their last_parsed times also count towards the populate watermark
+    watermark_models = ()
+
     def create_from_raw(self, raw_obj):
         # Create a parsed model from its corresponding raw one, but not saving
         if getattr(self, 'excluded', None) is not None:
@@ -44,6 +52,129 @@ class BaseParsedManager(models.Manager):
         obj.deactivate = False
         return obj
 
+    def get_raw_queryset(self):
+        # The raw objects that populate() creates parsed objects from
+        return self.model.RAW_MODEL.objects.all()
+
+    def get_changed_raw_queryset(self, since):
+        # The raw objects that have been updated since a datetime.  Managers whose parsed objects
+        # also depend on other raw objects, like a language counterpart, extend this
+        return self.get_raw_queryset().filter(last_parsed__gt=since)
+
+    def get_populate_queryset(self, full=True):
+        """
+        The raw objects to create parsed objects from.  Unless full is True, only those that changed
+        since the last populate.  Raw objects without a last_parsed time are only picked up by full runs
+        """
+        if not full:
+            since = PopulateWatermark.objects.get_for_model(self.model)
+            if since is not None:
+                return self.get_changed_raw_queryset(since)
+        return self.get_raw_queryset()
+
+    def get_high_water_mark(self):
+        # The latest last_parsed of all of the raw objects that this model is built from
+        marks = []
+        for raw_model in (self.model.RAW_MODEL,) + tuple(self.watermark_models):
+            mark = raw_model.objects.aggregate(Max('last_parsed'))['last_parsed__max']
+            if mark is not None:
+                marks.append(mark)
+        return max(marks) if marks else None
+
+    def active(self):
+        # The objects that haven't been deactivated, either by populate or by an Override
+        return override_resolver.exclude_deactivated(self.get_queryset())
+
+    def effective(self, queryset=None):
+        # The active objects with their Overrides applied.  Overrides are loaded once for the whole model
+        return override_resolver.effective(queryset if queryset is not None else self.get_queryset())
+
+    def effective_values(self, *fields, **kwargs):
+        # Like values(*fields), for the active objects and with their Overrides applied
+        queryset = kwargs.get('queryset', None)
+        return override_resolver.effective_values(queryset if queryset is not None else self.get_queryset(), *fields)
+
+    def build_from_raw(self, raw_obj):
+        # Returns a list of the unsaved parsed objects for a raw object.  Used by the parallel
+        # populate in raw.populate, which builds objects in worker processes and saves them in the parent
+        obj = self.create_from_raw(raw_obj)
+        if obj is None:
+            return []
+        return [obj]
+
+    def build_batch(self, raw_objs):
+        """
+        Builds the unsaved parsed objects for a list of raw objects.  Returns (list of objects, number of raw
+        objects that failed).  Managers that can look up what they need for a whole batch at once override this
+        """
+        res = []
+        errors = 0
+        for raw_obj in raw_objs:
+            try:
+                res.extend(self.build_from_raw(raw_obj))
+            except Exception as e:
+                logger.warn(u'Could not build {} from {}: {}'.format(self.model.__name__, raw_obj.uid, e))
+                errors += 1
+        return res, errors
+
+    def write_objects(self, objs, batch_size=500):
+        """
+        Saves a list of parsed objects.  Objects whose primary key isn't in the database yet are inserted
+        with bulk_create, and the others are updated, one transaction per batch.  If a batch fails, its
+        objects are saved one by one so that a single bad row doesn't lose the rest.
+        Returns (number saved, number that failed)
+        """
+        pks = [obj.pk for obj in objs if obj.pk is not None]
+        existing = set()
+        for start in range(0, len(pks), batch_size):
+            existing.update(self.filter(pk__in=pks[start:start + batch_size]).values_list('pk', flat=True))
+        to_create = [obj for obj in objs if obj.pk not in existing]
+        to_update = [obj for obj in objs if obj.pk in existing]
+        saved = 0
+        errors = 0
+        for start in range(0, len(to_create), batch_size):
+            batch = to_create[start:start + batch_size]
+            try:
+                with transaction.atomic():
+                    self.bulk_create(batch)
+                    # bulk_create doesn't send the post_save that normally invalidates the name matchers
+                    if matcher_registry.is_registered(self.model):
+                        matcher_registry.invalidate(self.model)
+                saved += len(batch)
+            except DatabaseError as e:
+                logger.warn(u'Bulk insert of {} {} objects failed, retrying individually: {}'.format(
+                    len(batch), self.model.__name__, e))
+                s, err = self._save_each(batch, force_insert=True)
+                saved += s
+                errors += err
+        for start in range(0, len(to_update), batch_size):
+            batch = to_update[start:start + batch_size]
+            try:
+                with transaction.atomic():
+                    for obj in batch:
+                        obj.save(force_update=True)
+                saved += len(batch)
+            except DatabaseError as e:
+                logger.warn(u'Batched update of {} {} objects failed, retrying individually: {}'.format(
+                    len(batch), self.model.__name__, e))
+                s, err = self._save_each(batch, force_update=True)
+                saved += s
+                errors += err
+        return saved, errors
+
+    def _save_each(self, objs, **kwargs):
+        saved = 0
+        errors = 0
+        for obj in objs:
+            try:
+                with transaction.atomic():
+                    obj.save(**kwargs)
+                saved += 1
+            except DatabaseError as e:
+                logger.warn(u'Could not save {} {}: {}'.format(self.model.__name__, obj.uid, e))
+                errors += 1
+        return saved, errors
+
     def _deactivate_db_debug(self):
         if settings.DEBUG:
             self.original = BaseDatabaseWrapper.make_debug_cursor
@@ -53,9 +184,11 @@ class BaseParsedManager(models.Manager):
         if settings.DEBUG and getattr(self, 'original') is not None:
             BaseDatabaseWrapper.make_debug_cursor = self.original
 
-    def populate(self):
+    def populate(self, full=True):
         self._deactivate_db_debug()
-        raw_items = self.model.RAW_MODEL.objects.all()
+        # Take the mark before starting, so that raw objects updated during the run are picked up next time
+        mark = self.get_high_water_mark()
+        raw_items = self.get_populate_queryset(full)
         count = 0
         for item in raw_items:
             # Get or create, but without commit
@@ -66,6 +199,7 @@ class BaseParsedManager(models.Manager):
             except IntegrityError as e:
                 logger.warning(u'Could not create from {}'.format(item))
                 logger.warning(e)
+        PopulateWatermark.objects.set_for_model(self.model, mark)
         logger.info('Populated {} objects'.format(count))
         self._reactivate_db_debug()
         
@@ -73,7 +207,7 @@ class BaseParsedManager(models.Manager):
 class BaseParsedModel(models.Model):
     # We don't constrain UIDs to be unique, because we may have duplicates in the raw data that we want
     # to deactivate here
-    uid = models.CharField(max_length=255)
+    uid = models.CharField(max_length=255, db_index=True)
     deactivate = models.BooleanField(default=False)
 
     # link to the raw model object we're mapping to
@@ -87,7 +221,7 @@ class BaseParsedModel(models.Model):
     def get_overridable_fields(self):
         # First we get the fields for the model
         # if the model has `not_overridable`, then we exclude it from the list
-        exclude = getattr(self, 'not_overridable', [])
+        exclude = list(getattr(self, 'not_overridable', []))
         # By default, we want to exclude things like the uid
         exclude.extend(['created', 'modified', 'uid', 'id'])
         # Now iterate over the model fields to get the field names we want
@@ -98,6 +232,39 @@ class BaseParsedModel(models.Model):
         return fields
 
 
+class PopulateWatermarkManager(models.Manager):
+    def get_for_model(self, model):
+        # The watermark of the last populate of a parsed model, or None if it was never populated
+        try:
+            return self.get(model=model._meta.model_name).last_parsed
+        except self.model.DoesNotExist:
+            return None
+
+    def set_for_model(self, model, last_parsed):
+        obj, created = self.get_or_create(model=model._meta.model_name)
+        obj.last_parsed = last_parsed
+        obj.save()
+
+
+class PopulateWatermark(models.Model):
+    """
+    The latest RawModel.last_parsed that was seen by the last populate of a parsed model.
+    Incremental populates only look at raw objects that were updated after it
+    """
+    # The lowercase string name of the parsed model, model._meta.model_name
+    model = models.CharField(max_length=100, unique=True)
+    last_parsed = models.DateTimeField(null=True, blank=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = PopulateWatermarkManager()
+
+    class Meta:
+        app_label = 'raw'
+
+    def __unicode__(self):
+        return u'{} {}'.format(self.model, self.last_parsed)
+
+
 class OverrideManager(models.Manager):
     def get_from_reference(self, reference):
         # Tries to retrieve the override for a specific model instance
@@ -125,6 +292,49 @@ class OverrideManager(models.Manager):
         instance = self.model(ref_model=model, ref_uid=ref_uid)
         return instance
 
+    def merge_payloads(self, model, ref_uids, data_to_merge, create=True, batch_size=500):
+        """
+        Merges a dict into the payloads of the overrides of many objects of a model, like merge_payload
+        does for one.  Overrides that don't exist yet are created, unless create is False.
+        The existing overrides are loaded per batch, overrides that end up with the same payload are
+        updated together, and the new ones are inserted with bulk_create, all in one transaction.
+        Returns a dict of the number of overrides 'created', 'updated' and 'unchanged'
+        """
+        ref_model = model._meta.model_name
+        ref_uids = list(OrderedDict.fromkeys(ref_uids))
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+        with transaction.atomic():
+            existing = {}
+            for start in range(0, len(ref_uids), batch_size):
+                batch = ref_uids[start:start + batch_size]
+                existing.update(self.filter(ref_model=ref_model, ref_uid__in=batch).values_list('ref_uid', 'data'))
+            # new serialized payload -> ref_uids to set it on
+            to_update = {}
+            to_create = []
+            for ref_uid in ref_uids:
+                if ref_uid not in existing:
+                    if create:
+                        to_create.append(self.model(ref_model=ref_model, ref_uid=ref_uid, data=encode_payload(data_to_merge)))
+                    continue
+                current = decode_payload(existing[ref_uid])
+                data = encode_payload(dict(current, **data_to_merge))
+                if decode_payload(data) == current:
+                    counts['unchanged'] += 1
+                    continue
+                to_update.setdefault(data, []).append(ref_uid)
+            # Queryset updates skip auto_now
+            now = timezone.now()
+            for data, uids in to_update.items():
+                for start in range(0, len(uids), batch_size):
+                    batch = uids[start:start + batch_size]
+                    counts['updated'] += self.filter(ref_model=ref_model, ref_uid__in=batch).update(data=data, modified=now)
+            self.bulk_create(to_create, batch_size=batch_size)
+            counts['created'] = len(to_create)
+            # Neither update() nor bulk_create() send the signals that normally invalidate the resolver
+            if counts['created'] or counts['updated']:
+                override_resolver.invalidate()
+        return counts
+
 
 class Override(models.Model):
     # The lowercase string name of the model we're referencing, model._meta.model_name
@@ -142,10 +352,22 @@ class Override(models.Model):
 
     class Meta:
         app_label = 'raw'
+        # Overrides are looked up by the pair in get_from_reference
+        index_together = [['ref_model', 'ref_uid']]
 
     def __unicode__(self):
         return u'{} {}'.format(self.ref_model, self.ref_uid)
 
+    def save(self, *args, **kwargs):
+        # The override form stores its fields as they were posted, such as 'on' for deactivate
+        try:
+            payload = decode_payload(self.data)
+        except ValueError:
+            payload = None
+        if payload:
+            self.data = encode_payload(payload)
+        super(Override, self).save(*args, **kwargs)
+
     def _get_model(self):
         # Gets the model class from the string name
         # We assume all of the models are in the Raw app
@@ -164,24 +386,24 @@ class Override(models.Model):
 
     def get_payload(self):
         # Returns the unserialized data payload
-        if self.data == u'':
-            return {}
-        return json.loads(self.data)
+        return decode_payload(self.data)
 
     def merge_payload(self, data_to_merge):
         # Takes a dict and merges it the current payload
         current = self.get_payload()
         current.update(data_to_merge)
-        self.data = json.dumps(current)
+        self.data = encode_payload(current)
 
     def is_deactivated(self):
-        payload = self.get_payload()
-        return payload.get('deactivate', False)
+        return is_deactivated(self.get_payload())
+
+
+override_resolver.register(Override)
 
 """
 Person
 """
-class PersonManager(models.Manager):
+class PersonManager(BaseParsedManager):
     def create_from_raw(self, raw_obj):
         try:
             obj = self.get(uid=raw_obj.uid)
@@ -240,13 +462,20 @@ class ParsedPerson(TimestampMixin, BaseParsedModel):
 
     @classmethod
     def get_matcher(cls, english=True):
+        return matcher_registry.get(cls, english)
+
+    @classmethod
+    def build_matcher(cls, english=True):
         all_members = cls.objects.all()
         names = [(xx.get_name_object(english), xx) for xx in all_members]
         matcher = NameMatcher(names)
         return matcher
 
 
-class MembershipManager(models.Manager):
+matcher_registry.register(ParsedPerson)
+
+
+class MembershipManager(BaseParsedManager):
     def get_active_on_date(self, query_date):
         # Return True if a membership is active on a given query_date.
         return self.filter(start_date__lt=query_date, end_date__gt=query_date)
@@ -282,11 +511,19 @@ class MembershipManager(models.Manager):
             obj.uid = uid
             yield obj
 
-    def populate(self):
-        raw_items = RawMember.objects.all()
+    def get_raw_queryset(self):
+        return RawMember.objects.all()
+
+    def build_from_raw(self, raw_obj):
+        return list(self.create_from_raw(raw_obj))
+
+    def populate(self, full=True):
+        mark = self.get_high_water_mark()
+        raw_items = self.get_populate_queryset(full)
         for item in raw_items:
             for membership in self.create_from_raw(item):
                 membership.save()
+        PopulateWatermark.objects.set_for_model(self.model, mark)
 
 
 class ParsedMembership(TimestampMixin, BaseParsedModel):
@@ -398,6 +635,12 @@ class ParsedCommittee(TimestampMixin, BaseParsedModel):
 
 class CommitteeMembershipManager(BaseParsedManager):
     excluded = ['person', 'committee']
+    watermark_models = (RawCommittee, RawScheduleMember)
+
+    def get_changed_raw_queryset(self, since):
+        # Also re-derive the memberships of updated committees and members
+        return self.get_raw_queryset().filter(
+            Q(last_parsed__gt=since) | Q(committee__last_parsed__gt=since) | Q(member__last_parsed__gt=since))
 
     def get_active_on_date(self, query_date):
         return self.filter(start_date__lt=query_date, end_date__gt=query_date)
@@ -492,63 +735,115 @@ class ParsedCouncilMeeting(TimestampMixin, BaseParsedModel):
 
 
 class QuestionManager(BaseParsedManager):
-    
+    # Questions are built from both languages, the asker, and the meeting created from the agenda
+    watermark_models = (RawMember, RawCouncilAgenda)
+
     def create_from_raw(self, raw_obj):
         # We assume raw_obj is in English
-        
-        #obj = ParsedQuestion()
-        # we can get a lot of info from raw uid
-        raw_uid = raw_obj.uid
-        date_str = raw_uid.split('-')[1]
-        
-        # locate the council meeting/agenda in which this question appears
-        meeting_uid = u'cmeeting-{}'.format(date_str)
+        raw_cn = RawCouncilQuestion.objects.get_by_uid(raw_obj.uid[:-1] + u'c')
         try:
-            meeting = ParsedCouncilMeeting.objects.get(uid=meeting_uid)
+            meeting = ParsedCouncilMeeting.objects.get(uid=self._get_meeting_uid(raw_obj))
         except ParsedCouncilMeeting.DoesNotExist:
-            # Sometimes a meeting is cancelled or delayed - in this case we can ignore this question
-            # e.g. 2013.05.15
-            logger.warn(u'Cannot find a meeting for question:{} - required meeting uid: {}'.format(raw_uid,date_str))
-            return None #because we cannot generate a uid
+            meeting = None
+        asker_ids = [xx.asker_id for xx in (raw_obj, raw_cn) if xx.asker_id is not None]
+        asker_uids = dict(RawMember.objects.filter(pk__in=asker_ids).values_list('pk', 'uid'))
+        persons = dict((xx.uid, xx) for xx in ParsedPerson.objects.filter(uid__in=asker_uids.values()))
+        existing = {}
         if meeting is not None:
-            # Make a uid
             new_uid = ParsedQuestion.generate_uid(meeting, raw_obj.number, raw_obj.is_urgent)
-            # Get or create
+            for obj in self.filter(uid=new_uid).order_by('pk'):
+                existing.setdefault(obj.uid, obj)
+        return self._build_question(raw_obj, raw_cn, meeting, persons, asker_uids, existing)
+
+    def build_batch(self, raw_objs):
+        """
+        Builds the ParsedQuestions for a list of English RawCouncilQuestions.  The Chinese counterparts,
+        meetings, askers and existing questions are each loaded with one query for the whole list,
+        and each document is parsed once
+        """
+        raw_objs = list(raw_objs)
+        uids_cn = [xx.uid[:-1] + u'c' for xx in raw_objs]
+        counterparts = dict((xx.uid, xx) for xx in RawCouncilQuestion.objects.filter(uid__in=uids_cn))
+        meeting_uids = set(self._get_meeting_uid(xx) for xx in raw_objs)
+        meetings = dict((xx.uid, xx) for xx in ParsedCouncilMeeting.objects.filter(uid__in=meeting_uids))
+        asker_ids = set(xx.asker_id for xx in raw_objs + counterparts.values() if xx.asker_id is not None)
+        asker_uids = dict(RawMember.objects.filter(pk__in=asker_ids).values_list('pk', 'uid'))
+        persons = dict((xx.uid, xx) for xx in ParsedPerson.objects.filter(uid__in=asker_uids.values()))
+        new_uids = [ParsedQuestion.generate_uid(meetings[self._get_meeting_uid(xx)], xx.number, xx.is_urgent)
+                    for xx in raw_objs if self._get_meeting_uid(xx) in meetings]
+        existing = {}
+        for obj in self.filter(uid__in=new_uids).order_by('pk'):
+            existing.setdefault(obj.uid, obj)
+
+        res = []
+        # ids of the objects in res, since raw questions that map to the same uid share an object
+        built = set()
+        errors = 0
+        for raw_obj in raw_objs:
+            raw_cn = counterparts.get(raw_obj.uid[:-1] + u'c', None)
+            meeting = meetings.get(self._get_meeting_uid(raw_obj), None)
             try:
-                obj = ParsedQuestion.objects.get(uid=new_uid)
-            except ParsedQuestion.DoesNotExist:
-                obj = ParsedQuestion()
-                obj.uid = new_uid
-        
+                if raw_cn is None:
+                    raise RuntimeError(u'No Chinese version of the question')
+                obj = self._build_question(raw_obj, raw_cn, meeting, persons, asker_uids, existing)
+            except Exception as e:
+                logger.warn(u'Could not build question from {}: {}'.format(raw_obj.uid, e))
+                errors += 1
+                continue
+            if obj is not None and id(obj) not in built:
+                built.add(id(obj))
+                res.append(obj)
+        return res, errors
+
+    def _get_meeting_uid(self, raw_obj):
+        # The council meeting/agenda in which this question appears, from the date in the raw uid
+        return u'cmeeting-{}'.format(raw_obj.uid.split('-')[1])
+
+    def _build_question(self, raw_obj, raw_cn, meeting, persons, asker_uids, existing):
+        """
+        Builds an unsaved ParsedQuestion from the English and Chinese RawCouncilQuestions.
+        persons maps uids to ParsedPersons, asker_uids maps RawMember ids to uids,
+        and existing maps uids to the ParsedQuestions that are already in the database or built
+        earlier in the batch.  New questions are added to it
+        """
+        if meeting is None:
+            # Sometimes a meeting is cancelled or delayed - in this case we can ignore this question
+            # e.g. 2013.05.15
+            logger.warn(u'Cannot find a meeting for question:{} - required meeting uid: {}'.format(
+                raw_obj.uid, self._get_meeting_uid(raw_obj)))
+            return None #because we cannot generate a uid
+        new_uid = ParsedQuestion.generate_uid(meeting, raw_obj.number, raw_obj.is_urgent)
+        obj = existing.get(new_uid, None)
+        if obj is None:
+            obj = ParsedQuestion()
+            obj.uid = new_uid
+            # Later raw questions with the same uid update this object rather than adding another
+            existing[new_uid] = obj
+
         obj.meeting = meeting
-            
         # Match the number of question
         obj.number = raw_obj.number
         # Urgent?
         obj.urgent = raw_obj.is_urgent
         # Oral or written
         obj.question_type = ParsedQuestion.ORAL if raw_obj.is_oral else ParsedQuestion.WRITTEN
-        # Asker
-        if raw_obj.asker is not None: 
-            #raw_obj.asker is already a foreign key, and member uid does not change from raw to parsed
-            person = ParsedPerson.objects.get(uid=raw_obj.asker.uid)
+        # Asker.  The member uid does not change from raw to parsed.
+        # Sometimes the NameMatcher does not work, so no asker FK was stored in model
+        # we can try our luck in other language
+        person = None
+        for asker_id in (raw_obj.asker_id, raw_cn.asker_id):
+            if asker_id is not None:
+                person = persons.get(asker_uids.get(asker_id, None), None)
+                break
+        if person is not None:
+            obj.asker = person
         else:
-            # Sometimes the NameMatcher does not work, so no asker FK was stored in model
-            # we can try our luck in other language
-            q_otherlang = raw_obj.get_lang_counterpart()
-            if q_otherlang.asker is not None:
-                person = ParsedPerson.objects.get(uid=q_otherlang.asker.uid)    
-        if 'person' in locals():
-            if person is not None:
-                obj.asker = person
-        else:
-            logger.warn('Cannot find asker for question {} with name "{}"'.format(raw_obj.uid,raw_obj.asker))
-        
+            logger.warn(u'Cannot find asker for question {} with name "{}"'.format(raw_obj.uid, raw_obj.raw_asker))
+
         # Need to use question parser from here on
         # Need both languages
-        uid_cn = raw_obj.uid[:-1] + u'c'
         q_parser_en = raw_obj.get_parser()
-        q_parser_cn = RawCouncilQuestion.objects.get_by_uid(uid_cn).get_parser()
+        q_parser_cn = raw_cn.get_parser()
         # sometimes (rarely) parser returns a NoneType
         if q_parser_en and q_parser_cn:
             # Replier(s)
@@ -566,26 +861,41 @@ class QuestionManager(BaseParsedManager):
             # Reply body
             obj.reply_e = q_parser_en.reply_content
             obj.reply_c = q_parser_cn.reply_content
-        
+
         return obj
+
+    def get_raw_queryset(self):
+        # use English version as base, fill in Chinese info later
+        return RawCouncilQuestion.objects.filter(language=LANG_EN).order_by('date', 'number')
+
+    def get_changed_raw_queryset(self, since):
+        changed = Q(last_parsed__gt=since) | Q(asker__last_parsed__gt=since)
+        # The Chinese version of the question
+        changed_cn = RawCouncilQuestion.objects.filter(language=LANG_CN, last_parsed__gt=since)
+        en_uids = [xx[:-1] + u'e' for xx in changed_cn.values_list('uid', flat=True)]
+        if en_uids:
+            changed |= Q(uid__in=en_uids)
+        # Questions on the day of a new agenda, which may not have had a meeting before
+        agenda_dates = [agenda.start_date for agenda in RawCouncilAgenda.objects.filter(last_parsed__gt=since)]
+        if agenda_dates:
+            changed |= Q(date__in=agenda_dates)
+        return self.get_raw_queryset().filter(changed)
         
-    def populate(self, dry_run=False):
+    def populate(self, dry_run=False, full=True, batch_size=500):
         self._deactivate_db_debug()
         question_logger.deactivate = False
-        # use English version as base, fill in Chinese info later
-        en_questions = RawCouncilQuestion.objects.filter(uid__endswith=u'e').order_by('raw_date')
+        mark = self.get_high_water_mark()
+        en_questions = list(self.get_populate_queryset(full))
         count = 0
-        for raw_question in en_questions:
-            # Get or create, but without commit
-            obj = self.create_from_raw(raw_question)
-            if obj is not None:
-                try:
-                    obj.save()
-                    count += 1
-                except IntegrityError as e:
-                    logger.warning(u'Could not create from {}'.format(raw_question))
-                    logger.warning(e)
-        logger.info('Populated {} questions'.format(count))
+        errors = 0
+        # Build and write a batch at a time, so each batch loads its counterparts, meetings and askers in one go
+        for start in range(0, len(en_questions), batch_size):
+            objs, err = self.build_batch(en_questions[start:start + batch_size])
+            saved, write_err = self.write_objects(objs, batch_size)
+            count += saved
+            errors += err + write_err
+        PopulateWatermark.objects.set_for_model(self.model, mark)
+        logger.info('Populated {} questions, {} errors'.format(count, errors))
         question_logger.deactivate = True
         self._reactivate_db_debug()
         
@@ -1,14 +1,24 @@
 # coding=utf-8
+from contextlib import contextmanager
+import hashlib
+import json
 import logging
-from datetime import date
-from django.db import models
-from django.db.models import Count
+import threading
+from datetime import date, datetime
+from multiprocessing import Pool
+import os
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
 from django.utils.encoding import force_unicode
 import re
 from .. import utils
+from ..docs import cache as parse_cache
 from ..docs.agenda import CouncilAgenda, AgendaQuestion
 from ..docs.question import CouncilQuestion
 from ..docs.hansard import CouncilHansard
+from ..matchers import matcher_registry
 from ..names import NameMatcher, MemberName
 from constants import *
 
@@ -16,6 +26,95 @@ from constants import *
 logger = logging.getLogger('legcowatch')
 
 
+class UidIndex(object):
+    """
+    Identity map of the objects of a raw model by uid, for the length of a batch job or a request
+
+    The uids and primary keys of the model are loaded with one query, so looking up a uid, including
+    uids that don't exist, never queries the database again.  With full_rows, whole objects are loaded
+    up front as well, otherwise each object is fetched the first time it is asked for and then kept.
+    If uids is given, only the objects with those uids are loaded, in one query.
+    Objects created after the index is loaded are not seen.
+
+    Counts lookups answered from memory as hits, lookups of unknown uids as misses,
+    and objects that had to be fetched as fetches.
+    """
+    def __init__(self, model, full_rows=False, uids=None):
+        self.model = model
+        self.full_rows = full_rows
+        self.uids = uids
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        # uid -> list of pks
+        self._pks = None
+        # pk -> object
+        self._objects = {}
+
+    def load(self):
+        self._pks = {}
+        self._load_uids(self.uids)
+
+    def _load_uids(self, uids):
+        # Adds the objects with the uids, or every object if uids is None.  Objects that are
+        # already loaded are kept, so that they stay the same instances
+        qs = self.model.objects.all()
+        if uids is not None:
+            qs = qs.filter(uid__in=list(uids))
+        if self.full_rows or uids is not None:
+            for obj in qs.iterator():
+                self._pks.setdefault(obj.uid, []).append(obj.pk)
+                self._objects.setdefault(obj.pk, obj)
+        else:
+            for pk, uid in qs.values_list('pk', 'uid').iterator():
+                self._pks.setdefault(uid, []).append(pk)
+
+    def extend(self, full_rows=False, uids=None):
+        """
+        Widens the index to the uids, or to every object if uids is None, for a nested uid_index
+        """
+        self.full_rows = self.full_rows or full_rows
+        if self.uids is None:
+            return
+        if uids is None:
+            self.uids = None
+            if self._pks is not None:
+                self.load()
+            return
+        new_uids = set(uids) - set(self.uids)
+        if not new_uids:
+            return
+        self.uids = set(self.uids) | new_uids
+        if self._pks is not None:
+            self._load_uids(new_uids)
+
+    def get(self, uid):
+        """
+        Returns the object with the uid.  Raises DoesNotExist and MultipleObjectsReturned like QuerySet.get
+        """
+        if self._pks is None:
+            self.load()
+        pks = self._pks.get(uid, None)
+        if not pks:
+            self.misses += 1
+            raise self.model.DoesNotExist(u'{} matching uid {} does not exist.'.format(self.model.__name__, uid))
+        if len(pks) > 1:
+            raise self.model.MultipleObjectsReturned(
+                u'get() returned more than one {} with uid {}'.format(self.model.__name__, uid))
+        obj = self._objects.get(pks[0], None)
+        if obj is None:
+            obj = self.model.objects.get(pk=pks[0])
+            self._objects[pks[0]] = obj
+            self.fetches += 1
+        else:
+            self.hits += 1
+        return obj
+
+
+# The UidIndexes that are currently in use, by model, for each thread
+_uid_indexes = threading.local()
+
+
 class RawModelManager(models.Manager):
     def get_by_uid(self, uid):
         # Try to retrieve the object by either just the numerical uid
@@ -25,12 +124,60 @@ class RawModelManager(models.Manager):
 
         if isinstance(uid, int):
             uid = '{}-{}'.format(self.model.UID_PREFIX, uid)
-            obj = self.get(uid=uid)
-        elif isinstance(uid, basestring):
-            obj = self.get(uid=uid)
-        else:
+        elif not isinstance(uid, basestring):
             raise RuntimeError('Invalid UID format'.format(uid))
-        return obj
+        index = self.get_uid_index()
+        if index is not None:
+            return index.get(uid)
+        return self.get(uid=uid)
+
+    def refresh_content_hashes(self, pks, batch_size=500):
+        """
+        Recomputes the content_hash of objects whose content fields were written with a queryset update,
+        which the processors would otherwise take for changed content on their next run.
+        content_changed is left alone.  Returns the number of hashes that changed
+        """
+        pks = list(pks)
+        updated = 0
+        for start in range(0, len(pks), batch_size):
+            for obj in self.filter(pk__in=pks[start:start + batch_size]):
+                content_hash = obj.compute_content_hash()
+                if content_hash != obj.content_hash:
+                    self.filter(pk=obj.pk).update(content_hash=content_hash)
+                    updated += 1
+        return updated
+
+    def get_uid_index(self):
+        # The UidIndex that is in use for this model, if any
+        return getattr(_uid_indexes, 'indexes', {}).get(self.model, None)
+
+    @contextmanager
+    def uid_index(self, full_rows=False, uids=None):
+        """
+        Answers get_by_uid for this model from a UidIndex inside the with block, e.g.
+
+        with RawCouncilQuestion.objects.uid_index(full_rows=True) as index:
+            ...
+        logger.info(u'{} hits, {} misses'.format(index.hits, index.misses))
+
+        If an index is already in use for the model, that one is reused, and widened to cover the uids
+        of this block too, since a uid index never falls back to the database.  It keeps the extra uids
+        once the block is over
+        """
+        indexes = getattr(_uid_indexes, 'indexes', None)
+        if indexes is None:
+            indexes = _uid_indexes.indexes = {}
+        current = indexes.get(self.model, None)
+        if current is not None:
+            current.extend(full_rows=full_rows, uids=uids)
+            yield current
+            return
+        index = UidIndex(self.model, full_rows=full_rows, uids=uids)
+        indexes[self.model] = index
+        try:
+            yield index
+        finally:
+            del indexes[self.model]
 
 
 class RawModel(models.Model):
@@ -45,19 +192,86 @@ class RawModel(models.Model):
     # A unique identifier for this type of item
     # We try to generate these as early as possible, but don't enforce a uniqueness constraint
     # for flexibility
-    uid = models.CharField(max_length=100, blank=True)
+    uid = models.CharField(max_length=100, blank=True, db_index=True)
     # Page from which the Item was crawled
     crawled_from = models.TextField(blank=True)
+    # Hash of the scraped content of the object, see compute_content_hash
+    content_hash = models.CharField(max_length=40, blank=True)
+    # The last time that the scraped content actually changed, as opposed to last_parsed
+    content_changed = models.DateTimeField(null=True, blank=True)
 
     UID_PREFIX = None
+    # Bookkeeping fields that are not part of the scraped content.  The file types of FiletypeMixin
+    # are written with queryset updates, and are derived from the file rather than scraped
+    CONTENT_HASH_EXCLUDE = ('id', 'last_crawled', 'last_parsed', 'content_hash', 'content_changed',
+                            'filetype', 'filetype_stamp')
     objects = RawModelManager()
 
+    def compute_content_hash(self):
+        """
+        Returns a sha1 of the values of the content fields.  Values are normalized the way the database
+        would store them, so an object loaded from the database and the same object built from a scraped
+        item hash the same
+        """
+        values = []
+        for field in self._meta.concrete_fields:
+            if field.attname in self.CONTENT_HASH_EXCLUDE:
+                continue
+            value = getattr(self, field.attname)
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                pass
+            if isinstance(value, datetime):
+                if timezone.is_naive(value):
+                    value = timezone.make_aware(value, timezone.get_default_timezone())
+                value = value.astimezone(timezone.utc).isoformat()
+            elif isinstance(value, date):
+                value = value.isoformat()
+            values.append((field.attname, value))
+        return hashlib.sha1(json.dumps(values, default=unicode)).hexdigest()
+
     class Meta:
         abstract = True
         app_label = 'raw'
 
 
-class RawCouncilAgenda(RawModel):
+class FiletypeMixin(object):
+    """
+    For raw models with a local_filename.  Remembers the type of the file in the filetype field,
+    so libmagic is only run again when the size or mtime of the file in filetype_stamp changes
+    """
+    def get_filetype(self, full_file=None, save=True):
+        """
+        Returns one of the file types in raw.utils, or None if it can't be determined.
+        If the type had to be checked again, it is saved unless save is False
+        """
+        if full_file is None:
+            full_file = self.full_local_filename()
+        stamp = utils.file_stamp(full_file)
+        if self.filetype is None or self.filetype_stamp != stamp:
+            filetype = utils.check_file_type(full_file)
+            self.filetype = filetype if filetype is not None else utils.UNKNOWN
+            self.filetype_stamp = stamp
+            if save and self.pk is not None:
+                # Don't touch the other fields, which may have unsaved changes
+                type(self).objects.filter(pk=self.pk).update(filetype=self.filetype, filetype_stamp=stamp)
+        return self.filetype if self.filetype != utils.UNKNOWN else None
+
+    def update_filetype(self):
+        """
+        Checks the type of the local file, if it has been downloaded, without saving.  For use by the processors
+        """
+        if not self.local_filename:
+            return
+        try:
+            self.get_filetype(save=False)
+        except (RuntimeError, OSError):
+            # Not downloaded
+            pass
+
+
+class RawCouncilAgenda(FiletypeMixin, RawModel):
     """
     Storage of Scrapy items relating to LegCo agenda items
 
@@ -73,6 +287,9 @@ class RawCouncilAgenda(RawModel):
     # The name of the file saved locally on disk in the scrapy download path
     # Don't use FilePathField or FileField, since those are more for user input via forms
     local_filename = models.CharField(max_length=255, blank=True)
+    # One of the file types in raw.utils, and the size and mtime of the file when it was checked
+    filetype = models.IntegerField(null=True, blank=True)
+    filetype_stamp = models.CharField(max_length=50, blank=True)
 
     UID_PREFIX = u'council_agenda'
 
@@ -88,7 +305,7 @@ class RawCouncilAgenda(RawModel):
 
     def get_source(self):
         full_file = self.full_local_filename()
-        filetype = utils.check_file_type(full_file)
+        filetype = self.get_filetype(full_file)
         if filetype == utils.DOCX:
             src = utils.docx_to_html(full_file)
         elif filetype == utils.DOC:
@@ -97,13 +314,20 @@ class RawCouncilAgenda(RawModel):
             raise NotImplementedError(u"Unexpected filetype for uid {}".format(self.uid))
         return src
 
-    def get_parser(self):
+    def get_parser(self, use_cache=True, profile=None):
         """
-        Returns the parser for this RawCouncilAgenda object
+        Returns the parser for this RawCouncilAgenda object.
+        Parse results are kept in the parse cache unless use_cache is False.
+        With profile, the document is always parsed again so that it is profiled, see raw.docs.profiling
         """
+        if not use_cache or profile:
+            return self._build_parser(profile)
+        return parse_cache.get_or_build(CouncilAgenda, self.uid, self.full_local_filename(), self._build_parser)
+
+    def _build_parser(self, profile=None):
         src = self.get_source()
         try:
-            return CouncilAgenda(self.uid, src)
+            return CouncilAgenda(self.uid, src, profile=profile)
         except BaseException as e:
             logger.warn(u'Could not parse agenda for {}'.format(self.uid))
             logger.warn(e)
@@ -130,7 +354,7 @@ class RawCouncilAgenda(RawModel):
         return date(int(date_string[0:4]), int(date_string[4:6]), int(date_string[6:8]))
 
 
-class RawCouncilHansard(RawModel):
+class RawCouncilHansard(FiletypeMixin, RawModel):
     """
     Storage of LegCo hansard documents
     Source is Library- http://library.legco.gov.hk:1080/search~S10?/tHong+Kong+Hansard/thong+kong+hansard/1%2C3690%2C3697%2CB/browse
@@ -144,8 +368,14 @@ class RawCouncilHansard(RawModel):
     url = models.URLField(blank=True)
     # Sometimes due to bandwidth/connection, file may fail to be downloaded
     local_filename = models.CharField(max_length=255, blank=True, null=True)
+    # One of the file types in raw.utils, and the size and mtime of the file when it was checked
+    filetype = models.IntegerField(null=True, blank=True)
+    filetype_stamp = models.CharField(max_length=50, blank=True)
+    # For objects created by parts, a hash of the contents of the part files that were merged
+    merge_inputs_hash = models.CharField(max_length=40, blank=True)
     
     UID_PREFIX = 'council_hansard'
+    CONTENT_HASH_EXCLUDE = RawModel.CONTENT_HASH_EXCLUDE + ('merge_inputs_hash',)
     
     class Meta:
         ordering=['-uid']
@@ -159,7 +389,7 @@ class RawCouncilHansard(RawModel):
     
     def get_source(self):
         full_file = self.full_local_filename()
-        filetype = utils.check_file_type(full_file)
+        filetype = self.get_filetype(full_file)
         # most (if not all) are DOC
         if filetype == utils.DOC:
             src = utils.doc_to_html(full_file)
@@ -189,17 +419,26 @@ class RawCouncilHansard(RawModel):
             return None
         
         
-    def get_parser(self):
+    def get_parser(self, use_cache=True, debug_artifacts=None, profile=None):
         """
         Returns the parser for this RawCouncilansard object
+        Parse results are kept in the parse cache unless use_cache is False.
+        With debug_artifacts, the document is always parsed again so that its trees are saved,
+        see raw.docs.artifacts, and likewise with profile so that it is profiled, see raw.docs.profiling
         """
+        if not use_cache or debug_artifacts or profile:
+            return self._build_parser(debug_artifacts, profile)
+        return parse_cache.get_or_build(CouncilHansard, self.uid, self.full_local_filename(), self._build_parser,
+                                        inputs=(self.language, self.raw_date))
+
+    def _build_parser(self, debug_artifacts=None, profile=None):
         src = self.get_source()
         lang = self.language
         date = self.raw_date
         if src is None:
             return None
         try:
-            return CouncilHansard(self.uid, lang, src, date)
+            return CouncilHansard(self.uid, lang, src, date, debug_artifacts=debug_artifacts, profile=profile)
         except BaseException as e:
             logger.warn(u'Could not parse hansard for {}'.format(self.uid))
             logger.warn(e)
@@ -299,8 +538,15 @@ class RawMember(RawModel):
     @classmethod
     def get_matcher(cls, english=True):
         """
-        Returns an instance of NameMatcher that is populated with all of the names in the database
-        for use when trying to match plain text names against Member entities
+        Returns the shared NameMatcher with all of the names in the database, for use when trying
+        to match plain text names against Member entities.  It is only built again after members change
+        """
+        return matcher_registry.get(cls, english)
+
+    @classmethod
+    def build_matcher(cls, english=True):
+        """
+        Returns a new instance of NameMatcher that is populated with all of the names in the database
         """
         all_members = cls.objects.all()
         names = [(xx.get_name_object(english), xx) for xx in all_members]
@@ -312,6 +558,9 @@ class RawMember(RawModel):
         return cls.objects.annotate(num_q=Count('raw_questions')).filter(num_q__gt=0)
 
 
+matcher_registry.register(RawMember)
+
+
 class RawCouncilQuestion(RawModel):
     """
     Storage for Members' questions, from http://www.legco.gov.hk/yr13-14/english/counmtg/question/ques1314.htm#toptbl
@@ -326,13 +575,25 @@ class RawCouncilQuestion(RawModel):
     # Link to the agenda anchor with the text of the question
     subject_link = models.TextField(blank=True)
     reply_link = models.TextField(blank=True)
-    language = models.IntegerField(null=True, blank=True, choices=LANG_CHOICES)
+    # Matches the -e/-c suffix of the uid.  Filter on this rather than uid__endswith, which can't use an index
+    language = models.IntegerField(null=True, blank=True, choices=LANG_CHOICES, db_index=True)
     # Actually, this local file stores the context of reply, which also contains the question
     # Old questions does no have replies in question - need to parse hansard instead
     local_filename = models.CharField(max_length=255, null=True, blank=True)
+    # Parsed from raw_date and number_and_type by update_derived_fields(), so that questions
+    # can be filtered and ordered by them in the database
+    date = models.DateField(null=True, blank=True, db_index=True)
+    number = models.IntegerField(null=True, blank=True, db_index=True)
+    is_urgent = models.BooleanField(default=False)
+    is_oral = models.BooleanField(default=False)
+    # When fix_asker_by_parser last failed to find the asker.  It isn't tried again until the question,
+    # its file or a member changes
+    asker_fix_failed = models.DateTimeField(null=True, blank=True)
 
     UID_PREFIX = 'question'
     DATE_RE = ur'(?P<day>\d{1,2})\.(?P<mon>\d{1,2})\.(?P<year>\d{2,4})'
+    # The derived fields only change when raw_date or number_and_type do
+    CONTENT_HASH_EXCLUDE = RawModel.CONTENT_HASH_EXCLUDE + ('date', 'number', 'is_urgent', 'is_oral', 'asker_fix_failed')
 
     class Meta:
         ordering = ['-uid']
@@ -344,43 +605,48 @@ class RawCouncilQuestion(RawModel):
         else:
             return u'{}: {} on {}'.format(self.uid, force_unicode(self.asker), force_unicode(self.raw_date))
 
-    @property
-    def date(self):
-        match = re.match(self.DATE_RE, self.raw_date)
+    @classmethod
+    def parse_date(cls, raw_date):
+        match = re.match(cls.DATE_RE, raw_date or u'')
         if match is None:
             return None
         groups = match.groupdict()
         return date(int(groups['year']), int(groups['mon']), int(groups['day']))
 
-    @property
-    def is_urgent(self):
-        return u'UQ' in self.number_and_type
+    @classmethod
+    def parse_number_and_type(cls, number_and_type):
+        """
+        Returns (number, is_urgent, is_oral) from a string like u'UQ. 2 (Oral)'
+        """
+        number_and_type = number_and_type or u''
+        is_urgent = u'UQ' in number_and_type
+        is_oral = u'oral' in number_and_type.lower() or u'口頭' in number_and_type
+        match = re.search(ur'\d+', number_and_type)
+        if match is not None:
+            number = int(match.group())
+        elif is_urgent:
+            # the case for single urgent question
+            number = 0
+        else:
+            number = None
+        return number, is_urgent, is_oral
 
-    @property
-    def is_oral(self):
-        return u'oral' in self.number_and_type.lower() or u'口頭' in self.number_and_type
+    def update_derived_fields(self):
+        # Call whenever raw_date or number_and_type are set
+        self.date = self.parse_date(self.raw_date)
+        self.number, self.is_urgent, self.is_oral = self.parse_number_and_type(self.number_and_type)
 
     @property
     def is_written(self):
         return not self.is_oral
 
-    @property
-    def number(self):
-        match = re.search(ur'\d+', self.number_and_type)
-        if match is not None:
-            return int(match.group())
-        elif self.is_urgent:
-            # the case for single urgent question
-            return 0
-        else:
-            return None
-
     def get_agenda(self):
         # Try to find the RawCouncilAgenda in which this question appears
+        if self.date is None:
+            logger.warn(u'Question {} has no date, so its agenda can not be found'.format(self.uid))
+            return None
         lang = u'e' if self.language == LANG_EN else u'c'
-        split_date = self.raw_date.split('.')
-        agenda_date = u'{}{}{}'.format(split_date[2], split_date[1].zfill(2), split_date[0].zfill(2))
-        agenda_uid = u'{}-{}-{}'.format(RawCouncilAgenda.UID_PREFIX, agenda_date, lang)
+        agenda_uid = u'{}-{:%Y%m%d}-{}'.format(RawCouncilAgenda.UID_PREFIX, self.date, lang)
         try:
             agenda = RawCouncilAgenda.objects.get(uid=agenda_uid)
             return agenda
@@ -437,10 +703,20 @@ class RawCouncilQuestion(RawModel):
         else:
             return None
     
-    def get_parser(self):
+    def get_parser(self, use_cache=True, profile=None):
         """
         Returns the parser for this RawCouncilQuestion object
+        Parse results are kept in the parse cache unless use_cache is False.
+        With profile, the document is always parsed again so that it is profiled, see raw.docs.profiling
         """
+        if not use_cache or profile:
+            return self._build_parser(profile)
+        # The parser also takes some of its values from this object rather than the source file
+        inputs = (self.is_urgent, self.is_oral, self.date, self.reply_link, self.subject)
+        return parse_cache.get_or_build(CouncilQuestion, self.uid, self.full_local_filename(), self._build_parser,
+                                        inputs=inputs)
+
+    def _build_parser(self, profile=None):
         src = self.get_source() #source should be an htm file
         urgent = self.is_urgent
         oral = self.is_oral
@@ -449,7 +725,7 @@ class RawCouncilQuestion(RawModel):
         subject = self.subject
         
         try:
-            return CouncilQuestion(self.uid,date,urgent,oral,src,subject,link)
+            return CouncilQuestion(self.uid,date,urgent,oral,src,subject,link,profile=profile)
         except BaseException as e:
             logger.warn(u'Could not parse question for {}'.format(self.uid))
             logger.warn(e)
@@ -466,44 +742,97 @@ class RawCouncilQuestion(RawModel):
             return None
         
     @classmethod
-    def fix_asker_by_parser(cls):
+    def fix_asker_by_parser(cls, workers=1, chunk_size=50, retry_all=False):
         """
-        Loop over all questions without an asker Foreign Key, and attempt to use parser to fix it.
-        Returns a list of UIDs of questions still without an asker.
+        Attempts to find the askers of questions without an asker Foreign Key from their parsed files,
+        on a pool of worker processes.  Questions that failed before are only tried again if they,
+        their file or any member changed since, unless retry_all is True.
+        Returns a dict with the uids of the questions that were 'fixed' and that 'failed',
+        and the number of questions 'skipped' because they failed before.
         Advise to run this after saving questions to database with processor.
         """
-        matcher_en = RawMember.get_matcher()
-        matcher_cn = RawMember.get_matcher(False)
-        raw_questions_without_asker = cls.objects.filter(asker=None)
-        no_asker_list = []
-        for q in raw_questions_without_asker:
-            parser = q.get_parser()
-            if parser is not None:
-                asker_str = parser.asker
-                matcher = matcher_en if q.uid[-1] == u'e' else matcher_cn
-                name = MemberName(asker_str)
-                match = matcher.match(name)
-                if match is not None:
-                    member = match[1]
-                    q.asker = member
-                    q.save()
+        res = {'fixed': [], 'failed': [], 'skipped': 0}
+        # New or renamed members may match askers that couldn't be matched before
+        members_changed = RawMember.objects.aggregate(latest=Max('content_changed'))['latest']
+        pks = []
+        for pk, local_filename, failed, changed in cls.objects.filter(asker=None) \
+                .values_list('pk', 'local_filename', 'asker_fix_failed', 'content_changed'):
+            if retry_all or failed is None or (members_changed is not None and members_changed > failed) \
+                    or cls._asker_source_changed(local_filename, failed, changed):
+                pks.append(pk)
+            else:
+                res['skipped'] += 1
+        chunks = [pks[start:start + chunk_size] for start in range(0, len(pks), chunk_size)]
+        if workers <= 1 or not utils.process_pools_allowed():
+            results = map(fix_askers_chunk, chunks)
+        else:
+            # Don't let the workers inherit an open connection
+            connection.close()
+            pool = Pool(workers)
+            try:
+                results = pool.map(fix_askers_chunk, chunks)
+            finally:
+                pool.terminate()
+                pool.join()
+
+        # question pk -> RawMember pk
+        askers = {}
+        failed = []
+        for chunk in results:
+            for pk, uid, member_id in chunk:
+                if member_id is None:
+                    failed.append(pk)
+                    res['failed'].append(uid)
                 else:
-                    # Try different language counterpart
-                    q_otherlang = q.get_lang_counterpart()
-                    parser = q_otherlang.get_parser()
-                    if parser is not None:
-                        asker_str = parser.asker
-                        matcher = matcher_en if q_otherlang.uid[-1] == u'e' else matcher_cn
-                        name = MemberName(asker_str)
-                        match = matcher.match(name)
-                        if match is not None:
-                            member = match[1]
-                            q.asker = member
-                            q.save()
-                        else:
-                            no_asker_list.append(q.uid)
-                            logger.warn(u'Cannot match asker {} for question {} with effort of parser.'.format(asker_str,q.uid))
-        return no_asker_list
+                    askers[pk] = member_id
+                    res['fixed'].append(uid)
+        with transaction.atomic():
+            by_member = {}
+            for pk, member_id in askers.items():
+                by_member.setdefault(member_id, []).append(pk)
+            now = timezone.now()
+            for member_id, member_pks in by_member.items():
+                # last_parsed lets the incremental populate rebuild their ParsedQuestions
+                cls.objects.filter(pk__in=member_pks).update(asker=member_id, last_parsed=now)
+            # The asker is part of the content hash
+            cls.objects.refresh_content_hashes(askers.keys())
+            for start in range(0, len(failed), chunk_size):
+                cls.objects.filter(pk__in=failed[start:start + chunk_size]).update(asker_fix_failed=now)
+        return res
+
+    @classmethod
+    def _asker_source_changed(cls, local_filename, failed, changed):
+        # Whether a question whose asker could not be found at the time failed has changed since
+        if changed is not None and changed > failed:
+            return True
+        if not local_filename:
+            return False
+        try:
+            mtime = os.path.getmtime(utils.get_file_path(local_filename))
+        except (RuntimeError, OSError):
+            return False
+        return datetime.fromtimestamp(mtime, timezone.utc) > failed
+
+    def find_asker(self, matcher_en, matcher_cn, counterpart=None):
+        """
+        Returns the RawMember that asked this question according to the parser of its file, or that
+        of its counterpart in the other language.  Returns None if neither can be matched
+        """
+        asker_str = None
+        for q in (self, counterpart):
+            if q is None:
+                continue
+            parser = q.get_parser()
+            if parser is None:
+                continue
+            asker_str = parser.asker
+            matcher = matcher_en if q.language == LANG_EN else matcher_cn
+            match = matcher.match_string(asker_str)
+            if match is not None:
+                return match[1]
+        logger.warn(u'Cannot match asker {} for question {} with effort of parser.'.format(asker_str, self.uid))
+        return None
+
     @classmethod
     def get_from_parser(cls, parser):
         """
@@ -520,6 +849,23 @@ class RawCouncilQuestion(RawModel):
     #####End added by lpounng#####
 
 
+def fix_askers_chunk(pks):
+    """
+    Runs in a worker process for RawCouncilQuestion.fix_asker_by_parser.  Returns a list of
+    (question pk, uid, RawMember pk or None) for a list of question pks
+    """
+    matcher_en = RawMember.get_matcher()
+    matcher_cn = RawMember.get_matcher(False)
+    questions = list(RawCouncilQuestion.objects.filter(pk__in=pks))
+    counterpart_uids = [xx.uid[:-1] + (u'c' if xx.uid[-1] == u'e' else u'e') for xx in questions]
+    counterparts = dict((xx.uid, xx) for xx in RawCouncilQuestion.objects.filter(uid__in=counterpart_uids))
+    res = []
+    for q, counterpart_uid in zip(questions, counterpart_uids):
+        member = q.find_asker(matcher_en, matcher_cn, counterparts.get(counterpart_uid, None))
+        res.append((q.pk, q.uid, member.pk if member is not None else None))
+    return res
+
+
 class RawScheduleMember(RawModel):
     """
     Member records from the Schedule API
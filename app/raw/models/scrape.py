@@ -51,11 +51,20 @@ class ScrapeJob(models.Model):
     raw_response = models.TextField()
     completed = models.DateTimeField(null=True, blank=True)
     last_fetched = models.DateTimeField(null=True, blank=True)
+    # How far processing of the items file got, so that an interrupted run can resume.
+    # Reset once the whole file has been processed.  malformed_lines is kept as a record of the last run
+    checkpoint_offset = models.BigIntegerField(default=0)
+    checkpoint_items = models.IntegerField(default=0)
+    malformed_lines = models.IntegerField(default=0)
 
     objects = ScrapeJobManager()
 
     def __unicode__(self):
         return u"{}: {}".format(self.spider, self.job_id)
 
+    def reset_checkpoint(self):
+        self.checkpoint_offset = 0
+        self.checkpoint_items = 0
+
     class Meta:
         app_label = 'raw'
@@ -0,0 +1,43 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+
+class CacheVersionManager(models.Manager):
+    def get_version(self, key):
+        """
+        The current version of a key, or 0 if it was never bumped
+        """
+        res = self.filter(key=key).values_list('version', flat=True)[:1]
+        return res[0] if res else 0
+
+    def bump(self, key):
+        """
+        Increments the version of a key.  Runs in the caller's transaction, so other processes see the
+        new version once the writes it stands for are committed
+        """
+        if self.filter(key=key).update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                self.create(key=key, version=1)
+        except IntegrityError:
+            # Created by another process in the meantime
+            self.filter(key=key).update(version=F('version') + 1)
+
+
+class CacheVersion(models.Model):
+    """
+    Counters of the changes to the data behind the in process caches, such as the name matchers
+    and the override payloads.  They are kept in the database so that every process sees the changes
+    made by the others, whatever cache backend is configured
+    """
+    key = models.CharField(max_length=100, unique=True)
+    version = models.IntegerField(default=0)
+
+    objects = CacheVersionManager()
+
+    class Meta:
+        app_label = 'raw'
+
+    def __unicode__(self):
+        return u'{} {}'.format(self.key, self.version)
@@ -1,6 +1,8 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
 import re
+import threading
 
 
 def is_ascii(string):
@@ -27,6 +29,64 @@ def proper(string):
     return string
 
 
+class LRUCache(object):
+    """
+    Dict of limited size, which forgets the least recently used keys first.
+    Safe to share between threads, since matchers are shared by the views
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # Move it to the most recently used end
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Marks a cache miss, since None is a valid cached match result
+_missing = object()
+
+# Raw name string -> MemberName
+_parsed_names = LRUCache(4096)
+
+
+def parse_name(full_name):
+    """
+    Returns the MemberName for a full name string.  Each string is only parsed once, and the
+    MemberName objects are shared between callers, so they should not be modified
+    """
+    name = _parsed_names.get(full_name, None)
+    if name is None:
+        name = MemberName(full_name)
+        _parsed_names.set(full_name, name)
+    return name
+
+
 class MemberName(object):
     def __init__(self, full_name=None, english_name=None, last_name=None, chinese_name=None):
         """
@@ -200,15 +260,27 @@ class MemberName(object):
 
 class NameMatcher(object):
     """
-    Searcher class which takes a collection of MemberNames and stores them in a last name based index
-    Chinese names are stored by the Chinese character, so the index can grow quite large
+    Searcher class which takes a collection of MemberNames and finds the one that matches a name
+
+    Names are indexed by their full name, by last name and English name, and by last name and
+    anglicized Chinese name.  Any name that MemberName.__eq__ considers equal shares at least
+    one of these keys, so a match only has to compare the few names that share a key, rather
+    than every name with the same first letter.  When more than one name shares a key, the
+    first one given wins, as before.
     """
+    # Number of match results remembered by match_string()
+    MATCH_CACHE_SIZE = 2048
+
     def __init__(self, names):
         """
         :param names: list of MemberNames or list of tuples where MemberName is the first element in each tuple
         """
-        self._index = {}
-        for n in names:
+        # Key -> list of (position, name) tuples, in the order the names were given
+        self._by_full_name = {}
+        self._by_english_name = {}
+        self._by_chinese_name = {}
+        self._matches = LRUCache(self.MATCH_CACHE_SIZE)
+        for position, n in enumerate(names):
             if isinstance(n, MemberName):
                 name_obj = n
             else:
@@ -216,10 +288,15 @@ class NameMatcher(object):
             if not name_obj.is_valid():
                 # Invalid names are ignored
                 continue
-            first_letter = name_obj.last_name[0].lower()
-            if self._index.get(first_letter, None) is None:
-                self._index[first_letter] = []
-            self._index[first_letter].append(n)
+            if name_obj.english_name is None and name_obj.chinese_name is None:
+                # Can never be equal to anything
+                continue
+            entry = (position, n)
+            self._by_full_name.setdefault(name_obj.full_name, []).append(entry)
+            if name_obj.english_name is not None:
+                self._by_english_name.setdefault((name_obj.last_name, name_obj.english_name), []).append(entry)
+            if name_obj.chinese_name is not None:
+                self._by_chinese_name.setdefault((name_obj.last_name, name_obj.chinese_name), []).append(entry)
 
     def match(self, name):
         """
@@ -230,14 +307,40 @@ class NameMatcher(object):
         """
         if not name.is_valid():
             return None
-        first_letter = name.last_name[0].lower()
-        if self._index.get(first_letter, None) is None:
+        if name.english_name is None and name.chinese_name is None:
             return None
-        for n in self._index[first_letter]:
-            if isinstance(n, MemberName):
-                if n == name:
-                    return n
-            else:
-                if n[0] == name:
-                    return n
+        candidates = {}
+        for entry in self._by_full_name.get(name.full_name, []):
+            candidates[entry[0]] = entry[1]
+        if name.english_name is not None:
+            for entry in self._by_english_name.get((name.last_name, name.english_name), []):
+                candidates[entry[0]] = entry[1]
+        if name.chinese_name is not None:
+            for entry in self._by_chinese_name.get((name.last_name, name.chinese_name), []):
+                candidates[entry[0]] = entry[1]
+        if not candidates:
+            return None
+        # Names with the same full name could still have a different last name, and used to be kept apart
+        # by the first letter of the last name, so do the full comparison on the candidates in order
+        first_letter = name.last_name[0].lower()
+        for position in sorted(candidates):
+            n = candidates[position]
+            name_obj = n if isinstance(n, MemberName) else n[0]
+            if name_obj.last_name[0].lower() == first_letter and name_obj == name:
+                return n
         return None
+
+    def match_string(self, raw_name):
+        """
+        Like match(), but takes the name as a string.  The results are remembered
+
+        :param raw_name: string or None
+        :return: MemberName or None
+        """
+        if raw_name is None:
+            return None
+        res = self._matches.get(raw_name, _missing)
+        if res is _missing:
+            res = self.match(parse_name(raw_name))
+            self._matches.set(raw_name, res)
+        return res
@@ -0,0 +1,208 @@
+"""
+Resolves the Overrides of parsed models in bulk
+
+An Override stores a JSON payload of corrected field values for one parsed object, keyed on the
+model name and the object's uid.  The 'deactivate' key hides the object altogether.  Looking them
+up one object at a time costs a query and a json.loads per row, so the resolver loads every
+Override of a model with a single query, decodes the payloads once, and keeps them until an
+Override is saved or deleted.
+
+As with the name matchers in raw.matchers, the version of the payloads is bumped through the
+post_save and post_delete signals, and is a raw.versions.SharedVersion, so that the other processes
+see the changes too.  Queryset updates and bulk_create don't send signals, so code that writes
+Overrides that way has to call invalidate() itself.
+"""
+import json
+import logging
+import threading
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save, post_delete
+from raw.versions import SharedVersion
+
+
+logger = logging.getLogger('legcowatch')
+
+
+def decode_payload(data):
+    # Returns the unserialized data payload of an Override
+    if not data:
+        return {}
+    return json.loads(data)
+
+
+def is_deactivated(payload):
+    return bool(payload.get('deactivate', False))
+
+
+def encode_payload(payload):
+    """
+    Serializes a payload, with its deactivate flag stored as a JSON boolean, which is what
+    OverrideResolver.DEACTIVATED_RE looks for.  Every writer of Override.data goes through this
+    """
+    if 'deactivate' in payload:
+        payload = dict(payload, deactivate=is_deactivated(payload))
+    return json.dumps(payload)
+
+
+class OverrideResolver(object):
+    """
+    Thread safe cache of the decoded Override payloads of each parsed model
+    """
+    VERSION_KEY = u'overrides'
+    # Above this many deactivated objects, exclude_deactivated() selects them from the Override table
+    # in the query, rather than listing their uids
+    MAX_EXCLUDED_UIDS = 500
+    # Matches the payloads that deactivate their object.  Payloads are written with encode_payload,
+    # so this matches exactly the ones that is_deactivated is true for
+    DEACTIVATED_RE = r'"deactivate": true'
+
+    def __init__(self, check_interval=1.0):
+        self._lock = threading.Lock()
+        # The Override model, set by register()
+        self.model = None
+        # model name -> (version, {ref_uid: payload})
+        self._payloads = {}
+        # model -> {attname: field} of its overridable fields
+        self._fields = {}
+        self._version = SharedVersion(self.VERSION_KEY, check_interval)
+        self.hits = 0
+        self.loads = 0
+
+    def register(self, override_model):
+        """
+        Drops the cached payloads whenever an Override is saved or deleted
+        """
+        self.model = override_model
+        uid = u'override-resolver'
+        post_save.connect(self._on_change, sender=override_model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self._on_change, sender=override_model, weak=False, dispatch_uid=uid)
+
+    def _on_change(self, sender, **kwargs):
+        self.invalidate()
+
+    def get_version(self):
+        return self._version.get()
+
+    def get_payloads(self, model):
+        """
+        Returns a dict of uid -> payload of the Overrides of a parsed model, loading them if they have changed
+        """
+        name = model._meta.model_name
+        entry = self._payloads.get(name, None)
+        if entry is not None and entry[0] == self.get_version():
+            self.hits += 1
+            return entry[1]
+        with self._lock:
+            version = self.get_version()
+            entry = self._payloads.get(name, None)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            payloads = {}
+            for ref_uid, data in self.model.objects.filter(ref_model=name).values_list('ref_uid', 'data'):
+                try:
+                    payloads[ref_uid] = decode_payload(data)
+                except ValueError:
+                    logger.warn(u'Could not decode the override of {} {}'.format(name, ref_uid))
+            self._payloads[name] = (version, payloads)
+            self.loads += 1
+            return payloads
+
+    def get_payload(self, instance):
+        return self.get_payloads(type(instance)).get(instance.uid, {})
+
+    def get_fields(self, model):
+        fields = self._fields.get(model, None)
+        if fields is None:
+            fields = dict((xx.attname, xx) for xx in model().get_overridable_fields() if xx.name != 'deactivate')
+            self._fields[model] = fields
+        return fields
+
+    def _get_values(self, model, payload):
+        # The overridden values of a payload as (attname, value), converted to the field types
+        res = []
+        fields = self.get_fields(model)
+        for attname, field in fields.items():
+            if field.name not in payload:
+                continue
+            try:
+                res.append((attname, field.to_python(payload[field.name])))
+            except ValidationError:
+                logger.warn(u'Invalid override of {} {}: {}'.format(model.__name__, field.name, payload[field.name]))
+        return res
+
+    def get_deactivated_uids(self, model):
+        return [uid for uid, payload in self.get_payloads(model).items() if is_deactivated(payload)]
+
+    def apply(self, instance, payload=None):
+        """
+        Sets the overridden values of the instance's overridable fields, and its deactivate flag.
+        Values that aren't valid for their field are skipped.  Returns the instance
+        """
+        if payload is None:
+            payload = self.get_payload(instance)
+        if not payload:
+            return instance
+        for attname, value in self._get_values(type(instance), payload):
+            setattr(instance, attname, value)
+        if is_deactivated(payload):
+            instance.deactivate = True
+        return instance
+
+    def exclude_deactivated(self, queryset):
+        """
+        Filters the deactivated objects out of a queryset of a parsed model, in the database
+        """
+        queryset = queryset.filter(deactivate=False)
+        uids = self.get_deactivated_uids(queryset.model)
+        if len(uids) > self.MAX_EXCLUDED_UIDS:
+            deactivated = self.model.objects.filter(ref_model=queryset.model._meta.model_name,
+                                                    data__regex=self.DEACTIVATED_RE)
+            queryset = queryset.exclude(uid__in=deactivated.values('ref_uid'))
+        elif uids:
+            queryset = queryset.exclude(uid__in=uids)
+        return queryset
+
+    def effective(self, queryset):
+        """
+        Yields the active objects of a queryset with their overrides applied
+        """
+        payloads = self.get_payloads(queryset.model)
+        # The deactivated overrides are skipped here, rather than listed in the query
+        for obj in queryset.filter(deactivate=False).iterator():
+            payload = payloads.get(obj.uid, {})
+            if not is_deactivated(payload):
+                yield self.apply(obj, payload)
+
+    def effective_values(self, queryset, *fields):
+        """
+        Like queryset.values(*fields), for the active objects and with their overrides applied
+        """
+        payloads = self.get_payloads(queryset.model)
+        fields = list(fields) or [xx.attname for xx in queryset.model._meta.concrete_fields]
+        query_fields = fields if 'uid' in fields else fields + ['uid']
+        for row in queryset.filter(deactivate=False).values(*query_fields).iterator():
+            payload = payloads.get(row['uid'], None)
+            if payload and is_deactivated(payload):
+                continue
+            if 'uid' not in fields:
+                del row['uid']
+            if payload:
+                for attname, value in self._get_values(queryset.model, payload):
+                    if attname in row:
+                        row[attname] = value
+            yield row
+
+    def invalidate(self):
+        """
+        Marks the cached payloads as stale, in this process and, once the current transaction
+        is committed, in the others
+        """
+        self._version.bump()
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+
+
+override_resolver = OverrideResolver()
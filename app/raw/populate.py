@@ -0,0 +1,191 @@
+"""
+Runs the populate steps that create parsed models from raw models
+
+The steps form a dependency graph, since for example memberships need the ParsedPerson objects
+to exist before they can be created.  run_serial() runs the steps one after the other in this process,
+the same as calling each manager's populate().  run_parallel() shards the raw objects of each step
+across a pool of worker processes.  The workers build the parsed objects and return them as
+plain dicts of field values, and this process writes them to the database in batches,
+so there is only ever one writer.  A step is started as soon as the steps it depends on are
+written, so independent steps run at the same time.
+
+Both runners are incremental unless full is True.  Each parsed model keeps a watermark
+(see PopulateWatermark), and only raw objects updated after it are parsed again.
+"""
+from collections import OrderedDict
+import logging
+from multiprocessing import Pool
+import Queue
+from django.db import connection, reset_queries
+from raw.models import ParsedCommittee, ParsedPerson, ParsedMembership, ParsedCommitteeMembership, \
+    ParsedCouncilMeeting, ParsedQuestion, PopulateWatermark
+
+
+logger = logging.getLogger('legcowatch')
+
+
+# step name -> (parsed model, names of the steps that have to be finished first)
+POPULATE_STEPS = OrderedDict((
+    ('committees', (ParsedCommittee, ())),
+    ('persons', (ParsedPerson, ())),
+    ('memberships', (ParsedMembership, ('persons',))),
+    ('committee_memberships', (ParsedCommitteeMembership, ('committees', 'persons'))),
+    ('council_meetings', (ParsedCouncilMeeting, ())),
+    ('questions', (ParsedQuestion, ('persons', 'council_meetings'))),
+))
+
+# The steps that raw2parsed runs by default.  Questions have to be asked for explicitly
+DEFAULT_STEPS = ['committees', 'persons', 'memberships', 'committee_memberships', 'council_meetings']
+
+
+def get_ready_steps(steps, done, started):
+    """
+    Returns the steps that have not been started yet, and that have all of their dependencies done.
+    Dependencies that aren't in steps are assumed to be populated already
+    """
+    ready = []
+    for name in steps:
+        if name in started:
+            continue
+        deps = POPULATE_STEPS[name][1]
+        if all(dep in done or dep not in steps for dep in deps):
+            ready.append(name)
+    return ready
+
+
+def run_serial(steps, full=True):
+    """
+    Runs the steps in dependency order in this process
+    """
+    done = set()
+    while len(done) < len(steps):
+        ready = get_ready_steps(steps, done, done)
+        if not ready:
+            raise ValueError(u'Circular dependency between populate steps {}'.format(steps))
+        for name in ready:
+            logger.info(u'Populating {}'.format(name))
+            POPULATE_STEPS[name][0].objects.populate(full=full)
+            done.add(name)
+
+
+def object_to_dict(obj):
+    """
+    Flattens an unsaved model object into a dict of field values that can be sent between processes.
+    Foreign keys are stored as their ids
+    """
+    return dict((field.attname, getattr(obj, field.attname)) for field in obj._meta.concrete_fields)
+
+
+def _init_worker():
+    # The worker inherits the parent's database connection on fork.
+    # Drop it so that the worker opens its own instead of sharing the socket
+    connection.close()
+
+
+def build_shard(args):
+    """
+    Runs in a worker process.  Builds the parsed objects for a list of raw object primary keys,
+    and returns (step name, list of dicts, number of raw objects that failed)
+    """
+    name, pks = args
+    manager = POPULATE_STEPS[name][0].objects
+    objs, errors = manager.build_batch(manager.get_raw_queryset().filter(pk__in=pks))
+    reset_queries()
+    return name, [object_to_dict(obj) for obj in objs], errors
+
+
+class ParallelPopulator(object):
+    """
+    Runs populate steps on a process pool, writing the results from this process
+    """
+    def __init__(self, steps, workers, chunk_size=50, batch_size=500, full=True):
+        self.steps = list(steps)
+        self.workers = workers
+        self.full = full
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.counts = OrderedDict((name, {'saved': 0, 'error': 0}) for name in self.steps)
+        # step name -> watermark to record once the step is written
+        self._marks = {}
+
+    def run(self):
+        # Don't let the workers inherit an open connection
+        connection.close()
+        pool = Pool(self.workers, initializer=_init_worker)
+        results = Queue.Queue()
+        # step name -> number of shards that haven't been written yet
+        pending = {}
+        outstanding = []
+        done = set()
+        started = set()
+        try:
+            while len(done) < len(self.steps):
+                for name in get_ready_steps(self.steps, done, started):
+                    started.add(name)
+                    shards = self._get_shards(name)
+                    logger.info(u'Populating {} in {} shards'.format(name, len(shards)))
+                    if not shards:
+                        self._finish(name)
+                        done.add(name)
+                        continue
+                    pending[name] = len(shards)
+                    for shard in shards:
+                        outstanding.append(pool.apply_async(build_shard, ((name, shard),), callback=results.put))
+                if len(done) == len(self.steps):
+                    break
+                if not outstanding and not pending:
+                    raise ValueError(u'Circular dependency between populate steps {}'.format(self.steps))
+                try:
+                    name, dicts, errors = results.get(timeout=1)
+                except Queue.Empty:
+                    # Callbacks aren't called when a shard raises, so look for failures ourselves.
+                    # get() re-raises the worker's exception here
+                    for res in outstanding:
+                        if res.ready() and not res.successful():
+                            res.get()
+                    continue
+                self._write(name, dicts)
+                self.counts[name]['error'] += errors
+                pending[name] -= 1
+                if pending[name] == 0:
+                    self._finish(name)
+                    done.add(name)
+                    del pending[name]
+                outstanding = [res for res in outstanding if not res.ready()]
+        finally:
+            pool.terminate()
+            pool.join()
+        return self.counts
+
+    def _get_shards(self, name):
+        manager = POPULATE_STEPS[name][0].objects
+        self._marks[name] = manager.get_high_water_mark()
+        pks = list(manager.get_populate_queryset(self.full).values_list('pk', flat=True))
+        return [pks[start:start + self.chunk_size] for start in range(0, len(pks), self.chunk_size)]
+
+    def _finish(self, name):
+        PopulateWatermark.objects.set_for_model(POPULATE_STEPS[name][0], self._marks[name])
+        logger.info(u'Finished {}: {}'.format(name, self.counts[name]))
+
+    def _write(self, name, dicts):
+        model = POPULATE_STEPS[name][0]
+        for start in range(0, len(dicts), self.batch_size):
+            objs = [model(**data) for data in dicts[start:start + self.batch_size]]
+            # Shards are built at the same time, so a new object may have been inserted by an earlier shard
+            new_uids = [obj.uid for obj in objs if obj.pk is None]
+            if new_uids:
+                written = dict(model.objects.filter(uid__in=new_uids).values_list('uid', 'pk'))
+                for obj in objs:
+                    if obj.pk is None:
+                        obj.pk = written.get(obj.uid, None)
+            saved, errors = model.objects.write_objects(objs, self.batch_size)
+            self.counts[name]['saved'] += saved
+            self.counts[name]['error'] += errors
+            reset_queries()
+
+
+def run_parallel(steps, workers, chunk_size=50, batch_size=500, full=True):
+    """
+    Runs the steps on a pool of worker processes.  Returns a dict of saved and error counts for each step
+    """
+    return ParallelPopulator(steps, workers, chunk_size=chunk_size, batch_size=batch_size, full=full).run()
@@ -27,7 +27,9 @@ def get_processor_for_spider(spider):
 
 
 # Use an OrderedDict because some processors require data from other processors
-# It won't cause an error to run out of order, but it'll be missing data
+# It won't cause an error to run out of order, but it'll be missing data.
+# The processors list the spiders they need in depends_on, which raw.processors.runner uses
+# to run the independent ones at the same time
 PROCESS_MAP = OrderedDict([
     ('library_agenda', LibraryAgendaProcessor),
     ('library_member', LibraryMemberProcessor),
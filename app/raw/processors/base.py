@@ -1,36 +1,339 @@
+from collections import OrderedDict
 import json
+import logging
+from django.db import transaction, DatabaseError
+from django.utils.timezone import now
+
+
+logger = logging.getLogger('legcowatch')
+
+
+class BulkUpserter(object):
+    """
+    Collects new and changed model objects in memory and writes them to the database in batches
+
+    All of the existing rows of the model are loaded up front in a single query, so looking up
+    an object by its key never touches the database.  New objects are written with bulk_create and
+    existing ones are updated inside one transaction per batch, instead of one SELECT plus
+    one INSERT/UPDATE per scraped item.
+
+    For models with a content hash, like RawModels, existing objects whose content hasn't changed
+    since they were loaded are not written at all, unless skip_unchanged is False.
+    """
+    def __init__(self, model, key='uid', batch_size=500, skip_unchanged=True):
+        self.model = model
+        self.key = key
+        self.batch_size = batch_size
+        self.skip_unchanged = skip_unchanged and hasattr(model, 'compute_content_hash')
+        # key -> list of objects with that key, either loaded from the db or newly built
+        self._index = None
+        self._to_create = OrderedDict()
+        self._to_update = OrderedDict()
+        self.count_created = 0
+        self.count_updated = 0
+        self.count_unchanged = 0
+        self.count_error = 0
+
+    def prefetch(self):
+        """
+        Loads every existing row of the model into the index with one query
+        """
+        self._index = {}
+        for obj in self.model.objects.all().iterator():
+            self._index.setdefault(getattr(obj, self.key), []).append(obj)
+        logger.info(u'Prefetched {} {} objects'.format(len(self._index), self.model.__name__))
+
+    def get(self, value):
+        """
+        Returns the object for the key value, building a new (unsaved) one if it does not exist yet.
+        Returns None if more than one object has the key, like the old get_or_create code paths did.
+        """
+        if self._index is None:
+            self.prefetch()
+        objs = self._index.get(value, None)
+        if objs is None:
+            obj = self.model(**{self.key: value})
+            self._index[value] = [obj]
+            return obj
+        if len(objs) > 1:
+            logger.warn(u'Found more than one {} with {} {}'.format(self.model.__name__, self.key, value))
+            return None
+        return objs[0]
+
+    def exists(self, value):
+        """
+        True if an object with this key value is in the database or waiting to be written
+        """
+        if self._index is None:
+            self.prefetch()
+        return value in self._index
+
+    def stage(self, obj):
+        """
+        Marks an object for writing on the next flush.  Staging the same object twice is harmless.
+        """
+        if hasattr(obj, 'compute_content_hash'):
+            staged = id(obj) in self._to_create or obj.pk in self._to_update
+            content_hash = obj.compute_content_hash()
+            if content_hash == obj.content_hash and obj.pk is not None and not staged:
+                if self.skip_unchanged:
+                    self.count_unchanged += 1
+                    return
+            else:
+                obj.content_hash = content_hash
+                obj.content_changed = now()
+        if obj.pk is None:
+            self._to_create[id(obj)] = obj
+        else:
+            self._to_update[obj.pk] = obj
+        if len(self._to_create) + len(self._to_update) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all of the staged objects to the database
+        """
+        to_create = self._to_create.values()
+        to_update = self._to_update.values()
+        self._to_create = OrderedDict()
+        self._to_update = OrderedDict()
+        for start in range(0, len(to_create), self.batch_size):
+            self._create_batch(to_create[start:start + self.batch_size])
+        for start in range(0, len(to_update), self.batch_size):
+            self._update_batch(to_update[start:start + self.batch_size])
+
+    def _create_batch(self, objs):
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objs)
+            self.count_created += len(objs)
+        except DatabaseError as e:
+            # Fall back to saving one by one, so a single bad row doesn't lose the whole batch
+            logger.warn(u'Bulk insert of {} {} objects failed, retrying individually: {}'.format(
+                len(objs), self.model.__name__, e))
+            for obj in objs:
+                try:
+                    with transaction.atomic():
+                        obj.save(force_insert=True)
+                    self.count_created += 1
+                except DatabaseError as e:
+                    self.count_error += 1
+                    logger.warn(u'Could not create {} {}: {}'.format(self.model.__name__, getattr(obj, self.key), e))
+                    self._forget(obj)
+            return
+        # bulk_create does not set primary keys, so fetch them back in one query.
+        # This lets objects that are staged again later in the run be updated instead of inserted twice
+        self._fill_pks(objs)
+
+    def _update_batch(self, objs):
+        try:
+            with transaction.atomic():
+                for obj in objs:
+                    obj.save(force_update=True)
+            self.count_updated += len(objs)
+        except DatabaseError as e:
+            logger.warn(u'Batched update of {} {} objects failed, retrying individually: {}'.format(
+                len(objs), self.model.__name__, e))
+            for obj in objs:
+                try:
+                    with transaction.atomic():
+                        obj.save(force_update=True)
+                    self.count_updated += 1
+                except DatabaseError as e:
+                    self.count_error += 1
+                    logger.warn(u'Could not update {} {}: {}'.format(self.model.__name__, getattr(obj, self.key), e))
+
+    def _fill_pks(self, objs):
+        by_key = dict((getattr(obj, self.key), obj) for obj in objs)
+        rows = self.model.objects.filter(**{'{}__in'.format(self.key): by_key.keys()}).values_list(self.key, 'pk')
+        for value, pk in rows:
+            obj = by_key.get(value, None)
+            if obj is not None and obj.pk is None:
+                obj.pk = pk
+
+    def _forget(self, obj):
+        # Drop an object that could not be written, so a later get() builds a fresh one
+        value = getattr(obj, self.key)
+        objs = [xx for xx in self._index.get(value, []) if xx is not obj]
+        if objs:
+            self._index[value] = objs
+        else:
+            self._index.pop(value, None)
 
 
 class BaseProcessor(object):
     """
     Base class for processing lists of scraped Items and inserting them into the database
 
-    Subclasses should implement a process method
+    Subclasses should implement a process method.
+    Subclasses that set upsert_model can use _get_object, _stage and _flush instead of
+    querying and saving each object themselves.
+
+    Subclasses that read their items with _process_items are processed in chunks of CHECKPOINT_EVERY
+    items, each in its own transaction.  The byte offset reached in the items file is saved on the
+    ScrapeJob in the same transaction, so a run that dies resumes after the last committed chunk.
     """
-    def __init__(self, items_file_path, job=None):
+    # The model that the bulk upsert layer writes to, and the field used to look up existing objects
+    upsert_model = None
+    upsert_key = 'uid'
+    # Number of objects written per query when flushing
+    BATCH_SIZE = 500
+    # Number of items processed per transaction and checkpoint
+    CHECKPOINT_EVERY = 1000
+    # Names of the spiders whose results have to be processed before this processor runs
+    depends_on = ()
+
+    def __init__(self, items_file_path, job=None, batch_size=None, checkpoint_every=None, skip_unchanged=True):
         self.items_file_path = items_file_path
         self.job = job  # The ScrapeJob, if available
+        self.batch_size = batch_size if batch_size is not None else self.BATCH_SIZE
+        # Set to False to write every object, even when its content is the same as in the database
+        self.skip_unchanged = skip_unchanged
+        self.checkpoint_every = checkpoint_every if checkpoint_every is not None else self.CHECKPOINT_EVERY
         self._count_created = 0
         self._count_updated = 0
+        self._count_unchanged = 0
         self._count_merged = 0
+        self._count_merge_skipped = 0
         self._count_error = 0
         self._count_warning = 0
+        self._count_malformed = 0
+        self._malformed_saved = 0
+        self._upserter = None
 
     def process(self, *args, **kwargs):
         pass
 
+    def _process_items(self, handle):
+        """
+        Calls handle(item) for every item in the items file, starting from the job's checkpoint.
+        Returns the number of items handled in this run
+        """
+        offset = self.job.checkpoint_offset if self.job is not None else 0
+        if offset:
+            logger.info(u'Resuming {} from byte {}'.format(self.items_file_path, offset))
+        elif self.job is not None:
+            self.job.malformed_lines = 0
+        reader = JsonLinesReader(self.items_file_path, offset=offset)
+        counter = 0
+        for chunk in reader.chunks(self.checkpoint_every):
+            with transaction.atomic():
+                for item in chunk:
+                    handle(item)
+                    counter += 1
+                self._flush()
+                self._post_flush()
+                self._save_checkpoint(reader, len(chunk))
+        self._count_malformed += reader.malformed
+        if reader.malformed:
+            logger.warn(u'Skipped {} malformed lines in {}'.format(reader.malformed, self.items_file_path))
+        return counter
+
+    def _post_flush(self):
+        """
+        Called after each chunk has been written, for work that needs the objects' primary keys
+        """
+        pass
+
+    def _save_checkpoint(self, reader, items):
+        if self.job is None:
+            return
+        self.job.checkpoint_offset = reader.offset
+        self.job.checkpoint_items += items
+        self.job.malformed_lines += reader.malformed - self._malformed_saved
+        self._malformed_saved = reader.malformed
+        self.job.save(update_fields=['checkpoint_offset', 'checkpoint_items', 'malformed_lines'])
+
+    @property
+    def upserter(self):
+        if self._upserter is None:
+            if self.upsert_model is None:
+                raise RuntimeError('upsert_model is not defined on {}'.format(self.__class__.__name__))
+            self._upserter = BulkUpserter(self.upsert_model, key=self.upsert_key, batch_size=self.batch_size,
+                                          skip_unchanged=self.skip_unchanged)
+        return self._upserter
+
+    def _get_object(self, key):
+        """
+        Returns the existing object with the key, or a new unsaved one.  None if the key is ambiguous
+        """
+        return self.upserter.get(key)
 
-def file_wrapper(fp):
+    def _stage(self, obj):
+        """
+        Queue an object to be written to the database
+        """
+        self.upserter.stage(obj)
+
+    def _flush(self):
+        """
+        Write all queued objects, and fold the upserter's counts into the processor's counters
+        """
+        if self._upserter is None:
+            return
+        upserter = self._upserter
+        upserter.flush()
+        # The upserter may also have flushed on its own when a batch filled up, so take everything
+        # it has counted since the last time and reset it
+        self._count_created += upserter.count_created
+        self._count_updated += upserter.count_updated
+        self._count_unchanged += upserter.count_unchanged
+        self._count_error += upserter.count_error
+        upserter.count_created = upserter.count_updated = upserter.count_unchanged = upserter.count_error = 0
+
+
+class JsonLinesReader(object):
     """
-    Yields parsed JSON objects from a line separated JSON file
+    Reads parsed JSON objects from a line separated JSON file, keeping track of the byte offset
+    of the end of the last line read, so that reading can be started again from there.
+    Lines that aren't valid JSON are skipped and counted in malformed
     """
-    if isinstance(fp, basestring):
-        with open(fp, 'rb') as fp:
-            for line in fp:
-                yield json.loads(line)
-    else:
-        for line in fp:
-            yield json.loads(line)
+    def __init__(self, fp, offset=0):
+        self.fp = fp
+        self.offset = offset
+        self.malformed = 0
+
+    def __iter__(self):
+        if isinstance(self.fp, basestring):
+            with open(self.fp, 'rb') as fp:
+                for item in self._read(fp):
+                    yield item
+        else:
+            for item in self._read(self.fp):
+                yield item
 
+    def _read(self, fp):
+        if self.offset:
+            fp.seek(self.offset)
+        # Iterating over a file reads ahead, so tell() is no use here.  Count the bytes instead
+        for line in iter(fp.readline, b''):
+            self.offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                self.malformed += 1
+                logger.warn(u'Skipping malformed line ending at byte {}: {}'.format(self.offset, e))
+                continue
+            yield item
 
+    def chunks(self, size):
+        """
+        Yields lists of up to size items.  offset is at the end of the chunk when it is yielded
+        """
+        chunk = []
+        for item in self:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
+
+def file_wrapper(fp, offset=0):
+    """
+    Yields parsed JSON objects from a line separated JSON file, starting at the byte offset
+    """
+    return iter(JsonLinesReader(fp, offset=offset))
@@ -3,7 +3,7 @@ import logging
 import re
 import warnings
 from raw.models import RawCouncilAgenda, LANG_EN, LANG_CN, RawMember, GENDER_M, GENDER_F
-from raw.processors.base import BaseProcessor, file_wrapper
+from raw.processors.base import BaseProcessor
 
 
 logger = logging.getLogger('legcowatch')
@@ -13,19 +13,21 @@ class LibraryAgendaProcessor(BaseProcessor):
     """
     Class that handles the loading of Library Agenda scraped items into the RawCouncilAgenda table
     """
+    upsert_model = RawCouncilAgenda
+
     def process(self, *args, **kwargs):
         logger.info("Processing file {}".format(self.items_file_path))
-        counter = 0
-        for item in file_wrapper(self.items_file_path):
-            counter += 1
-            if item['type'] == 'LibraryResultPage':
-                # Ignore these entries
-                pass
-            if item['type'] == 'LibraryAgenda':
-                # Filter out ombudsman agendas
-                if 'Ombudsman' not in item['title_en']:
-                    self._process_agenda_item(item)
-        logger.info("{} items processed, {} created, {} updated".format(counter, self._count_created, self._count_updated))
+        counter = self._process_items(self._process_item)
+        logger.info("{} items processed, {} created, {} updated, {} unchanged".format(counter, self._count_created, self._count_updated, self._count_unchanged))
+
+    def _process_item(self, item):
+        if item['type'] == 'LibraryResultPage':
+            # Ignore these entries
+            pass
+        if item['type'] == 'LibraryAgenda':
+            # Filter out ombudsman agendas
+            if 'Ombudsman' not in item['title_en']:
+                self._process_agenda_item(item)
 
     def _process_agenda_item(self, item):
         # Should generate two items, one for Chinese and one for English
@@ -57,12 +59,12 @@ class LibraryAgendaProcessor(BaseProcessor):
         obj_en = self._get_agenda_record(uid, 'e')
         if obj_en is not None:
             obj_en = self._build_obj(obj_en, title_en, paper_number, LANG_EN, url_en, local_en, item)
-            obj_en.save()
+            self._stage(obj_en)
 
         obj_cn = self._get_agenda_record(uid, 'c')
         if obj_cn is not None:
             obj_cn = self._build_obj(obj_cn, title_cn, paper_number, LANG_CN, url_cn, local_cn, item)
-            obj_cn.save()
+            self._stage(obj_cn)
 
     def _build_obj(self, obj, title, paper_number, language, url, local_file, item):
         obj.title = title
@@ -70,6 +72,7 @@ class LibraryAgendaProcessor(BaseProcessor):
         obj.language = language
         obj.url = url
         obj.local_filename = local_file
+        obj.update_filetype()
         obj.crawled_from = item['source_url']
         obj.last_parsed = now()
         if self.job:
@@ -84,16 +87,9 @@ class LibraryAgendaProcessor(BaseProcessor):
         else:
             raise RuntimeError("Lang must be 'c' or 'e', got {}".format(lang))
 
-        try:
-            obj = RawCouncilAgenda.objects.get(uid=uid)
-            self._count_updated += 1
-        except RawCouncilAgenda.DoesNotExist:
-            obj = RawCouncilAgenda(uid=uid)
-            self._count_created += 1
-        except RawCouncilAgenda.MultipleObjectsReturned:
+        obj = self._get_object(uid)
+        if obj is None:
             warnings.warn("Found more than one item with raw id {}".format(uid), RuntimeWarning)
-            obj = None
-
         return obj
 
     def _get_local_filename(self, link, item):
@@ -2,40 +2,82 @@
 """
 Processor for Hansard
 """
+import hashlib
 import logging
+from multiprocessing import Pool
+import os
 from raw.models import RawCouncilHansard, LANG_BOTH, LANG_EN, LANG_CN
-from raw.processors.base import BaseProcessor, file_wrapper
+from raw.processors.base import BaseProcessor
+from django.conf import settings
+from django.db import connection
 from django.db.models import Count
 from django.core.exceptions import *
 from django.utils.timezone import now
 import warnings
 import re
 from raw import utils
+from raw.docs.cache import file_hash
 
 
 logger = logging.getLogger('legcowatch')
 
+# Bump this whenever merge_docx changes its output, so that merged hansards are rebuilt
+MERGE_FORMAT = 1
+
+
+def get_merge_inputs_hash(path_list):
+    """
+    Returns a sha1 of the contents of the part files, in order.  Missing files count as empty
+    """
+    h = hashlib.sha1()
+    h.update(repr(MERGE_FORMAT))
+    for path in path_list:
+        try:
+            h.update(file_hash(path) if path else '')
+        except (IOError, OSError):
+            h.update('')
+        h.update('\0')
+    return h.hexdigest()
+
+
+def merge_hansard_parts(args):
+    """
+    Runs in a worker process.  Merges the part files into one html file.  Returns (normal uid, whether it worked)
+    """
+    normal_uid, path_list, out_htmlpath = args
+    logger.info(u'Merging Hansard Parts {}'.format(normal_uid))
+    try:
+        return normal_uid, utils.merge_docx(docx_list=path_list, out_htmlpath=out_htmlpath) is not None
+    except (IOError, OSError) as e:
+        logger.warn(u'Could not write merged hansard {}: {}'.format(out_htmlpath, e))
+        return normal_uid, False
+
 
 class LibraryHansardProcessor(BaseProcessor):
     """
     Class that handles the loading of Library Hansard scraped items 
     into RawCouncilHansard table
     """
+    # Parts of a hansard share a uid, so existing records are looked up by their title instead
+    upsert_model = RawCouncilHansard
+    upsert_key = 'title'
+
     def process(self, *args, **kwargs):
         logger.info("Processing file {}".format(self.items_file_path))
-        counter = 0
-        for item in file_wrapper(self.items_file_path):
-            counter += 1
-            if item['type'] == 'LibraryResultPage':
-                # Ignore these entries
-                continue
-            if item['type'] == 'LibraryHansard':
-                self._process_hansard_item(item)
+        # Each chunk is written out before the next, so the merge below can read the parts back from the database
+        counter = self._process_items(self._process_item)
         # After all downloaded hansards are created/updated, merge the ones that are parts of a hansard.
         self._merge_parts()
-        logger.info("{} (raw) items processed, {} created, {} updated, {} warnings".format(counter, self._count_created, self._count_updated, self._count_warning))
-        logger.info("{} merged items created/updated.".format(self._count_merged))
+        logger.info("{} (raw) items processed, {} created, {} updated, {} unchanged, {} warnings".format(counter, self._count_created, self._count_updated, self._count_unchanged, self._count_warning))
+        logger.info("{} merged items created/updated, {} unchanged.".format(self._count_merged, self._count_merge_skipped))
         
+    def _process_item(self, item):
+        if item['type'] == 'LibraryResultPage':
+            # Ignore these entries
+            return
+        if item['type'] == 'LibraryHansard':
+            self._process_hansard_item(item)
+
     def _process_hansard_item(self, item):
         # Usually generate three items, floor record and EN/CN formal records
         # but can be more or less
@@ -110,7 +152,7 @@ class LibraryHansardProcessor(BaseProcessor):
             # at the moment we do not deal with floor recordings
             if obj is not None and language!=LANG_BOTH:
                 obj = self._build_obj(obj, title, date_str, language, url, local_filename, item)
-                obj.save()
+                self._stage(obj)
             #End of for loop
         
         
@@ -118,62 +160,96 @@ class LibraryHansardProcessor(BaseProcessor):
         # Search for non-unique UIDs, merge their DOCXs into one HTML file, and make a new object for it.
         ## Remember to set the field CREATED_BY_PARTS to True
         # Get the list of duplicate UIDs
-        dup_hansard_uid = RawCouncilHansard.objects.values('uid').annotate(uid_count=Count('uid')).exclude(uid_count=1)
-        for item in dup_hansard_uid:
+        dup_uids = [xx['uid'] for xx in
+                    RawCouncilHansard.objects.values('uid').annotate(uid_count=Count('uid')).exclude(uid_count=1)]
+        # Load the parts and the merged objects of all of the groups at once
+        parts = {}
+        for han in RawCouncilHansard.objects.filter(uid__in=dup_uids).order_by('uid', 'pk'):
+            parts.setdefault(han.uid, []).append(han)
+        normal = {}
+        for han in RawCouncilHansard.objects.filter(uid__in=[xx.replace('p', '') for xx in dup_uids]):
+            normal.setdefault(han.uid, []).append(han)
+
+        tasks = []
+        # normal uid -> (merged object or None, parts, relative path of the output, hash of the inputs)
+        groups = {}
+        for uid in dup_uids:
             # Firstly, check if we need to merge docs. Sometimes the parts are just appendices,
             # which we will ignore. In this case, there should be a normal UID for this object (without 'p').
-            normal_uid = item['uid'].replace('p','')
-            try:
-                normal_han = RawCouncilHansard.objects.get(uid=normal_uid)
-                #print normal_han
-                if normal_han.created_by_parts is False:
-                    # The parts are appendices. Do not process them.
-                    # if this condition is not matched, the program will continue, as we will update the old object
-                    continue
-            except MultipleObjectsReturned:
-                # Usually there should be no MultipleObjectsReturned exception.
+            normal_uid = uid.replace('p', '')
+            normal_han = normal.get(normal_uid, [])
+            if len(normal_han) > 1:
+                # Usually there should be no multiple objects.
                 # This is for a very special case on 2012.06.14
                 continue
-            except ObjectDoesNotExist:
-                # We need to create a new object
-                pass
+            merged = normal_han[0] if normal_han else None
+            if merged is not None and merged.created_by_parts is False:
+                # The parts are appendices. Do not process them.
+                continue
 
-            self._count_merged += 1
-            print(u'Merging Hansard Parts {}'.format(normal_uid))
-            # We have to either create/update the Hansard
-            # get a list of hansard objects
-            han_part = RawCouncilHansard.objects.filter(uid=item['uid']).order_by('uid') #very weird, order by uid works but title does not
+            han_part = parts[uid]
             # get their full local filepaths
-            path_list = []
-            for han in han_part:
-                path_list.append(han.full_local_filename())
+            path_list = [han.full_local_filename() for han in han_part]
             # Make a name for output path, and create a full absolute path for saving
             html_name = han_part[0].uid + '-merge'
-            out_htmlpath = han_part[0].full_local_filename().rsplit('/',1)[0] + '/' + html_name
+            out_htmlpath = han_part[0].full_local_filename().rsplit('/', 1)[0] + '/' + html_name
             # Also make a relative path in same format as other normal objects
-            local_filepath = '/'.join(out_htmlpath.rsplit('/',2)[1:])
-            # Pass the list to merger, and let it write out a file
-            html_str_or_None = utils.merge_docx(docx_list=path_list, out_htmlpath=out_htmlpath)
+            local_filepath = '/'.join(out_htmlpath.rsplit('/', 2)[1:])
+            inputs_hash = get_merge_inputs_hash(path_list)
+            if merged is not None and merged.merge_inputs_hash == inputs_hash and os.path.exists(out_htmlpath):
+                # The parts haven't changed since they were last merged
+                self._count_merge_skipped += 1
+                continue
+            groups[normal_uid] = (merged, han_part, local_filepath, inputs_hash)
+            tasks.append((normal_uid, path_list, out_htmlpath))
+
+        logger.info(u'Merging {} hansards from parts, {} unchanged'.format(len(tasks), self._count_merge_skipped))
+        for normal_uid, ok in self._run_merges(tasks):
             # Sometimes the DOC/DOCX to HTML conversion fails.
             # In this case, we cannot parse the hansard anyway, so we leave the parts as is.
-            if html_str_or_None is None:
-                print(u'DOC/DOCX to HTML conversion failed for Hansard parts {}'.format(normal_uid))
+            if not ok:
+                logger.warn(u'DOC/DOCX to HTML conversion failed for Hansard parts {}'.format(normal_uid))
+                continue
+            self._count_merged += 1
+            merged, han_part, local_filepath, inputs_hash = groups[normal_uid]
+            # Get/Create an object for merged file
+            obj = merged if merged is not None else RawCouncilHansard(uid=normal_uid)
+            obj.raw_date = han_part[0].raw_date
+            obj.language = han_part[0].language
+            obj.url = ''
+            obj.local_filename = local_filepath
+            obj.update_filetype()
+            obj.crawled_from = ''
+            obj.last_parsed = now()
+            if han_part[0].language == LANG_CN:
+                obj.title = 'H'+ han_part[0].raw_date+' '+u'(中文版)'+u'MERGE'
             else:
-                # Get/Create an object for merged file
-                obj,_ = RawCouncilHansard.objects.get_or_create(uid=normal_uid)
-                obj.raw_date = han_part[0].raw_date
-                obj.language = han_part[0].language
-                obj.url = ''
-                obj.local_filename = local_filepath
-                obj.crawled_from = ''
-                obj.last_parsed = now()
-                if han_part[0].language == LANG_CN:
-                    obj.title = 'H'+ han_part[0].raw_date+' '+u'(中文版)'+u'MERGE'
-                else:
-                    obj.title = 'H'+ han_part[0].raw_date+' '+u'(English Version)'+u'MERGE'
-                # Do not forget this
-                obj.created_by_parts = True
-                obj.save()
+                obj.title = 'H'+ han_part[0].raw_date+' '+u'(English Version)'+u'MERGE'
+            # Do not forget this
+            obj.created_by_parts = True
+            obj.merge_inputs_hash = inputs_hash
+            # Keep the content hash up to date, as the upserter would, so the next run doesn't take it for a change
+            content_hash = obj.compute_content_hash()
+            if content_hash != obj.content_hash:
+                obj.content_hash = content_hash
+                obj.content_changed = now()
+            obj.save()
+
+    def _run_merges(self, tasks):
+        """
+        Runs merge_hansard_parts on a pool of processes.  Returns a list of (normal uid, whether it worked)
+        """
+        workers = getattr(settings, 'HANSARD_MERGE_WORKERS', 1)
+        if workers <= 1 or len(tasks) <= 1 or not utils.process_pools_allowed():
+            return map(merge_hansard_parts, tasks)
+        # Don't let the workers inherit an open connection
+        connection.close()
+        pool = Pool(workers)
+        try:
+            return pool.map(merge_hansard_parts, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
 
     def _build_obj(self, obj, title, raw_date, language, url, local_file, item):
         obj.title = title
@@ -181,6 +257,7 @@ class LibraryHansardProcessor(BaseProcessor):
         obj.language = language
         obj.url = url
         obj.local_filename = local_file
+        obj.update_filetype()
         obj.crawled_from = item['source_url']
         obj.last_parsed = now()
         if self.job:
@@ -202,12 +279,9 @@ class LibraryHansardProcessor(BaseProcessor):
 
 
     def _get_or_create_hansard_record_by_title(self,title,uid):
-        try:
-            obj = RawCouncilHansard.objects.get(title=title)
-            self._count_updated += 1
-        except RawCouncilHansard.DoesNotExist:
-            obj = RawCouncilHansard(title=title,uid=uid)
-            self._count_created += 1
+        obj = self._get_object(title)
+        if obj is not None and obj.pk is None:
+            obj.uid = uid
         return obj
     
     
@@ -9,7 +9,8 @@ import shutil
 import warnings
 from raw.models import RawCouncilAgenda, LANG_EN, LANG_CN, RawMember, GENDER_M, GENDER_F
 from raw import utils
-from raw.processors.base import BaseProcessor, file_wrapper
+from raw.matchers import matcher_registry
+from raw.processors.base import BaseProcessor
 
 
 logger = logging.getLogger('legcowatch')
@@ -22,13 +23,14 @@ class LibraryMemberProcessor(BaseProcessor):
     will have two items, one for English, one for Chinese.
     This will create RawMember items for each member and combine these records
     """
+    upsert_model = RawMember
+
     def process(self, *args, **kwargs):
         logger.info("Processing file {}".format(self.items_file_path))
-        counter = 0
-        for item in file_wrapper(self.items_file_path):
-            counter += 1
-            self._process_member(item)
-        logger.info("{} items processed, {} created, {} updated".format(counter, self._count_created, self._count_updated))
+        counter = self._process_items(self._process_member)
+        # bulk_create doesn't send post_save, so the shared matchers don't know about new members
+        matcher_registry.invalidate(RawMember)
+        logger.info("{} items processed, {} created, {} updated, {} unchanged".format(counter, self._count_created, self._count_updated, self._count_unchanged))
 
     def _process_member(self, item):
         uid = self._generate_uid(item)
@@ -94,19 +96,12 @@ class LibraryMemberProcessor(BaseProcessor):
             if val is not None:
                 setattr(obj, target, json.dumps(val))
 
-        obj.save()
+        self._stage(obj)
 
     def _get_member_object(self, uid):
-        try:
-            obj = RawMember.objects.get(uid=uid)
-            self._count_updated += 1
-        except RawMember.DoesNotExist:
-            obj = RawMember(uid=uid)
-            self._count_created += 1
-        except RawMember.MultipleObjectsReturned:
+        obj = self._get_object(uid)
+        if obj is None:
             warnings.warn("Found more than one item with raw id {}".format(uid), RuntimeWarning)
-            obj = None
-
         return obj
 
     def _generate_uid(self, item):
@@ -6,8 +6,8 @@ import logging
 from urlparse import urljoin
 import re
 from raw.models import RawCouncilQuestion, LANG_EN, LANG_CN, RawMember
-from raw.names import MemberName
-from raw.processors.base import BaseProcessor, file_wrapper
+from raw.processors.base import BaseProcessor
+from django.conf import settings
 from django.utils.timezone import now
 
 
@@ -15,109 +15,111 @@ logger = logging.getLogger('legcowatch')
 
 
 class QuestionProcessor(BaseProcessor):
+    upsert_model = RawCouncilQuestion
+    # Askers are matched against the RawMembers
+    depends_on = ('library_member',)
+
+    # keys are fields in the jsonlines item, values are the fields in the model object
+    FIELD_MAP = {
+        'asker': 'raw_asker',
+        'reply_link': 'reply_link',
+        'number_and_type': 'number_and_type',
+        'date': 'raw_date',
+        'source_url': 'crawled_from',
+        'subject': 'subject',
+    }
+
     def process(self):
         logger.info("Processing file {}".format(self.items_file_path))
-        counter = 0
-        # keys are fields in the jsonlines item, values are the fields in the model object
-        field_map = {
-            'asker': 'raw_asker',
-            'reply_link': 'reply_link',
-            'number_and_type': 'number_and_type',
-            'date': 'raw_date',
-            'source_url': 'crawled_from',
-            'subject': 'subject',
-        }
-        matcher_en = RawMember.get_matcher()
-        matcher_cn = RawMember.get_matcher(False)
-        for item in file_wrapper(self.items_file_path):
-            try:
-                counter += 1
-                # For each question, fill in the raw values, then try to match against a RawMember instance
+        self._matcher_en = RawMember.get_matcher()
+        self._matcher_cn = RawMember.get_matcher(False)
+        counter = self._process_items(self._process_question)
+        #After saving all items, use parser to fix missing askers
+        askers = RawCouncilQuestion.fix_asker_by_parser(workers=getattr(settings, 'ASKER_FIX_WORKERS', 1))
+        
+        logger.info(u"{} items processed, {} created, {} updated, {} unchanged, {} errors, {} askers fixed, {} questions without asker ({} not retried)".format(counter, self._count_created, self._count_updated, self._count_unchanged, self._count_error, len(askers['fixed']), len(askers['failed']) + askers['skipped'], askers['skipped']))
+        if askers['failed']:
+            logger.warn(u'Questions without asker: {}'.format(u', '.join(askers['failed'])))
+        
+    def _process_question(self, item):
+        try:
+            # For each question, fill in the raw values, then try to match against a RawMember instance
 
-                # Generate a uid and get the object
-                uid = self._generate_uid(item)
-                obj, created = RawCouncilQuestion.objects.get_or_create(uid=uid)
-                if created:
-                    self._count_created += 1
-                else:
-                    self._count_updated += 1
+            # Generate a uid and get the object
+            uid = self._generate_uid(item)
+            obj = self._get_object(uid)
+            if obj is None:
+                raise RuntimeError(u'Found more than one question with uid {}'.format(uid))
 
-                # Fill in the last parsed and last crawled values
-                if self.job is not None:
-                    obj.last_crawled = self.job.completed
-                obj.last_parsed = now()
+            # Fill in the last parsed and last crawled values
+            if self.job is not None:
+                obj.last_crawled = self.job.completed
+            obj.last_parsed = now()
 
-                # Fill in the items that can be copied directly
-                for k, v in field_map.items():
-                    val = item.get(k, None)
-                    setattr(obj, v, val)
+            # Fill in the items that can be copied directly
+            for k, v in self.FIELD_MAP.items():
+                val = item.get(k, None)
+                setattr(obj, v, val)
+            obj.update_derived_fields()
 
-                if obj.reply_link is None:
-                    obj.reply_link = u''
+            if obj.reply_link is None:
+                obj.reply_link = u''
 
-                # the subject_link is sometimes a relative path, so convert it to an absolute url
-                subject_link = item.get('subject_link', u'')
-                if subject_link != u'':
-                    abs_url = urljoin(item['source_url'], subject_link)
-                    obj.subject_link = abs_url
+            # the subject_link is sometimes a relative path, so convert it to an absolute url
+            subject_link = item.get('subject_link', u'')
+            if subject_link != u'':
+                abs_url = urljoin(item['source_url'], subject_link)
+                obj.subject_link = abs_url
 
-                # Convert the language from the string to the constants
-                lang = LANG_CN if item['language'] == u'C' else LANG_EN
-                obj.language = lang
-                if lang == LANG_CN:
-                    matcher = matcher_cn
-                else:
-                    matcher = matcher_en
+            # Convert the language from the string to the constants
+            lang = LANG_CN if item['language'] == u'C' else LANG_EN
+            obj.language = lang
+            if lang == LANG_CN:
+                matcher = self._matcher_cn
+            else:
+                matcher = self._matcher_en
 
-                # Try to find the RawMember object that matches the asker
-                # There will still be some askers not matched - we will use parser to fix them soon
-                raw_name = item['asker']
-                # Some postprocessing
-                # Get rid of 'Hon', '議員' and ''
-                raw_name = raw_name.replace(u'Hon',u'')
-                raw_name = raw_name.replace(u'議員',u'')
-                
-                # Get rid of heading and tailing spaces
-                if raw_name[0]==u' ':
-                    raw_name = raw_name[1:]
-                if raw_name[-1]==u' ':
-                    raw_name = raw_name[:-1]
-                
-                # Try to match the name with RawMember
-                name = MemberName(raw_name)
-                match = matcher.match(name)
-                if match is not None:
-                    member = match[1]
-                    obj.asker = member
-                else:
-                    pass
-                    #logger.warn(u'Cannot match asker "{}" with members in database'.format(raw_name))
-                    
-                # Get the local path of reply content
-                try:
-                    obj.local_filename = item['files'][0]['path']
-                except IndexError:
-                    obj.local_filename = None
-                    logger.warn(u'Could not get local path for question {} from date {}'.format(item['number_and_type'], item['date']))
-                
-                # Sometimes the reply link is not available yet,
-                # and sometimes the meeting was cancelled or deferred
-                # In these cases, forget about them.
-                if obj.local_filename is not None:
-                    obj.save()
+            # Try to find the RawMember object that matches the asker
+            # There will still be some askers not matched - we will use parser to fix them soon
+            raw_name = item['asker']
+            # Some postprocessing
+            # Get rid of 'Hon', '議員' and ''
+            raw_name = raw_name.replace(u'Hon',u'')
+            raw_name = raw_name.replace(u'議員',u'')
+            
+            # Get rid of heading and tailing spaces
+            if raw_name[0]==u' ':
+                raw_name = raw_name[1:]
+            if raw_name[-1]==u' ':
+                raw_name = raw_name[:-1]
+            
+            # Try to match the name with RawMember
+            match = matcher.match_string(raw_name)
+            if match is not None:
+                member = match[1]
+                obj.asker = member
+            else:
+                pass
+                #logger.warn(u'Cannot match asker "{}" with members in database'.format(raw_name))
                 
-            except (KeyError, RuntimeError) as e:
-                self._count_error += 1
-                logger.warn(u'Could not process question {} from date {}'.format(item['number_and_type'], item['date']))
-                logger.warn(unicode(e))
-                continue
-        #After saving all items, use parser to fix missing askers
-        no_asker_list = RawCouncilQuestion.fix_asker_by_parser()
-        
-        logger.info(u"{} items processed, {} created, {} updated, {} errors, {} questions without asker".format(counter, self._count_created, self._count_updated, self._count_error, len(no_asker_list)))
-        #for debugging
-        print(no_asker_list)
-        
+            # Get the local path of reply content
+            try:
+                obj.local_filename = item['files'][0]['path']
+            except IndexError:
+                obj.local_filename = None
+                logger.warn(u'Could not get local path for question {} from date {}'.format(item['number_and_type'], item['date']))
+            
+            # Sometimes the reply link is not available yet,
+            # and sometimes the meeting was cancelled or deferred
+            # In these cases, forget about them.
+            if obj.local_filename is not None:
+                self._stage(obj)
+            
+        except (KeyError, RuntimeError) as e:
+            self._count_error += 1
+            logger.warn(u'Could not process question {} from date {}'.format(item['number_and_type'], item['date']))
+            logger.warn(unicode(e))
+
     def _generate_uid(self, item):
         """
         UIDs for questions are of the form 'question-09.10.2013-1-e' (question-<date>-<number>-<lang>)
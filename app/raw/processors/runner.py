@@ -0,0 +1,177 @@
+"""
+Runs the processors of several spiders as a dependency graph
+
+Each processor lists the spiders it needs in depends_on.  run_stages() starts a stage as soon as
+all of the stages it depends on have finished, on a pool of processes or threads, so for example the
+library_hansard processor doesn't have to wait for the schedule chain.  When a stage fails,
+the stages that depend on it are skipped and the rest carry on.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+import logging
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import Queue
+import time
+from django.conf import settings
+from django.db import connection
+from django.db.backends import BaseDatabaseWrapper
+from django.db.backends.util import CursorWrapper
+from raw import utils
+from raw.models import ScrapeJob
+from raw.processors import PROCESS_MAP, get_processor_for_spider
+
+
+logger = logging.getLogger('legcowatch')
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_SKIPPED = 'skipped'
+STATUS_NO_JOB = 'no job'
+
+
+@contextmanager
+def sql_logging_disabled():
+    """
+    Stops Django from keeping every query in memory while DEBUG is on
+    """
+    if not settings.DEBUG:
+        yield
+        return
+    original = BaseDatabaseWrapper.make_debug_cursor
+    BaseDatabaseWrapper.make_debug_cursor = lambda self, cursor: CursorWrapper(cursor, self)
+    try:
+        yield
+    finally:
+        BaseDatabaseWrapper.make_debug_cursor = original
+
+
+def process_latest_job(spider_name):
+    """
+    Processes the items file of the latest completed ScrapeJob of a spider.
+    Returns False if the spider has no completed jobs
+    """
+    try:
+        job = ScrapeJob.objects.latest_complete_job(spider_name)
+    except ScrapeJob.DoesNotExist:
+        logger.warn("No jobs found for spider {}".format(spider_name))
+        return False
+
+    items_file = job.raw_response # a jsonl file in ./scrapes
+
+    # Get the processor and run it
+    processor = get_processor_for_spider(spider_name)
+    logger.info('Processing file {} from ScrapeJob {}'.format(items_file, job.id))
+    processor(items_file, job).process()
+
+    # Log that the job was processed just now, and start from the top if it is processed again
+    job.last_fetched = datetime.now()
+    job.reset_checkpoint()
+    job.save()
+    return True
+
+
+def get_dependencies(spider_name):
+    return get_processor_for_spider(spider_name).depends_on
+
+
+def get_ready_stages(stages, finished, started):
+    """
+    Returns the stages that have not been started yet, and that have all of their dependencies finished.
+    Dependencies that aren't in stages are assumed to be processed already
+    """
+    ready = []
+    for name in stages:
+        if name in started:
+            continue
+        if all(dep in finished or dep not in stages for dep in get_dependencies(name)):
+            ready.append(name)
+    return ready
+
+
+def run_stage(name):
+    """
+    Runs in a worker.  Returns (name, status, seconds taken, error message)
+    """
+    start = time.time()
+    try:
+        if process_latest_job(name):
+            status, error = STATUS_DONE, None
+        else:
+            status, error = STATUS_NO_JOB, None
+    except Exception as e:
+        logger.exception(u'Processing {} failed'.format(name))
+        status, error = STATUS_FAILED, unicode(e)
+    finally:
+        # Threads each open their own connection, which would otherwise be left open
+        connection.close()
+    return name, status, time.time() - start, error
+
+
+def _init_worker():
+    # Drop the connection inherited on fork, so the worker opens its own
+    connection.close()
+
+
+def run_stages(stages, workers=4, use_threads=False):
+    """
+    Processes the spiders in stages, in dependency order on a pool of workers.
+    Returns an OrderedDict of spider name -> {'status', 'seconds', 'error'}, in the order of PROCESS_MAP
+    """
+    for name in stages:
+        if name not in PROCESS_MAP:
+            raise ValueError(u'Unknown spider {}'.format(name))
+    stages = [name for name in PROCESS_MAP if name in stages]
+    timings = OrderedDict((name, {'status': None, 'seconds': None, 'error': None}) for name in stages)
+    # Such as in Celery's prefork workers, which are daemonic
+    if not use_threads and not utils.process_pools_allowed():
+        logger.info(u'Not allowed to start processes here, so processing on threads')
+        use_threads = True
+    if use_threads:
+        # The processors don't start pools of their own from these threads
+        pool = ThreadPool(workers, initializer=utils.disallow_process_pools)
+    else:
+        connection.close()
+        pool = Pool(workers, initializer=_init_worker)
+    results = Queue.Queue()
+    started = set()
+    # Stages that are done or failed, and so won't be waited on any more
+    finished = set()
+    running = 0
+    try:
+        while len(finished) < len(stages):
+            ready = get_ready_stages(stages, finished, started)
+            for name in ready:
+                started.add(name)
+                failed_deps = [dep for dep in get_dependencies(name)
+                               if dep in timings and timings[dep]['status'] in (STATUS_FAILED, STATUS_SKIPPED)]
+                if failed_deps:
+                    logger.warn(u'Skipping {}, since {} failed'.format(name, u', '.join(failed_deps)))
+                    timings[name]['status'] = STATUS_SKIPPED
+                    finished.add(name)
+                    continue
+                logger.info(u'Starting {}'.format(name))
+                pool.apply_async(run_stage, (name,), callback=results.put)
+                running += 1
+            if len(finished) == len(stages):
+                break
+            if running == 0:
+                if not ready:
+                    raise ValueError(u'Circular dependency between processors {}'.format(stages))
+                # Skipped stages may have made more stages ready
+                continue
+            try:
+                # A timeout keeps the wait interruptible
+                name, status, seconds, error = results.get(timeout=1)
+            except Queue.Empty:
+                continue
+            running -= 1
+            timings[name].update({'status': status, 'seconds': seconds, 'error': error})
+            finished.add(name)
+            logger.info(u'Finished {} in {:.1f}s: {}'.format(name, seconds, status))
+    finally:
+        # Nothing is left running unless we got here through an exception
+        pool.terminate()
+        pool.join()
+    return timings
@@ -1,26 +1,72 @@
+from collections import OrderedDict
 from datetime import datetime
 from django.utils import timezone
 import logging
-import warnings
 
 from raw.models import RawScheduleMember, RawCommittee, RawCommitteeMembership, RawMeetingCommittee, RawMeeting
-from raw.processors.base import BaseProcessor, file_wrapper
+from raw.processors.base import BaseProcessor
 
 
 logger = logging.getLogger('legcowatch')
 
 
 class BaseScheduleProcessor(BaseProcessor):
+    """
+    Processors for the tables of the council schedule database.  Rows refer to each other by id,
+    so before processing, _preload loads the objects that will be referred to into maps, and foreign keys
+    are resolved from those instead of one query per row.  References that can't be resolved are
+    counted and reported once at the end, in _report_missing.
+    """
     # Doing some refactoring, but don't want to affect other processors
     model = None
+    # Number of example uids logged for each kind of missing reference
+    MISSING_EXAMPLES = 10
+
+    def __init__(self, *args, **kwargs):
+        super(BaseScheduleProcessor, self).__init__(*args, **kwargs)
+        # model name -> OrderedDict of uids that could not be found, in the order they were seen
+        self._missing = OrderedDict()
+
+    @property
+    def upsert_model(self):
+        return self.model
 
     def process(self, *args, **kwargs):
         logger.info("Processing file {}".format(self.items_file_path))
-        counter = 0
-        for item in file_wrapper(self.items_file_path):
-            counter += 1
-            self._process_item_wrapper(item)
-        logger.info("{} items processed, {} created, {} updated, {} errors".format(counter, self._count_created, self._count_updated, self._count_error))
+        self._preload()
+        counter = self._process_items(self._process_item_wrapper)
+        self._report_missing()
+        logger.info("{} items processed, {} created, {} updated, {} unchanged, {} errors".format(counter, self._count_created, self._count_updated, self._count_unchanged, self._count_error))
+
+    def _preload(self):
+        """
+        Called before the items are processed, to load the objects that they refer to
+        """
+        pass
+
+    def _get_uid_map(self, model):
+        """
+        Returns a dict of uid -> pk of all of the objects of a model, in one query
+        """
+        res = {}
+        for uid, pk in model.objects.values_list('uid', 'pk').order_by('pk'):
+            # Keep the first if a uid is duplicated
+            res.setdefault(uid, pk)
+        return res
+
+    def _resolve(self, uid_map, model, uid):
+        """
+        Returns the pk for the uid, or None and remembers the uid as missing
+        """
+        pk = uid_map.get(uid, None)
+        if pk is None:
+            self._missing.setdefault(model.__name__, OrderedDict())[uid] = True
+        return pk
+
+    def _report_missing(self):
+        for name, uids in self._missing.items():
+            examples = u', '.join(uids.keys()[:self.MISSING_EXAMPLES])
+            logger.warn(u'Could not find {} {} objects, e.g. {}'.format(len(uids), name, examples))
 
     def _process_item(self, item, obj):
         raise NotImplementedError()
@@ -37,18 +83,6 @@ class BaseScheduleProcessor(BaseProcessor):
             obj.last_crawled = self.job.completed
         self._process_item(item, obj)
 
-    def _get_object(self, uid):
-        try:
-            obj = self.model.objects.get(uid=uid)
-            self._count_updated += 1
-        except self.model.DoesNotExist:
-            obj = self.model(uid=uid)
-            self._count_created += 1
-        except self.model.MultipleObjectsReturned:
-            warnings.warn("Found more than one item with raw id {}".format(uid), RuntimeWarning)
-            obj = None
-        return obj
-
     def _generate_uid(self, item):
         raise NotImplementedError()
 
@@ -63,7 +97,7 @@ class ScheduleMemberProcessor(BaseScheduleProcessor):
         fields = ['last_name_c', 'first_name_c', 'last_name_e', 'first_name_e', 'english_name']
         for f in fields:
             setattr(obj, f, item.get(f, None))
-        obj.save()
+        self._stage(obj)
 
     def _generate_uid(self, item):
         return 'smember-{}'.format(item['id'])
@@ -76,7 +110,7 @@ class ScheduleCommitteeProcessor(BaseScheduleProcessor):
         fields = ['code', 'name_e', 'name_c', 'url_e', 'url_c']
         for f in fields:
             setattr(obj, f, item.get(f, None))
-        obj.save()
+        self._stage(obj)
 
     def _generate_uid(self, item):
         return '{}-{}'.format(RawCommittee.UID_PREFIX, item['id'])
@@ -84,19 +118,18 @@ class ScheduleCommitteeProcessor(BaseScheduleProcessor):
 
 class ScheduleMeetingCommitteeProcessor(BaseScheduleProcessor):
     model = RawMeetingCommittee
+    depends_on = ('schedule_committee',)
+
+    def _preload(self):
+        self._committees = self._get_uid_map(RawCommittee)
 
     def _process_item(self, item, obj):
         obj.slot_id = int(item['slot_id'])
         cid = int(item['committee_id'])
         obj._committee_id = cid
-        try:
-            cuid = 'committee-{}'.format(cid)
-            committee = RawCommittee.objects.get(uid=cuid)
-        except RawCommittee.DoesNotExist:
-            logger.warn('Could not find committee {}'.format(cuid))
-            committee = None
-        obj.committee = committee
-        obj.save()
+        cuid = 'committee-{}'.format(cid)
+        obj.committee_id = self._resolve(self._committees, RawCommittee, cuid)
+        self._stage(obj)
 
     def _generate_uid(self, item):
         return 'meeting_committee-{}'.format(item['id'])
@@ -104,6 +137,11 @@ class ScheduleMeetingCommitteeProcessor(BaseScheduleProcessor):
 
 class ScheduleMembershipProcessor(BaseScheduleProcessor):
     model = RawCommitteeMembership
+    depends_on = ('schedule_member', 'schedule_committee')
+
+    def _preload(self):
+        self._members = self._get_uid_map(RawScheduleMember)
+        self._committees = self._get_uid_map(RawCommittee)
 
     def _process_item(self, item, obj):
         fields = ['post_e', 'post_c']
@@ -126,27 +164,17 @@ class ScheduleMembershipProcessor(BaseScheduleProcessor):
         # Try to find the member and committee objects
         mid = int(item['member_id'])
         obj._member_id = mid
-        try:
-            muid = '{}-{}'.format(RawScheduleMember.UID_PREFIX, mid)
-            member = RawScheduleMember.objects.get(uid=muid)
-        except RawScheduleMember.DoesNotExist:
-            logger.warn('Could not find member {}'.format(muid))
-            member = None
-        obj.member = member
+        muid = '{}-{}'.format(RawScheduleMember.UID_PREFIX, mid)
+        obj.member_id = self._resolve(self._members, RawScheduleMember, muid)
 
         cid = int(item['committee_id'])
         obj._committee_id = cid
-        try:
-            cuid = '{}-{}'.format(RawCommittee.UID_PREFIX, cid)
-            committee = RawCommittee.objects.get(uid=cuid)
-        except RawCommittee.DoesNotExist:
-            # Seems like there are actually a large number
-            # of committees that are referenced in the Membership table
-            # but are not in the Committee table
-            logger.warn('Could not find committee {}'.format(cuid))
-            committee = None
-        obj.committee = committee
-        obj.save()
+        cuid = '{}-{}'.format(RawCommittee.UID_PREFIX, cid)
+        # Seems like there are actually a large number
+        # of committees that are referenced in the Membership table
+        # but are not in the Committee table
+        obj.committee_id = self._resolve(self._committees, RawCommittee, cuid)
+        self._stage(obj)
 
     def _generate_uid(self, item):
         return '{}-{}'.format(RawCommitteeMembership.UID_PREFIX, item['id'])
@@ -154,6 +182,20 @@ class ScheduleMembershipProcessor(BaseScheduleProcessor):
 
 class ScheduleMeetingProcessor(BaseScheduleProcessor):
     model = RawMeeting
+    depends_on = ('schedule_meeting_committee',)
+
+    def __init__(self, *args, **kwargs):
+        super(ScheduleMeetingProcessor, self).__init__(*args, **kwargs)
+        # meeting uid -> set of RawCommittee pks to add once the meetings have been written
+        self._pending_committees = {}
+
+    def _preload(self):
+        # slot id -> pks of the committees meeting in that slot
+        self._slot_committees = {}
+        for slot_id, committee_id in RawMeetingCommittee.objects.exclude(committee=None) \
+                .values_list('slot_id', 'committee_id'):
+            self._slot_committees.setdefault(slot_id, []).append(committee_id)
+        self._empty_slots = 0
 
     def _process_item(self, item, obj):
         fields = [
@@ -174,24 +216,44 @@ class ScheduleMeetingProcessor(BaseScheduleProcessor):
         obj.meeting_id = item['id']
         slot = int(item['slot_id'])
         obj.slot_id = slot
-        # Lookup the committee from the RawMeetingCommittee table
-        mtg_cmt = RawMeetingCommittee.objects.filter(slot_id=slot)
-        logger.info('mtg_cmt = {}'.format(mtg_cmt))
-        if len(mtg_cmt) == 0:
-            logger.warn('No committees for slot {}'.format(slot))
-            mtg_cmt = None
-            obj.save()
-        if mtg_cmt is not None:
-            #obj.committees.add([xx.committee for xx in mtg_cmt])
-        #obj.save()
-            """Modified - lpounng"""
-            # need to create an object first before filling in a Many-to-Many Relation.
-            obj.save()
-            for xx in mtg_cmt:
-                obj = RawMeeting.objects.get_by_uid(obj.uid)
-                obj.committees.add(xx.committee)
-            """End modified"""
-        
+        # Lookup the committees from the RawMeetingCommittee table
+        committees = self._slot_committees.get(slot, [])
+        if len(committees) == 0:
+            self._empty_slots += 1
+        self._stage(obj)
+        # need to create an object first before filling in a Many-to-Many Relation,
+        # so the committees are added after all of the meetings have been written
+        self._pending_committees.setdefault(obj.uid, set()).update(committees)
+
+    def _post_flush(self):
+        # Write the through table rows directly, looking up the rows that exist already in batches
+        # and bulk inserting the rest, instead of an add() per meeting
+        field = RawMeeting._meta.get_field('committees')
+        through = field.rel.through
+        meeting_col = '{}_id'.format(field.m2m_field_name())
+        committee_col = '{}_id'.format(field.m2m_reverse_field_name())
+        wanted = set()
+        for uid, committees in self._pending_committees.items():
+            obj = self._get_object(uid)
+            if obj is None or obj.pk is None:
+                continue
+            wanted.update((obj.pk, cid) for cid in committees)
+        self._pending_committees = {}
+        if not wanted:
+            return
+        meeting_pks = sorted(set(xx[0] for xx in wanted))
+        existing = set()
+        for start in range(0, len(meeting_pks), self.batch_size):
+            batch = meeting_pks[start:start + self.batch_size]
+            existing.update(through.objects.filter(**{'{}__in'.format(meeting_col): batch})
+                            .values_list(meeting_col, committee_col))
+        rows = [through(**{meeting_col: mid, committee_col: cid}) for mid, cid in sorted(wanted - existing)]
+        through.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def _report_missing(self):
+        super(ScheduleMeetingProcessor, self)._report_missing()
+        if self._empty_slots:
+            logger.warn(u'{} meetings have no committees for their slot'.format(self._empty_slots))
 
     def _generate_uid(self, item):
         return '{}-{}'.format(RawMeeting.UID_PREFIX,item['id'])
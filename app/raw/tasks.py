@@ -8,10 +8,8 @@ from scrapy import log, signals
 from scrapy.utils.project import get_project_settings
 import os
 from raw import processors
+from raw.processors import runner
 from raw.models import ScrapeJob
-from django.conf import settings
-from django.db.backends import BaseDatabaseWrapper
-from django.db.backends.util import CursorWrapper
 
 logger = logging.getLogger('legcowatch')
 
@@ -115,28 +113,20 @@ def process_scrape(spider_name):
     :param spider_name: str name of the spider that produced the results
     :return:
     """
-    try:
-        job = ScrapeJob.objects.latest_complete_job(spider_name)
-    except ScrapeJob.DoesNotExist:
-        logger.warn("No jobs found for spider {}".format(spider_name))
-        return
-
-    items_file = job.raw_response # a jsonl file in ./scrapes
-
-    # Disable SQL logging
-    if settings.DEBUG:
-        original = BaseDatabaseWrapper.make_debug_cursor
-        BaseDatabaseWrapper.make_debug_cursor = lambda self, cursor: CursorWrapper(cursor, self)
-
-    # Get the processor and run it
-    processor = processors.get_processor_for_spider(spider_name)
-    logger.info('Processing file {} from ScrapeJob {}'.format(items_file, job.id))
-    processor(items_file, job).process()
+    with runner.sql_logging_disabled():
+        runner.process_latest_job(spider_name)
+    return
 
-    if settings.DEBUG:
-        BaseDatabaseWrapper.make_debug_cursor = original
 
-    # Log that the job was processed just now
-    job.last_fetched = datetime.now()
-    job.save()
-    return
+@shared_task
+def process_all(spiders=None, workers=4, use_threads=True):
+    """
+    Process the latest scrapes of all of the spiders in PROCESS_MAP, or just those in spiders.
+    Processors run at the same time on a pool of workers as soon as the ones they depend on are done.
+    The workers are threads by default, since Celery's prefork workers can't start processes of their own
+    :return: OrderedDict of spider name -> dict of the status and time taken
+    """
+    if spiders is None:
+        spiders = processors.PROCESS_MAP.keys()
+    with runner.sql_logging_disabled():
+        return runner.run_stages(spiders, workers=workers, use_threads=use_threads)
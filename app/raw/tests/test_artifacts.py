@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the debug artifacts of the document parsers
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import lxml.html
+from raw.docs import artifacts
+
+
+logging.disable(logging.CRITICAL)
+
+
+class ArtifactsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.tree = lxml.html.fromstring(u'<html><body><p>立法會</p></body></html>')
+
+    def dump(self, enabled=None, **settings):
+        with override_settings(DEBUG_ARTIFACTS_PATH=self.tmpdir, **settings):
+            path = artifacts.dump_tree('hansard', 'cm20140709-translate-e', 'cleaned', self.tree, enabled)
+        artifacts.writer.flush()
+        return path
+
+    def test_off_by_default(self):
+        self.assertIsNone(self.dump(DEBUG_ARTIFACTS=False))
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_enabled_per_call(self):
+        path = self.dump(enabled=True, DEBUG_ARTIFACTS=False)
+        self.assertEqual(path, os.path.join(self.tmpdir, 'hansard', 'cm20140709-translate-e_cleaned.html.gz'))
+        with gzip.open(path, 'rb') as f:
+            self.assertEqual(f.read().decode('utf-8'), u'<html><body><p>立法會</p></body></html>')
+        # Disabling it for one call wins over the setting
+        os.remove(path)
+        self.assertIsNone(self.dump(enabled=False, DEBUG_ARTIFACTS=True))
+
+    def test_enabled_by_setting(self):
+        path = self.dump(DEBUG_ARTIFACTS=True)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
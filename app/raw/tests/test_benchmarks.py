@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the parser benchmark and its regression check
+
+from django.test import TestCase
+import logging
+from raw.benchmarks import parsers, sanitize
+
+
+logging.disable(logging.CRITICAL)
+
+
+class ParserBenchmarkTestCase(TestCase):
+    def test_fixtures(self):
+        documents = parsers.find_documents([parsers.FIXTURES_PATH])
+        self.assertEqual([xx[:2] for xx in documents], [
+            ('agenda', 'council_agenda-20130508-e'), ('agenda', 'council_agenda-20140430-c'),
+            ('agenda', 'council_agenda-20140709-e')])
+        results = parsers.run(documents, repeat=1)
+        self.assertEqual(results.keys(), ['agenda', 'peak_rss_kb'])
+        self.assertEqual(results['agenda']['documents'], 3)
+        self.assertEqual(results['agenda']['failed'], 0)
+        self.assertLessEqual(results['agenda']['p50_ms'], results['agenda']['p95_ms'])
+        self.assertEqual(parsers.compare(results, results), [])
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(parsers.percentile(values, 0.5), 50)
+        self.assertEqual(parsers.percentile(values, 0.95), 95)
+        self.assertEqual(parsers.percentile([3], 0.95), 3)
+
+    def test_compare(self):
+        baseline = {'agenda': {'documents': 3, 'failed': 0, 'docs_per_sec': 20.0, 'p50_ms': 50.0, 'p95_ms': 60.0},
+                    'peak_rss_kb': 1000}
+        results = {'agenda': {'documents': 3, 'failed': 1, 'docs_per_sec': 15.0, 'p50_ms': 55.0, 'p95_ms': 80.0},
+                   'hansard': {'documents': 1, 'failed': 0, 'docs_per_sec': 1.0, 'p50_ms': 1.0, 'p95_ms': 1.0},
+                   'peak_rss_kb': 1100}
+        regressions = parsers.compare(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith(u'agenda documents per second'))
+        self.assertTrue(regressions[1].startswith(u'agenda 95th percentile ms'))
+        self.assertTrue(regressions[2].startswith(u'agenda: 1 documents failed'))
+        self.assertEqual(len(parsers.compare(results, baseline, threshold=0.5)), 1)
+
+    def test_all_failed(self):
+        documents = parsers.find_documents([parsers.FIXTURES_PATH])
+        baseline = parsers.run(documents, repeat=1)
+        original = parsers.build_parser
+
+        def fail(*args, **kwargs):
+            raise RuntimeError(u'Could not parse')
+        parsers.build_parser = fail
+        self.addCleanup(setattr, parsers, 'build_parser', original)
+        results = parsers.run(documents, repeat=1)
+        self.assertEqual(results['agenda']['documents'], 0)
+        self.assertEqual(results['agenda']['failed'], 3)
+        self.assertIsNone(results['agenda']['p50_ms'])
+        regressions = parsers.compare(results, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith(u'agenda: 3 documents failed'))
+        # A kind that is missing altogether
+        regressions = parsers.compare({'peak_rss_kb': baseline['peak_rss_kb']}, baseline)
+        self.assertEqual(regressions, [u'agenda: no results, against 3 documents in the baseline'])
+
+    def test_sanitizers_agree(self):
+        rows = sanitize.run(parsers.find_documents([parsers.FIXTURES_PATH]), repeat=1)
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(identical for kind, uid, timings, identical in rows))
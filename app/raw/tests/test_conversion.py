@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the cache of documents converted to html
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+import logging
+import os
+import shutil
+import tempfile
+from raw import conversion
+
+
+logging.disable(logging.CRITICAL)
+
+
+class ConversionCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.cache = conversion.ConversionCache(os.path.join(self.tmpdir, 'cache'))
+        self.conversions = []
+        original = conversion.CONVERTERS[conversion.KIND_DOCX]
+        conversion.CONVERTERS[conversion.KIND_DOCX] = self.fake_convert
+        self.addCleanup(conversion.CONVERTERS.__setitem__, conversion.KIND_DOCX, original)
+
+    def fake_convert(self, filepath):
+        self.conversions.append(filepath)
+        with open(filepath, 'rb') as f:
+            return u'<html><body>{}</body></html>'.format(f.read().decode('utf-8'))
+
+    def make_file(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(content.encode('utf-8'))
+        return path
+
+    def test_keyed_by_content(self):
+        first = self.make_file('a.docx', u'立法會')
+        copy = self.make_file('b.docx', u'立法會')
+        html = self.cache.convert(conversion.KIND_DOCX, first)
+        self.assertEqual(html, u'<html><body>立法會</body></html>')
+        # A copy of the file at another path is a hit
+        self.assertEqual(self.cache.convert(conversion.KIND_DOCX, copy), html)
+        self.assertEqual(self.conversions, [first])
+        # Nothing is written next to the source any more
+        self.assertFalse(os.path.exists(first + '.html'))
+
+    def test_overwrite(self):
+        path = self.make_file('a.docx', u'foo')
+        self.cache.convert(conversion.KIND_DOCX, path)
+        self.cache.convert(conversion.KIND_DOCX, path, overwrite=True)
+        self.assertEqual(len(self.conversions), 2)
+
+    def test_evicts_least_recently_used(self):
+        paths = [self.make_file('{}.docx'.format(i), u'x' * 100 + unicode(i)) for i in range(3)]
+        entry_size = len(self.fake_convert(paths[0]).encode('utf-8'))
+        # Room for two entries, and eviction stops once there are two again
+        self.cache.max_size = int(entry_size * 2.5)
+        keys = [self.cache.key(conversion.KIND_DOCX, path) for path in paths]
+        self.cache.convert(conversion.KIND_DOCX, paths[0])
+        self.cache.convert(conversion.KIND_DOCX, paths[1])
+        # Make the first entry the older one, then use it so that the second is the least recently used
+        entry = self.cache.entry_path(conversion.KIND_DOCX, keys[1])
+        os.utime(self.cache.entry_path(conversion.KIND_DOCX, keys[0]), (0, 0))
+        os.utime(entry, (1, 1))
+        self.assertIsNotNone(self.cache.get(conversion.KIND_DOCX, keys[0]))
+        self.cache.convert(conversion.KIND_DOCX, paths[2])
+        self.assertTrue(self.cache.has(conversion.KIND_DOCX, keys[0]))
+        self.assertFalse(self.cache.has(conversion.KIND_DOCX, keys[1]))
+        self.assertTrue(self.cache.has(conversion.KIND_DOCX, keys[2]))
+
+    def test_batch(self):
+        paths = [self.make_file('{}.docx'.format(i), unicode(i)) for i in range(5)]
+        with override_settings(CONVERSION_CACHE_PATH=os.path.join(self.tmpdir, 'batch'), CONVERSION_CACHE_MAX_SIZE=None):
+            files = [(conversion.KIND_DOCX, path) for path in paths]
+            counts = conversion.convert_batch(files[:2], chunk_size=2)
+            self.assertEqual(counts, {'cached': 0, 'converted': 2, 'failed': 0})
+            counts = conversion.convert_batch(files, chunk_size=2)
+            self.assertEqual(counts, {'cached': 2, 'converted': 3, 'failed': 0})
@@ -3,14 +3,130 @@
 
 # Tests for RawCouncilQuestion object
 
+from datetime import date
 from django.test import TestCase
+from django.utils.timezone import now
 import logging
 from raw.docs import question
-from raw.models.raw import RawCouncilQuestion
+from raw.models.raw import RawCouncilQuestion, RawMember
+from raw.models.constants import LANG_EN, LANG_CN
 
 logging.disable(logging.CRITICAL)
 
 class RawCouncilQuestionTest(TestCase):
     
     def setUp(self):
-        pass
\ No newline at end of file
+        pass
+
+    def test_derived_fields(self):
+        q = RawCouncilQuestion(uid=u'question-20140409-u1-e', raw_date=u'9.4.2014', number_and_type=u'UQ. 1 (Oral)')
+        q.update_derived_fields()
+        self.assertEqual(q.date, date(2014, 4, 9))
+        self.assertEqual(q.number, 1)
+        self.assertTrue(q.is_urgent)
+        self.assertTrue(q.is_oral)
+        q.raw_date = u''
+        q.number_and_type = u'UQ(口頭)'
+        q.update_derived_fields()
+        self.assertIsNone(q.date)
+        self.assertEqual(q.number, 0)
+        self.assertTrue(q.is_oral)
+
+    def test_ordered_in_database(self):
+        for uid, raw_date, number_and_type in [(u'question-20140409-2-e', u'9.4.2014', u'Q. 2 (Written)'),
+                                               (u'question-20131030-5-e', u'30.10.2013', u'Q. 5 (Oral)'),
+                                               (u'question-20140409-1-e', u'9.4.2014', u'Q. 1 (Oral)')]:
+            q = RawCouncilQuestion(uid=uid, raw_date=raw_date, number_and_type=number_and_type)
+            q.update_derived_fields()
+            q.save()
+        res = RawCouncilQuestion.objects.filter(date__gte=date(2014, 1, 1), is_oral=False).order_by('date', 'number')
+        self.assertEqual([xx.uid for xx in res], [u'question-20140409-2-e'])
+        res = RawCouncilQuestion.objects.order_by('date', 'number')
+        self.assertEqual([xx.number for xx in res], [5, 1, 2])
+
+
+class UidIndexTest(TestCase):
+    def setUp(self):
+        RawCouncilQuestion.objects.create(uid=u'question-20150603-1-e')
+        RawCouncilQuestion.objects.create(uid=u'question-20150603-1-c')
+
+    def test_counterpart_from_index(self):
+        with RawCouncilQuestion.objects.uid_index(full_rows=True) as index:
+            q = RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-e')
+            with self.assertNumQueries(0):
+                self.assertEqual(q.get_lang_counterpart().uid, u'question-20150603-1-c')
+                self.assertRaises(RawCouncilQuestion.DoesNotExist,
+                                  RawCouncilQuestion.objects.get_by_uid, u'question-20150603-u1-e')
+        self.assertEqual(index.hits, 2)
+        self.assertEqual(index.misses, 1)
+        self.assertIsNone(RawCouncilQuestion.objects.get_uid_index())
+
+    def test_objects_are_fetched_once(self):
+        with RawCouncilQuestion.objects.uid_index() as index:
+            foo = RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-c')
+            self.assertIs(RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-c'), foo)
+        self.assertEqual(index.fetches, 1)
+        self.assertEqual(index.hits, 1)
+
+    def test_nested_index_is_widened(self):
+        RawCouncilQuestion.objects.create(uid=u'question-20150604-1-e')
+        with RawCouncilQuestion.objects.uid_index(uids=[u'question-20150603-1-e']) as outer:
+            foo = RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-e')
+            with RawCouncilQuestion.objects.uid_index(uids=[u'question-20150604-1-e']) as inner:
+                self.assertIs(inner, outer)
+                self.assertEqual(RawCouncilQuestion.objects.get_by_uid(u'question-20150604-1-e').uid,
+                                 u'question-20150604-1-e')
+                self.assertIs(RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-e'), foo)
+            with RawCouncilQuestion.objects.uid_index():
+                self.assertEqual(RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-c').uid,
+                                 u'question-20150603-1-c')
+                self.assertIs(RawCouncilQuestion.objects.get_by_uid(u'question-20150603-1-e'), foo)
+
+class FakeParser(object):
+    def __init__(self, asker):
+        self.asker = asker
+
+
+class FixAskerTest(TestCase):
+    def setUp(self):
+        self.member = RawMember.objects.create(uid=u'member-1', name_e=u'Jasper TSANG Yok-sing', name_c=u'曾鈺成')
+        for uid, lang in ((u'question-20140409-1-e', LANG_EN), (u'question-20140409-1-c', LANG_CN),
+                          (u'question-20140409-2-e', LANG_EN), (u'question-20140409-2-c', LANG_CN)):
+            RawCouncilQuestion.objects.create(uid=uid, language=lang)
+        # Only the Chinese reply of the first question names a member we know
+        self.askers = {u'question-20140409-1-c': u'曾鈺成議員', u'question-20140409-2-e': u'Hon Nobody'}
+        original = RawCouncilQuestion.get_parser
+        RawCouncilQuestion.get_parser = lambda q, use_cache=True: \
+            FakeParser(self.askers[q.uid]) if q.uid in self.askers else None
+        self.addCleanup(setattr, RawCouncilQuestion, 'get_parser', original)
+
+    def test_fixed_from_counterpart(self):
+        res = RawCouncilQuestion.fix_asker_by_parser()
+        self.assertEqual(sorted(res['fixed']), [u'question-20140409-1-c', u'question-20140409-1-e'])
+        self.assertEqual(sorted(res['failed']), [u'question-20140409-2-c', u'question-20140409-2-e'])
+        self.assertEqual(RawCouncilQuestion.objects.get(uid=u'question-20140409-1-e').asker, self.member)
+        # So the processor doesn't take the fix for a change
+        fixed = RawCouncilQuestion.objects.get(uid=u'question-20140409-1-e')
+        self.assertEqual(fixed.content_hash, fixed.compute_content_hash())
+        # And the incremental populate rebuilds its ParsedQuestion
+        self.assertIsNotNone(fixed.last_parsed)
+
+    def test_failures_are_not_retried(self):
+        RawCouncilQuestion.fix_asker_by_parser()
+        res = RawCouncilQuestion.fix_asker_by_parser()
+        self.assertEqual(res, {'fixed': [], 'failed': [], 'skipped': 2})
+        # Until the question changes
+        RawCouncilQuestion.objects.filter(uid=u'question-20140409-2-e').update(content_changed=now())
+        res = RawCouncilQuestion.fix_asker_by_parser()
+        self.assertEqual(res['failed'], [u'question-20140409-2-e'])
+        self.assertEqual(res['skipped'], 1)
+        self.assertEqual(len(RawCouncilQuestion.fix_asker_by_parser(retry_all=True)['failed']), 2)
+
+    def test_retried_after_member_changes(self):
+        RawCouncilQuestion.fix_asker_by_parser()
+        # The member the second question was asked by turns up
+        self.askers[u'question-20140409-2-e'] = u'Hon Albert HO'
+        RawMember.objects.create(uid=u'member-2', name_e=u'Albert HO Chun-yan', name_c=u'何俊仁', content_changed=now())
+        res = RawCouncilQuestion.fix_asker_by_parser()
+        self.assertEqual(sorted(res['fixed']), [u'question-20140409-2-c', u'question-20140409-2-e'])
+        self.assertEqual(res['skipped'], 0)
@@ -0,0 +1,49 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the file types stored on RawCouncilAgenda and RawCouncilHansard
+
+from django.test import TestCase
+from django.test.utils import override_settings
+import logging
+import os
+import shutil
+import tempfile
+from raw import utils
+from raw.models import RawCouncilAgenda
+
+
+logging.disable(logging.CRITICAL)
+
+
+class FiletypeTestCase(TestCase):
+    def setUp(self):
+        self.files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.files_dir)
+        with open(os.path.join(self.files_dir, 'agenda.html'), 'wb') as f:
+            f.write('<!DOCTYPE html>\n<html><head><title>Agenda</title></head><body><p>Agenda</p></body></html>\n')
+        self.obj = RawCouncilAgenda.objects.create(uid=u'council_agenda-20130508-e', local_filename=u'agenda.html')
+        self.checks = 0
+        original = utils.check_file_type
+
+        def counting_check(*args, **kwargs):
+            self.checks += 1
+            return original(*args, **kwargs)
+        utils.check_file_type = counting_check
+        self.addCleanup(setattr, utils, 'check_file_type', original)
+
+    def test_filetype_is_stored(self):
+        with override_settings(SCRAPY_FILES_PATH=self.files_dir):
+            self.assertEqual(self.obj.get_filetype(), utils.HTML)
+            obj = RawCouncilAgenda.objects.get(pk=self.obj.pk)
+            self.assertEqual(obj.filetype, utils.HTML)
+            self.assertEqual(obj.get_filetype(), utils.HTML)
+        self.assertEqual(self.checks, 1)
+
+    def test_changed_file_is_checked_again(self):
+        with override_settings(SCRAPY_FILES_PATH=self.files_dir):
+            self.obj.get_filetype()
+            with open(os.path.join(self.files_dir, 'agenda.html'), 'ab') as f:
+                f.write('<p></p>')
+            self.obj.get_filetype()
+        self.assertEqual(self.checks, 2)
@@ -2,9 +2,12 @@
 # -*- coding: utf-8 -*-
 
 # Tests for MemberName object
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 import logging
-from raw.names import MemberName, NameMatcher
+from raw.matchers import MatcherRegistry
+from raw.models import RawMember
+from raw.names import MemberName, NameMatcher, LRUCache
+from raw.benchmarks import names as names_benchmark
 
 
 logging.disable(logging.CRITICAL)
@@ -143,3 +146,83 @@ class NameMatcherTestCase(SimpleTestCase):
         matcher = NameMatcher([(n1, 'foo'), (n2, 'bar'), (n3, 'baz')])
         res = matcher.match(n)
         self.assertEqual(res, (n1, 'foo'))
+
+    def test_first_match_wins(self):
+        n1 = MemberName(u'Hon Jasper TSANG Yok-sing, GBS, JP')
+        n2 = MemberName(u'Tsang Yok-sing')
+        matcher = NameMatcher([(n1, 'foo'), (n2, 'bar')])
+        self.assertEqual(matcher.match(MemberName(u'Tsang Yok-sing')), (n1, 'foo'))
+        matcher = NameMatcher([(n2, 'bar'), (n1, 'foo')])
+        self.assertEqual(matcher.match(MemberName(u'Tsang Yok-sing')), (n2, 'bar'))
+        self.assertIsNone(matcher.match(MemberName(u'Jasper Tsang Yuk-sing')))
+
+    def test_same_as_bucket_matcher(self):
+        members_e, members_c = names_benchmark.get_members()
+        for members in (members_e, members_c):
+            old = names_benchmark.BucketNameMatcher(members)
+            new = NameMatcher(members)
+            for q in names_benchmark.get_queries():
+                self.assertIs(new.match(MemberName(q)), old.match(MemberName(q)))
+
+    def test_match_string(self):
+        n1 = MemberName(u'曾鈺成')
+        matcher = NameMatcher([(n1, 'foo')])
+        self.assertEqual(matcher.match_string(u'曾鈺成議員'), (n1, 'foo'))
+        self.assertEqual(matcher.match_string(u'曾鈺成議員'), (n1, 'foo'))
+        self.assertIsNone(matcher.match_string(u'潘兆平'))
+        self.assertIsNone(matcher.match_string(u'潘兆平'))
+        self.assertIsNone(matcher.match_string(None))
+        self.assertEqual(matcher._matches.hits, 2)
+
+
+class LRUCacheTestCase(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+
+class MatcherRegistryTestCase(TestCase):
+    def setUp(self):
+        # Checks the shared version on every get(), rather than once a second
+        self.registry = MatcherRegistry(check_interval=0)
+        self.registry.register(RawMember)
+        self.member = RawMember.objects.create(uid=u'member-1', name_e=u'Emily LAU Wai-hing', name_c=u'劉慧卿')
+
+    def test_matcher_is_shared(self):
+        matcher = self.registry.get(RawMember)
+        self.assertIs(self.registry.get(RawMember), matcher)
+        self.assertIsNot(self.registry.get(RawMember, english=False), matcher)
+        self.assertEqual(self.registry.builds, 2)
+        self.assertEqual(matcher.match_string(u'Hon Emily LAU')[1], self.member)
+
+    def test_save_invalidates(self):
+        matcher = self.registry.get(RawMember)
+        self.assertIsNone(matcher.match_string(u'Hon Albert HO'))
+        other = RawMember.objects.create(uid=u'member-2', name_e=u'Albert HO Chun-yan', name_c=u'何俊仁')
+        matcher = self.registry.get(RawMember)
+        self.assertEqual(self.registry.builds, 2)
+        self.assertEqual(matcher.match_string(u'Hon Albert HO')[1], other)
+        other.delete()
+        self.assertIsNone(self.registry.get(RawMember).match_string(u'Hon Albert HO'))
+
+    def test_other_process_invalidation(self):
+        # Another registry stands in for another process, which only shares the database
+        matcher = self.registry.get(RawMember)
+        MatcherRegistry().invalidate(RawMember)
+        self.assertIsNot(self.registry.get(RawMember), matcher)
+
+    def test_check_interval(self):
+        registry = MatcherRegistry(check_interval=60)
+        matcher = registry.get(RawMember)
+        MatcherRegistry().invalidate(RawMember)
+        # Changes from other processes are only looked for once the interval is up
+        self.assertIs(registry.get(RawMember), matcher)
+        registry.invalidate(RawMember)
+        self.assertIsNot(registry.get(RawMember), matcher)
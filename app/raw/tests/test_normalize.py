@@ -0,0 +1,41 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Equivalence tests of the single pass normalization against the replace chains it stands in for
+
+from django.test import SimpleTestCase
+import glob
+import logging
+import random
+from raw.benchmarks.normalize import FIXTURES, legacy_normalize_text, legacy_decode_question
+from raw.docs import normalize
+
+
+logging.disable(logging.CRITICAL)
+
+
+class NormalizeTestCase(SimpleTestCase):
+    def test_fixtures(self):
+        for path in glob.glob(FIXTURES):
+            with open(path, 'rb') as f:
+                source = f.read().decode('utf-8')
+            self.assertEqual(normalize.normalize_text(source), legacy_normalize_text(source))
+
+    def test_random_text(self):
+        rng = random.Random(0)
+        alphabet = u'ab <p>\r\n\t“”‘’：‍ 立法會' + u''.join(normalize.CHARACTER_MAP.keys()) + u'\U0001f600\uffff'
+        for i in range(50):
+            source = u''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 200)))
+            self.assertEqual(normalize.normalize_text(source), legacy_normalize_text(source))
+
+    def test_examples(self):
+        self.assertEqual(normalize.normalize_text(u'“Hon”\tMember‘s\n reply：\u200dOK'), u'"Hon"Member\'s reply:OK')
+        # Plain strings give the same result as before
+        self.assertEqual(normalize.normalize_text('a\n\tb'), u'ab')
+
+    def test_question(self):
+        rng = random.Random(0)
+        tokens = ['abc', '\n', '\x83\xdc', '\x84P', '\x84h', u'立法會'.encode('hkscs'), '\xff']
+        for i in range(50):
+            src = ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 50)))
+            self.assertEqual(normalize.decode_question(src), legacy_decode_question(src))
@@ -1,6 +1,11 @@
+# -*- coding: utf-8 -*-
+import json
 import logging
+from django.db import connection
 from django.test import TestCase
-from raw.models import RawMember, Override
+from django.test.utils import CaptureQueriesContext
+from raw.models import RawMember, Override, ParsedCommittee
+from raw.overrides import override_resolver
 
 
 logging.disable(logging.CRITICAL)
@@ -34,3 +39,74 @@ class OverrideTestCase(TestCase):
         override = Override.objects.create_from(self.obj)
         mdl = override._get_model()
         self.assertEqual(mdl, RawMember)
+
+
+class OverrideResolverTestCase(TestCase):
+    def setUp(self):
+        override_resolver.clear()
+        self.addCleanup(override_resolver.clear)
+        for i in range(5):
+            ParsedCommittee.objects.create(uid=u'committee-{}'.format(i), name_e=u'Committee {}'.format(i), name_c=u'委員會')
+        Override.objects.create(ref_model=u'parsedcommittee', ref_uid=u'committee-1',
+                                data=json.dumps({'name_e': u'Corrected'}))
+        Override.objects.create(ref_model=u'parsedcommittee', ref_uid=u'committee-2',
+                                data=json.dumps({'deactivate': True}))
+
+    def test_loads_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            objs = list(ParsedCommittee.objects.effective())
+        # One query for the shared version, one for the overrides and one for the committees
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(sorted(xx.uid for xx in objs), [u'committee-0', u'committee-1', u'committee-3', u'committee-4'])
+        self.assertEqual([xx.name_e for xx in objs if xx.uid == u'committee-1'], [u'Corrected'])
+        with CaptureQueriesContext(connection) as ctx:
+            override_resolver.get_payloads(ParsedCommittee)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_invalidated_on_save(self):
+        self.assertEqual(ParsedCommittee.objects.active().count(), 4)
+        override = Override.objects.create(ref_model=u'parsedcommittee', ref_uid=u'committee-3',
+                                           data=json.dumps({'deactivate': True}))
+        self.assertEqual(ParsedCommittee.objects.active().count(), 3)
+        override.delete()
+        self.assertEqual(ParsedCommittee.objects.active().count(), 4)
+
+    def test_many_deactivated(self):
+        # Any true value deactivates, and is stored as a JSON boolean
+        for i, value in enumerate([u'on', 0.5, [1], {'x': 1}, False]):
+            ParsedCommittee.objects.create(uid=u'committee-{}'.format(10 + i), name_e=u'Committee', name_c=u'委員會')
+            Override.objects.create(ref_model=u'parsedcommittee', ref_uid=u'committee-{}'.format(10 + i),
+                                    data=json.dumps({'name_e': u'"deactivate": true', 'deactivate': value}))
+        self.assertEqual(Override.objects.get(ref_uid=u'committee-11').get_payload()['deactivate'], True)
+        active = sorted(ParsedCommittee.objects.active().values_list('uid', flat=True))
+        self.assertEqual(active, [u'committee-0', u'committee-1', u'committee-14', u'committee-3', u'committee-4'])
+        self.assertEqual(sorted(xx.uid for xx in ParsedCommittee.objects.effective()), active)
+        # Past the limit, the deactivated uids are selected from the Override table in the query
+        override_resolver.MAX_EXCLUDED_UIDS = 0
+        self.addCleanup(delattr, override_resolver, 'MAX_EXCLUDED_UIDS')
+        self.assertEqual(sorted(ParsedCommittee.objects.active().values_list('uid', flat=True)), active)
+
+    def test_effective_values(self):
+        rows = list(ParsedCommittee.objects.effective_values('name_e'))
+        self.assertEqual(sorted(xx['name_e'] for xx in rows), [u'Committee 0', u'Committee 3', u'Committee 4', u'Corrected'])
+        self.assertNotIn('uid', rows[0])
+
+    def test_merge_payloads(self):
+        uids = [u'committee-{}'.format(i) for i in range(5)]
+        self.assertEqual(ParsedCommittee.objects.active().count(), 4)
+        with CaptureQueriesContext(connection) as ctx:
+            counts = Override.objects.merge_payloads(ParsedCommittee, uids, {'deactivate': True})
+        # A select, an update, an insert and the version bump, besides the savepoint
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+        self.assertEqual(counts, {'created': 3, 'updated': 1, 'unchanged': 1})
+        self.assertEqual(ParsedCommittee.objects.active().count(), 0)
+        self.assertEqual(Override.objects.get(ref_uid=u'committee-1').get_payload(),
+                         {'name_e': u'Corrected', 'deactivate': True})
+        counts = Override.objects.merge_payloads(ParsedCommittee, uids + [u'committee-9'], {'deactivate': False}, create=False)
+        self.assertEqual(counts, {'created': 0, 'updated': 5, 'unchanged': 0})
+        self.assertFalse(Override.objects.filter(ref_uid=u'committee-9').exists())
+        self.assertEqual(ParsedCommittee.objects.active().count(), 5)
+        # Truthy flags are stored as booleans, so the database side exclusion agrees with is_deactivated
+        Override.objects.merge_payloads(ParsedCommittee, uids[:1], {'deactivate': 1})
+        self.assertIn('"deactivate": true', Override.objects.get(ref_uid=u'committee-0').data)
+        self.assertEqual(ParsedCommittee.objects.active().count(), 4)
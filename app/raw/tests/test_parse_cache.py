@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the persistent cache of parsed documents
+
+from django.test import TestCase
+from django.test.utils import override_settings
+import logging
+import os
+import shutil
+import tempfile
+from raw import files
+from raw.docs import agenda, cache
+
+
+logging.disable(logging.CRITICAL)
+
+
+class ParseCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        # Copy the fixture, since some tests change the source file
+        self.source_file = os.path.join(self.cache_dir, 'council_agenda-20130508-e.html')
+        shutil.copy('raw/tests/fixtures/council_agenda-20130508-e.html', self.source_file)
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        with open(self.source_file, 'rb') as f:
+            src = f.read().decode('utf-8')
+        return agenda.CouncilAgenda('council_agenda-20130508-e', src)
+
+    def get_parser(self):
+        with override_settings(PARSE_CACHE_PATH=self.cache_dir):
+            return cache.get_or_build(agenda.CouncilAgenda, 'council_agenda-20130508-e', self.source_file, self.build)
+
+    def test_cached_parser_matches(self):
+        parser = self.get_parser()
+        cached = self.get_parser()
+        self.assertEqual(self.builds, 1)
+        self.assertIsNone(cached.tree)
+        self.assertEqual(len(cached.tabled_papers), len(parser.tabled_papers))
+        for p, c in zip(parser.tabled_papers, cached.tabled_papers):
+            self.assertEqual(type(c), type(p))
+            self.assertEqual(c.title, p.title)
+        self.assertEqual([(b.title, b.reading) for b in cached.bills], [(b.title, b.reading) for b in parser.bills])
+        self.assertEqual(len(cached.questions), 22)
+        for p, c in zip(parser.questions, cached.questions):
+            self.assertEqual((c.number, c.asker, c.replier, c.type, c.body), (p.number, p.asker, p.replier, p.type, p.body))
+            self.assertIsNone(c._elements)
+        # The question map still points at the same question objects
+        foo = cached.questions[8]
+        self.assertIs(cached.question_map[foo.number], foo)
+
+    def test_entries_are_readable_by_others(self):
+        self.get_parser()
+        # Everything but the source file
+        entries = [os.path.join(root, name) for root, dirs, names in os.walk(self.cache_dir) for name in names
+                   if not name.endswith('.html')]
+        self.assertTrue(entries)
+        for path in entries:
+            # The mode that open() would give it, rather than the 0600 of a temporary file
+            self.assertEqual(os.stat(path).st_mode & 0777, files.FILE_MODE)
+
+    def test_failed_write_leaves_nothing(self):
+        path = os.path.join(self.cache_dir, 'sub', 'entry')
+        with self.assertRaises(ValueError):
+            with files.atomic_file(path) as f:
+                f.write('half')
+                raise ValueError()
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, 'sub')), [])
+
+    def test_changed_source_is_parsed_again(self):
+        self.get_parser()
+        with open(self.source_file, 'ab') as f:
+            f.write('<p></p>')
+        self.get_parser()
+        self.assertEqual(self.builds, 2)
+
+    def test_disabled(self):
+        with override_settings(PARSE_CACHE_PATH=None):
+            cache.get_or_build(agenda.CouncilAgenda, 'council_agenda-20130508-e', self.source_file, self.build)
+        self.get_parser()
+        self.assertEqual(self.builds, 2)
+
+    def test_freeze_rejects_elements(self):
+        parser = self.build()
+        self.assertRaises(cache.UncacheableValue, cache.freeze, parser.other or parser._headers)
@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the populate steps that create parsed models
+
+from datetime import timedelta, datetime
+from django.test import TestCase
+from django.utils.timezone import now, utc
+import logging
+from raw.models import RawCommittee, ParsedCommittee, PopulateWatermark, RawMember, RawCouncilQuestion, \
+    ParsedPerson, ParsedCouncilMeeting, ParsedQuestion, LANG_EN, LANG_CN
+from raw import populate
+
+
+logging.disable(logging.CRITICAL)
+
+
+class PopulateStepsTestCase(TestCase):
+    def test_ready_steps(self):
+        steps = populate.DEFAULT_STEPS
+        ready = populate.get_ready_steps(steps, set(), set())
+        self.assertEqual(ready, ['committees', 'persons', 'council_meetings'])
+        ready = populate.get_ready_steps(steps, set(['persons']), set(['committees', 'persons', 'council_meetings']))
+        self.assertEqual(ready, ['memberships'])
+
+    def test_missing_dependencies_are_ignored(self):
+        # Only running questions assumes that people and meetings are there already
+        self.assertEqual(populate.get_ready_steps(['questions'], set(), set()), ['questions'])
+
+    def test_build_and_write_shard(self):
+        RawCommittee.objects.create(uid=u'committee-1', code=u'FC', name_e=u'Finance Committee')
+        RawCommittee.objects.create(uid=u'committee-2', code=u'HC', name_e=u'House Committee')
+        pks = list(RawCommittee.objects.values_list('pk', flat=True))
+        name, dicts, errors = populate.build_shard(('committees', pks))
+        self.assertEqual(name, 'committees')
+        self.assertEqual(errors, 0)
+        self.assertEqual(sorted(xx['uid'] for xx in dicts), [u'committee-1', u'committee-2'])
+        populator = populate.ParallelPopulator(['committees'], 2, batch_size=1)
+        populator._write('committees', dicts)
+        self.assertEqual(populator.counts['committees']['saved'], 2)
+        self.assertEqual(ParsedCommittee.objects.get(uid=u'committee-2').code, u'HC')
+        # Writing the same objects again updates them
+        populator._write('committees', dicts)
+        self.assertEqual(ParsedCommittee.objects.count(), 2)
+
+
+    def test_written_persons_refresh_matcher(self):
+        RawMember.objects.create(uid=u'member-1', name_e=u'Jasper TSANG Yok-sing', name_c=u'曾鈺成', gender=1)
+        self.assertIsNone(ParsedPerson.get_matcher().match_string(u'Hon Jasper TSANG'))
+        name, dicts, errors = populate.build_shard(('persons', list(RawMember.objects.values_list('pk', flat=True))))
+        # New rows are written with bulk_create, as after the workers of raw2parsed --workers
+        populate.ParallelPopulator(['persons'], 2)._write('persons', dicts)
+        match = ParsedPerson.get_matcher().match_string(u'Hon Jasper TSANG')
+        self.assertEqual(match[1].uid, u'member-1')
+
+
+class IncrementalPopulateTestCase(TestCase):
+    def setUp(self):
+        self.then = now() - timedelta(days=1)
+        RawCommittee.objects.create(uid=u'committee-1', code=u'FC', name_e=u'Finance Committee', last_parsed=self.then)
+        RawCommittee.objects.create(uid=u'committee-2', code=u'HC', name_e=u'House Committee', last_parsed=self.then)
+
+    def test_first_run_is_full(self):
+        ParsedCommittee.objects.populate(full=False)
+        self.assertEqual(ParsedCommittee.objects.count(), 2)
+        self.assertEqual(PopulateWatermark.objects.get_for_model(ParsedCommittee), self.then)
+
+    def test_only_changed_objects(self):
+        ParsedCommittee.objects.populate(full=False)
+        self.assertEqual(ParsedCommittee.objects.get_populate_queryset(full=False).count(), 0)
+        raw = RawCommittee.objects.get(uid=u'committee-2')
+        raw.name_e = u'The House Committee'
+        raw.last_parsed = now()
+        raw.save()
+        changed = ParsedCommittee.objects.get_populate_queryset(full=False)
+        self.assertEqual([xx.uid for xx in changed], [u'committee-2'])
+        self.assertEqual(ParsedCommittee.objects.get_populate_queryset(full=True).count(), 2)
+        ParsedCommittee.objects.populate(full=False)
+        self.assertEqual(ParsedCommittee.objects.get(uid=u'committee-2').name_e, u'The House Committee')
+        self.assertEqual(PopulateWatermark.objects.get_for_model(ParsedCommittee), raw.last_parsed)
+
+
+class QuestionBatchTestCase(TestCase):
+    def setUp(self):
+        member = RawMember.objects.create(uid=u'member-1', name_e=u'Jasper Tsang')
+        ParsedPerson.objects.create(uid=u'member-1', name_e=u'Jasper Tsang', name_c=u'曾鈺成', title_e=u'Mr',
+                                    title_c=u'先生', gender=1)
+        ParsedCouncilMeeting.objects.create(uid=u'cmeeting-20140409', start_date=datetime(2014, 4, 9, 3, tzinfo=utc))
+        for number in range(1, 4):
+            for lang, suffix in ((LANG_EN, u'e'), (LANG_CN, u'c')):
+                q = RawCouncilQuestion(uid=u'question-20140409-{}-{}'.format(number, suffix), language=lang,
+                                       raw_date=u'9.4.2014', number_and_type=u'Q. {} (Oral)'.format(number))
+                # Only the Chinese version of the last question was matched to its asker
+                if number < 3 or lang == LANG_CN:
+                    q.asker = member
+                q.update_derived_fields()
+                q.save()
+        # A question without a meeting
+        q = RawCouncilQuestion(uid=u'question-20140410-1-e', language=LANG_EN, raw_date=u'10.4.2014',
+                               number_and_type=u'Q. 1 (Oral)')
+        q.update_derived_fields()
+        q.save()
+        RawCouncilQuestion.objects.create(uid=u'question-20140410-1-c', language=LANG_CN)
+
+    def test_lookups_are_per_batch(self):
+        raw_objs = list(ParsedQuestion.objects.get_raw_queryset())
+        # Counterparts, meetings, raw members, persons and existing questions
+        with self.assertNumQueries(5):
+            objs, errors = ParsedQuestion.objects.build_batch(raw_objs)
+        self.assertEqual(errors, 0)
+        self.assertEqual(sorted(xx.uid for xx in objs),
+                         [u'cmeeting-20140409-q1', u'cmeeting-20140409-q2', u'cmeeting-20140409-q3'])
+        self.assertTrue(all(xx.asker.uid == u'member-1' for xx in objs))
+
+    def test_populate_inserts_then_updates(self):
+        ParsedQuestion.objects.populate()
+        self.assertEqual(ParsedQuestion.objects.count(), 3)
+        ids = sorted(ParsedQuestion.objects.values_list('id', flat=True))
+        ParsedQuestion.objects.populate()
+        self.assertEqual(sorted(ParsedQuestion.objects.values_list('id', flat=True)), ids)
+
+    def test_same_uid_in_batch(self):
+        # A second listing of the first question, which maps to the same parsed uid
+        for lang, suffix in ((LANG_EN, u'e'), (LANG_CN, u'c')):
+            q = RawCouncilQuestion(uid=u'question-20140409-1a-{}'.format(suffix), language=lang,
+                                   raw_date=u'9.4.2014', number_and_type=u'Q. 1 (Oral)')
+            q.update_derived_fields()
+            q.save()
+        objs, errors = ParsedQuestion.objects.build_batch(ParsedQuestion.objects.get_raw_queryset())
+        self.assertEqual(len(objs), 3)
+        ParsedQuestion.objects.populate()
+        self.assertEqual(ParsedQuestion.objects.filter(uid=u'cmeeting-20140409-q1').count(), 1)
+
+    def test_same_as_create_from_raw(self):
+        raw_objs = list(ParsedQuestion.objects.get_raw_queryset())
+        objs, errors = ParsedQuestion.objects.build_batch(raw_objs)
+        by_uid = dict((xx.uid, xx) for xx in objs)
+        singles = [ParsedQuestion.objects.create_from_raw(xx) for xx in raw_objs]
+        # The question without a meeting is skipped by both
+        self.assertEqual(len([xx for xx in singles if xx is not None]), len(objs))
+        for single in singles:
+            if single is not None:
+                self.assertEqual(populate.object_to_dict(by_uid[single.uid]), populate.object_to_dict(single))
@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the processors that load scraped items into the raw models
+
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now
+import json
+from multiprocessing.pool import ThreadPool
+import logging
+import os
+import shutil
+import tempfile
+from raw import utils
+from raw.models import RawCommittee, RawCommitteeMembership, RawMeeting, RawMeetingCommittee, RawScheduleMember, \
+    ScrapeJob, RawCouncilHansard, LANG_EN
+from raw.processors import runner
+from raw.processors.library_hansard import LibraryHansardProcessor
+from raw.processors.base import BulkUpserter, JsonLinesReader
+from raw.processors.schedule import ScheduleCommitteeProcessor, ScheduleMembershipProcessor, ScheduleMeetingProcessor
+
+
+logging.disable(logging.CRITICAL)
+
+
+def write_items(items):
+    """
+    Writes a list of dicts to a temporary jsonlines file and returns its path
+    """
+    f = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+    for item in items:
+        f.write(json.dumps(item) + '\n')
+    f.close()
+    return f.name
+
+
+class BulkUpserterTestCase(TestCase):
+    def test_get_builds_new_object(self):
+        upserter = BulkUpserter(RawCommittee)
+        obj = upserter.get(u'committee-1')
+        self.assertIsNone(obj.pk)
+        self.assertEqual(obj.uid, u'committee-1')
+        # Same object is handed back until it is flushed
+        self.assertIs(upserter.get(u'committee-1'), obj)
+
+    def test_flush_creates_and_updates(self):
+        RawCommittee.objects.create(uid=u'committee-1', name_e=u'Old')
+        upserter = BulkUpserter(RawCommittee, batch_size=2)
+        for i in range(1, 4):
+            obj = upserter.get(u'committee-{}'.format(i))
+            obj.name_e = u'New {}'.format(i)
+            upserter.stage(obj)
+        upserter.flush()
+        self.assertEqual(upserter.count_created, 2)
+        self.assertEqual(upserter.count_updated, 1)
+        self.assertEqual(RawCommittee.objects.count(), 3)
+        self.assertEqual(RawCommittee.objects.get(uid=u'committee-1').name_e, u'New 1')
+        # Created objects get their primary keys back, so staging them again updates them
+        obj = upserter.get(u'committee-3')
+        self.assertIsNotNone(obj.pk)
+        obj.name_e = u'Newer 3'
+        upserter.stage(obj)
+        upserter.flush()
+        self.assertEqual(upserter.count_updated, 2)
+        self.assertEqual(RawCommittee.objects.count(), 3)
+
+    def test_duplicate_uids_are_skipped(self):
+        RawCommittee.objects.create(uid=u'committee-1')
+        RawCommittee.objects.create(uid=u'committee-1')
+        upserter = BulkUpserter(RawCommittee)
+        self.assertIsNone(upserter.get(u'committee-1'))
+
+
+class ScheduleCommitteeProcessorTestCase(TestCase):
+    def test_process_counts(self):
+        RawCommittee.objects.create(uid=u'committee-1')
+        items = [
+            {'id': 1, 'code': u'FC', 'name_e': u'Finance Committee', 'name_c': u'財務委員會',
+             'url_e': u'', 'url_c': u''},
+            {'id': 2, 'code': u'HC', 'name_e': u'House Committee', 'name_c': u'內務委員會',
+             'url_e': u'', 'url_c': u''},
+        ]
+        items_file = write_items(items)
+        self.addCleanup(os.remove, items_file)
+        proc = ScheduleCommitteeProcessor(items_file, batch_size=1)
+        proc.process()
+        self.assertEqual(proc._count_created, 1)
+        self.assertEqual(proc._count_updated, 1)
+        self.assertEqual(proc._count_error, 0)
+        self.assertEqual(RawCommittee.objects.get(uid=u'committee-2').code, u'HC')
+
+    def test_unchanged_items_are_not_written(self):
+        items = [committee_item(1), committee_item(2)]
+        items_file = write_items(items)
+        self.addCleanup(os.remove, items_file)
+        ScheduleCommitteeProcessor(items_file).process()
+        changed = RawCommittee.objects.get(uid=u'committee-1').content_changed
+        self.assertIsNotNone(changed)
+
+        items[1]['name_e'] = u'Renamed'
+        items_file = write_items(items)
+        self.addCleanup(os.remove, items_file)
+        proc = ScheduleCommitteeProcessor(items_file)
+        proc.process()
+        self.assertEqual(proc._count_unchanged, 1)
+        self.assertEqual(proc._count_updated, 1)
+        self.assertEqual(RawCommittee.objects.get(uid=u'committee-1').content_changed, changed)
+        self.assertEqual(RawCommittee.objects.get(uid=u'committee-2').name_e, u'Renamed')
+
+        proc = ScheduleCommitteeProcessor(items_file, skip_unchanged=False)
+        proc.process()
+        self.assertEqual(proc._count_updated, 2)
+
+
+class ScheduleReferencesTestCase(TestCase):
+    def setUp(self):
+        self.c1 = RawCommittee.objects.create(uid=u'committee-1')
+        self.c2 = RawCommittee.objects.create(uid=u'committee-2')
+
+    def process(self, processor_class, items):
+        items_file = write_items(items)
+        self.addCleanup(os.remove, items_file)
+        proc = processor_class(items_file)
+        proc.process()
+        return proc
+
+    def test_membership_references(self):
+        member = RawScheduleMember.objects.create(uid=u'smember-1')
+        items = [
+            {'id': 1, 'membership_id': 1, 'member_id': 1, 'committee_id': 1, 'post_e': u'', 'post_c': u''},
+            {'id': 2, 'membership_id': 2, 'member_id': 2, 'committee_id': 3, 'post_e': u'', 'post_c': u''},
+        ]
+        proc = self.process(ScheduleMembershipProcessor, items)
+        first = RawCommitteeMembership.objects.get(uid=u'cmembership-1')
+        self.assertEqual(first.member, member)
+        self.assertEqual(first.committee, self.c1)
+        second = RawCommitteeMembership.objects.get(uid=u'cmembership-2')
+        self.assertIsNone(second.member)
+        self.assertIsNone(second.committee)
+        self.assertEqual(proc._missing['RawCommittee'].keys(), [u'committee-3'])
+        self.assertEqual(proc._missing['RawScheduleMember'].keys(), [u'smember-2'])
+
+    def test_meeting_committees(self):
+        RawMeetingCommittee.objects.create(uid=u'meeting_committee-1', slot_id=10, committee=self.c1)
+        RawMeetingCommittee.objects.create(uid=u'meeting_committee-2', slot_id=10, committee=self.c2)
+        RawMeetingCommittee.objects.create(uid=u'meeting_committee-3', slot_id=11, committee=self.c2)
+        items = [
+            {'id': 1, 'slot_id': 10, 'start_date': '2014-01-02T10:00:00'},
+            {'id': 1, 'slot_id': 11, 'start_date': '2014-01-01T10:00:00'},
+            {'id': 2, 'slot_id': 12, 'start_date': '2014-01-03T10:00:00'},
+        ]
+        for item in items:
+            item.update({'subject_e': u'', 'subject_c': u'', 'agenda_url_e': u'', 'agenda_url_c': u'',
+                         'venue_code': u'', 'meeting_type': u''})
+        self.process(ScheduleMeetingProcessor, items)
+        meeting = RawMeeting.objects.get(uid=u'{}-1'.format(RawMeeting.UID_PREFIX))
+        self.assertEqual(sorted(meeting.committees.values_list('uid', flat=True)), [u'committee-1', u'committee-2'])
+        self.assertEqual(meeting.start_date.day, 1)
+        # Processing again doesn't add the rows twice
+        self.process(ScheduleMeetingProcessor, items)
+        self.assertEqual(RawMeeting.committees.through.objects.count(), 2)
+
+
+def committee_item(i):
+    return {'id': i, 'code': u'C{}'.format(i), 'name_e': u'Committee {}'.format(i), 'name_c': u'',
+            'url_e': u'', 'url_c': u''}
+
+
+class CheckpointTestCase(TestCase):
+    def setUp(self):
+        self.items_file = write_items([committee_item(i) for i in range(1, 6)])
+        self.addCleanup(os.remove, self.items_file)
+        self.job = ScrapeJob.objects.create(spider=u'schedule_committee', scheduled=now(), job_id=u'1',
+                                            raw_response=self.items_file)
+
+    def test_reader_skips_malformed_lines(self):
+        with open(self.items_file, 'ab') as f:
+            f.write('{"id": 6, "code"\n')
+            f.write(json.dumps(committee_item(7)) + '\n')
+        reader = JsonLinesReader(self.items_file)
+        self.assertEqual([xx['id'] for xx in reader], [1, 2, 3, 4, 5, 7])
+        self.assertEqual(reader.malformed, 1)
+        self.assertEqual(reader.offset, os.path.getsize(self.items_file))
+
+    def test_reader_resumes_from_offset(self):
+        reader = JsonLinesReader(self.items_file)
+        chunks = reader.chunks(2)
+        chunks.next()
+        resumed = JsonLinesReader(self.items_file, offset=reader.offset)
+        self.assertEqual([xx['id'] for xx in resumed], [3, 4, 5])
+
+    def test_failed_chunk_is_rolled_back_and_resumed(self):
+        proc = ScheduleCommitteeProcessor(self.items_file, self.job, checkpoint_every=2)
+        original = proc._process_item
+
+        def fail_on_third(item, obj):
+            if item['id'] == 3:
+                raise RuntimeError('killed')
+            original(item, obj)
+        proc._process_item = fail_on_third
+        self.assertRaises(RuntimeError, proc.process)
+        # The first chunk was committed along with its checkpoint, the second not at all
+        self.assertEqual(RawCommittee.objects.count(), 2)
+        job = ScrapeJob.objects.get(pk=self.job.pk)
+        self.assertEqual(job.checkpoint_items, 2)
+
+        proc = ScheduleCommitteeProcessor(self.items_file, job, checkpoint_every=2)
+        proc.process()
+        self.assertEqual(proc._count_created, 3)
+        self.assertEqual(sorted(RawCommittee.objects.values_list('code', flat=True)),
+                         [u'C1', u'C2', u'C3', u'C4', u'C5'])
+        self.assertEqual(ScrapeJob.objects.get(pk=self.job.pk).checkpoint_offset, os.path.getsize(self.items_file))
+
+
+class HansardMergeTestCase(TestCase):
+    def setUp(self):
+        self.files_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.files_dir)
+        os.mkdir(os.path.join(self.files_dir, 'full'))
+        for name in ('part1.docx', 'part2.docx'):
+            self.write_file(name, name)
+            RawCouncilHansard.objects.create(uid=u'council_hansard-20120629p-e', title=name, raw_date=u'20120629',
+                                             language=LANG_EN, local_filename=u'full/{}'.format(name))
+        self.merges = []
+        original = utils.merge_docx
+        utils.merge_docx = self.fake_merge
+        self.addCleanup(setattr, utils, 'merge_docx', original)
+
+    def write_file(self, name, content):
+        with open(os.path.join(self.files_dir, 'full', name), 'wb') as f:
+            f.write(content)
+
+    def fake_merge(self, docx_list=None, out_htmlpath=None):
+        self.merges.append(docx_list)
+        html = u'<body>{}</body>'.format(u''.join(open(xx, 'rb').read() for xx in docx_list))
+        with open(out_htmlpath, 'wb') as f:
+            f.write(html)
+        return html
+
+    def merge(self):
+        processor = LibraryHansardProcessor(write_items([]))
+        processor._merge_parts()
+        return processor
+
+    def test_unchanged_parts_are_not_merged_again(self):
+        with override_settings(SCRAPY_FILES_PATH=self.files_dir, HANSARD_MERGE_WORKERS=1):
+            processor = self.merge()
+            self.assertEqual(processor._count_merged, 1)
+            merged = RawCouncilHansard.objects.get(uid=u'council_hansard-20120629-e')
+            self.assertTrue(merged.created_by_parts)
+            self.assertEqual(merged.local_filename, u'full/council_hansard-20120629p-e-merge')
+            self.assertEqual(merged.content_hash, merged.compute_content_hash())
+            processor = self.merge()
+            self.assertEqual((processor._count_merged, processor._count_merge_skipped), (0, 1))
+            # A changed part is merged again
+            self.write_file('part2.docx', 'part2 revised')
+            processor = self.merge()
+            self.assertEqual(processor._count_merged, 1)
+            self.assertEqual(len(self.merges), 2)
+
+
+class RunnerTestCase(SimpleTestCase):
+    def test_ready_stages(self):
+        stages = ['library_member', 'schedule_member', 'schedule_committee', 'schedule_membership', 'council_question']
+        ready = runner.get_ready_stages(stages, set(), set())
+        self.assertEqual(ready, ['library_member', 'schedule_member', 'schedule_committee'])
+        ready = runner.get_ready_stages(stages, set(['library_member', 'schedule_member']), set(ready))
+        self.assertEqual(ready, ['council_question'])
+
+    def test_missing_dependencies_are_assumed_done(self):
+        self.assertEqual(runner.get_ready_stages(['schedule_meeting'], set(), set()), ['schedule_meeting'])
+
+    def test_no_process_pools_from_runner_threads(self):
+        # The initializer of the runner's thread pool
+        pool = ThreadPool(1, initializer=utils.disallow_process_pools)
+        try:
+            self.assertFalse(pool.apply(utils.process_pools_allowed))
+        finally:
+            pool.terminate()
+            pool.join()
+        self.assertTrue(utils.process_pools_allowed())
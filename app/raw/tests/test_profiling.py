@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests for the per stage timings of the document parsers
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+import json
+import logging
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+from raw.docs import agenda, profiling
+
+
+logging.disable(logging.CRITICAL)
+
+
+class ParserProfileTestCase(SimpleTestCase):
+    def setUp(self):
+        with open('raw/tests/fixtures/council_agenda-20130508-e.html', 'rb') as f:
+            src = f.read().decode('utf-8')
+        self.src = src
+        self.parser = agenda.CouncilAgenda('council_agenda-20130508-e', src, profile=True)
+
+    def test_off_by_default(self):
+        with override_settings(PARSER_PROFILING=False):
+            parser = agenda.CouncilAgenda('council_agenda-20130508-e', self.src)
+        self.assertIsNone(parser.profile)
+        # Nor are the xpath() calls counted
+        self.assertNotIn(type(parser.tree), profiling._counting_classes.values())
+        self.assertIn(type(self.parser.tree), profiling._counting_classes.values())
+        with override_settings(PARSER_PROFILING=True):
+            parser = agenda.CouncilAgenda('council_agenda-20130508-e', self.src)
+        self.assertIsNotNone(parser.profile)
+
+    def test_stages(self):
+        profile = json.loads(self.parser.profile.to_json())
+        self.assertEqual(profile['parser'], 'CouncilAgenda')
+        self.assertEqual(profile['uid'], 'council_agenda-20130508-e')
+        self.assertEqual(sorted(profile['stages'].keys()), ['_clean', '_load', '_parse'])
+        self.assertIn('_parse_questions', profile['sections'])
+        stage = profile['stages']['_parse']
+        self.assertEqual(stage['calls'], 1)
+        self.assertGreater(stage['elements'], 0)
+        self.assertGreater(stage['xpath_calls'], 0)
+        # Sections are part of the stage that calls them
+        self.assertGreaterEqual(stage['xpath_calls'], profile['sections']['_parse_tabled_papers']['xpath_calls'])
+        self.assertAlmostEqual(profile['seconds'], sum(xx['seconds'] for xx in profile['stages'].values()))
+
+    def test_counting_parser(self):
+        tree = profiling.html_parser(counted=True, encoding='utf-8').makeelement('p')
+        before = profiling._xpath_counter.calls
+        tree.xpath('.//a')
+        self.assertEqual(profiling._xpath_counter.calls, before + 1)
+
+    def test_aggregate(self):
+        profile = self.parser.profile.to_dict()
+        other = json.loads(json.dumps(profile))
+        other['uid'] = 'council_agenda-20130508-c'
+        other['seconds'] += 1
+        other['stages']['_load']['seconds'] += 1
+        totals = profiling.aggregate([profile, other], top=1)
+        self.assertEqual(totals['documents'], 2)
+        self.assertEqual(totals['slowest'], [(other['seconds'], 'CouncilAgenda', 'council_agenda-20130508-c')])
+        parser, name, entry = totals['stages'][0]
+        self.assertEqual((parser, name, entry['documents']), ('CouncilAgenda', '_load', 2))
+
+    def test_command_input(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'profiles.jsonl')
+        with open(path, 'wb') as f:
+            f.write(self.parser.profile.to_json() + '\n')
+        out = StringIO()
+        call_command('profile_parsers', input=path, stdout=out)
+        self.assertIn(u'council_agenda-20130508-e', out.getvalue())
+        self.assertIn(u'CouncilAgenda._parse', out.getvalue())
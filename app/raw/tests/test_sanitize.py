@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Tests that the lightweight sanitizer leaves the same trees as lxml's Cleaner
+
+from django.test import SimpleTestCase
+import glob
+import logging
+import lxml.html
+from lxml import etree
+from lxml.html.clean import Cleaner
+from raw.benchmarks.normalize import FIXTURES
+from raw.docs import agenda, sanitize
+
+
+logging.disable(logging.CRITICAL)
+
+SAMPLE = u"""<html><head><title>LCQ1: 立法會</title><meta charset="utf-8"><link rel="stylesheet" href="a.css">
+<style type="text/css">p { color: red }</style><script>var a = 1;</script></head>
+<body onload="init()"><!-- a comment --><?php echo 1; ?>
+<div id="pressrelease" class="main" style="font-weight:bold" data-x="1"><p align="center" onclick="x()">Question
+<image src="a.png">one</image><span style="font-weight:bold">two</span></p>
+<form action="/search">Search <input name="q"><button>Go</button><select><option>a</option></select>
+<textarea>text</textarea></form><iframe src="b.html">frame text</iframe>
+<object><param name="a" value="b"><embed src="c.swf">object text</object><param name="d">
+<blink>blinking</blink><marquee>moving</marquee><foo>unknown <b>tag</b></foo>
+<applet>applet text</applet><noframes>no frames</noframes><frameset><frame src="d.html"></frameset>
+<script type="text/javascript">document.write('x')</script>tail text</div></body></html>"""
+
+
+class SanitizeTestCase(SimpleTestCase):
+    def assertSameAsCleaner(self, source, safe_attrs_only=True):
+        cleaner = Cleaner()
+        cleaner.safe_attrs_only = safe_attrs_only
+        expected = etree.tostring(cleaner.clean_html(lxml.html.fromstring(source)), encoding='utf-8')
+        tree = lxml.html.fromstring(source)
+        self.assertIs(sanitize.sanitize(tree, safe_attrs_only), tree)
+        self.assertEqual(etree.tostring(tree, encoding='utf-8'), expected)
+
+    def test_sample(self):
+        self.assertSameAsCleaner(SAMPLE)
+        self.assertSameAsCleaner(SAMPLE, safe_attrs_only=False)
+
+    def test_fixtures(self):
+        for path in glob.glob(FIXTURES):
+            with open(path, 'rb') as f:
+                source = f.read()
+            self.assertSameAsCleaner(source)
+            self.assertSameAsCleaner(source, safe_attrs_only=False)
+
+    def test_methods(self):
+        with open('raw/tests/fixtures/council_agenda-20130508-e.html', 'rb') as f:
+            src = f.read().decode('utf-8')
+        parsers = [agenda.CouncilAgenda('council_agenda-20130508-e', src, sanitizer=method)
+                   for method in (sanitize.LIGHTWEIGHT, sanitize.CLEANER)]
+        self.assertEqual(parsers[0].sanitizer, sanitize.LIGHTWEIGHT)
+        self.assertEqual(etree.tostring(parsers[0].tree), etree.tostring(parsers[1].tree))
+        self.assertEqual([(xx.number, xx.asker) for xx in parsers[0].questions],
+                         [(xx.number, xx.asker) for xx in parsers[1].questions])
+        self.assertRaises(ValueError, sanitize.clean, parsers[0].tree, 'unknown')
@@ -7,23 +7,29 @@ from itertools import izip_longest
 from scrapy.crawler import Crawler
 from scrapy.utils.project import get_project_settings
 import magic
-import subprocess
-#import pydocx
-from pydocx import PyDocX
+from multiprocessing import current_process
 import os
+import threading
 import lxml.etree
 import lxml.html
-from lxml.html import HTMLParser
-from lxml.html.clean import clean_html,Cleaner
 from logging import raiseExceptions
+from raw import conversion
+from raw.files import atomic_file
+from raw.docs.sanitize import load_html
 
 
+# Stored when libmagic could not tell the type, since None means it hasn't been checked yet
+UNKNOWN = 0
 HTML = 1
 DOC = 2
 DOCX = 3
 PDF = 4
 #ZIP = 5
 
+# Set in the threads that are not allowed to start pools of processes
+_process_pools = threading.local()
+
+
 def list_spiders():
     settings = get_project_settings()
     crawler = Crawler(settings)
@@ -57,45 +63,54 @@ def check_file_type(filepath, as_string=False):
         return None
 
 
+def file_stamp(filepath):
+    """
+    A string that changes whenever the file is modified, without reading the file
+    """
+    st = os.stat(filepath)
+    return u'{}:{!r}'.format(st.st_size, st.st_mtime)
+
+
+def process_pools_allowed():
+    """
+    Whether the current thread may start a pool of worker processes.  Daemonic processes, such as pool
+    workers and Celery's prefork workers, can't have children.  Neither can the threads that processors
+    run on in the threaded runner, since forking there would copy the database connections and locks
+    that the other threads are holding
+    """
+    return not current_process().daemon and not getattr(_process_pools, 'disallowed', False)
+
+
+def disallow_process_pools():
+    """
+    Stops the current thread from starting pools of processes.  The initializer of thread pools
+    """
+    _process_pools.disallowed = True
+
+
 def doc_to_html(filepath, overwrite=False):
     """
     Converts a doc file to in-memory html string.
+    The result is kept in the conversion cache, see raw.conversion
 
     :param filepath: full filepath to the file to convert
-    :return: unicode string
+    :return: unicode string, or None if abiword could not convert it
     """
-    html_file = '{}.html'.format(filepath)
-    if not os.path.exists(html_file) or overwrite:
-        cmd = ['abiword', '--to=html', '--to-name=fd://1', filepath]
-        try:
-            res = subprocess.check_output(cmd)
-        except:
-            return None
-        with open(html_file, 'wb') as tmp:
-            tmp.write(res)
-    else:
-        with open(html_file, 'rb') as tmp:
-            res = tmp.read()
-    return res.decode('utf-8')
+    try:
+        return conversion.convert(conversion.KIND_DOC, filepath, overwrite=overwrite)
+    except conversion.ConversionError:
+        return None
 
 
 def docx_to_html(filepath, overwrite=False):
     """
     Converts docx file to in-memory html string
+    The result is kept in the conversion cache, see raw.conversion
 
     :param filepath: full path to the file to convert
     :return: unicode string
     """
-    html_file = '{}.html'.format(filepath)
-    if not os.path.exists(html_file) or overwrite:
-        #res = pydocx.docx2html(filepath)
-        res = PyDocX.to_html(filepath)
-        with open(html_file, 'wb') as tmp:
-            tmp.write(res.encode('utf-8'))
-    else:
-        with open(html_file, 'rb') as tmp:
-            res = tmp.read().decode('utf-8')
-    return res
+    return conversion.convert(conversion.KIND_DOCX, filepath, overwrite=overwrite)
 
 
 def get_file_path(rel_path):
@@ -154,22 +169,23 @@ def merge_docx(docx_list=None, out_htmlpath=None):
     if docx_list is None:
         return None
     
-    cleaner = Cleaner()
-    parser = HTMLParser(encoding='utf-8')
     html_list = []
     for path in docx_list:
         try:
-            tmp_html =  PyDocX.to_html(path)
-            html_list.append(cleaner.clean_html(lxml.html.fromstring(tmp_html, parser=parser)))
+            tmp_html = docx_to_html(path)
+            html_list.append(load_html(tmp_html))
         except:
             #'MalformedDocxException'
             try:
-                # Pretend it is a html
-                html_file = '{}.html'.format(path)
-                with open(html_file, 'rb') as tmp:
-                    tmp_html = tmp.read()
-                tmp_html = tmp_html.decode('utf-8')
-                html_list.append(cleaner.clean_html(lxml.html.fromstring(tmp_html, parser=parser)))
+                # Probably a DOC file instead
+                tmp_html = doc_to_html(path)
+                if tmp_html is None:
+                    # Pretend it is a html, which older versions wrote next to the file
+                    html_file = '{}.html'.format(path)
+                    with open(html_file, 'rb') as tmp:
+                        tmp_html = tmp.read()
+                    tmp_html = tmp_html.decode('utf-8')
+                html_list.append(load_html(tmp_html))
             except:
                 # Cannot convert
                 continue
@@ -197,8 +213,8 @@ def merge_docx(docx_list=None, out_htmlpath=None):
     html_str = lxml.etree.tostring(main_body)
     
     if out_htmlpath is not None:
-        with open(out_htmlpath, 'wb') as tmp:
-            tmp.write(html_str.encode('utf-8'))
+        with atomic_file(out_htmlpath) as f:
+            f.write(html_str.encode('utf-8'))
                 
     return html_str
         
\ No newline at end of file
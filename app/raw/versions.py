@@ -0,0 +1,46 @@
+"""
+Versions of the data behind the in process caches of raw.matchers and raw.overrides
+
+Each cache keeps the version it was built at, and rebuilds once the version changes.  Changes
+made by this process bump a local counter, so they are seen straight away.  Every change also
+bumps a CacheVersion row in the database, in the same transaction as the writes, which is how
+the other processes, such as the web workers, find out about changes made by the Celery workers
+and management commands.  To keep the reads cheap, the database is checked at most once every
+check_interval seconds, so changes from other processes are seen within that time.
+"""
+import itertools
+import time
+
+
+class SharedVersion(object):
+    def __init__(self, key, check_interval=1.0):
+        self.key = key
+        self.check_interval = check_interval
+        self._local = 0
+        self._counter = itertools.count(1)
+        self._shared = None
+        self._checked = None
+
+    def get(self):
+        """
+        Returns the current version, which compares unequal to any version from before the last change
+        """
+        now = time.time()
+        if self._checked is None or now - self._checked >= self.check_interval:
+            # Imported here, since the models import the modules that use this one
+            from raw.models import CacheVersion
+            self._shared = CacheVersion.objects.get_version(self.key)
+            self._checked = now
+        return self._local, self._shared
+
+    def bump(self):
+        """
+        Marks the data as changed, in this process straight away, and in the others once the caller's
+        transaction is committed
+        """
+        from raw.models import CacheVersion
+        # next() on a shared counter is atomic
+        self._local = next(self._counter)
+        CacheVersion.objects.bump(self.key)
+        # Pick up the new shared version on the next get(), rather than rebuilding again when it is next checked
+        self._checked = None
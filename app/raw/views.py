@@ -11,6 +11,7 @@ from raw import models
 from raw.forms import OverrideForm
 from raw.models import RawCouncilAgenda, RawCouncilHansard, RawMember, RawCommittee, RawCouncilQuestion, Override
 from raw.names import NameMatcher, MemberName
+from raw.overrides import override_resolver, is_deactivated
 from raw.models.constants import LANG_EN, LANG_CN
 
 #RawCouncilAgenda
@@ -29,17 +30,17 @@ class RawCouncilAgendaDetailView(DetailView):
         parser = self.object.get_parser()
         context['parser'] = parser
         
-        matcher = RawMember.get_matcher()
+        matcher_en = RawMember.get_matcher()
+        matcher_cn = RawMember.get_matcher(english=False)
         questions = []
         if parser.questions is not None:
             for q in parser.questions:
                 name = MemberName(q.asker)
-                match = matcher.match(name)
+                match = matcher_en.match(name)
                 if match==None:
                 #try Chinese. 
                 #This will be better handled when we have different language display
-                    matcher = RawMember.get_matcher(english=False)
-                    match = matcher.match(name)
+                    match = matcher_cn.match(name)
                 obj = (q, match)
                 questions.append(obj)
         context['questions'] = questions
@@ -108,9 +109,7 @@ class RawMemberDetailView(DetailView):
             res = {'label': f, 'value': getattr(self.object, f, '')}
             context['fields'].append(res)
 
-        questions = self.object.raw_questions.filter(language=models.LANG_EN)
-        questions_with_dates = sorted([(xx, xx.date) for xx in questions], key=lambda x: x[1])
-        context['questions'] = [xx for xx, dd in questions_with_dates]
+        context['questions'] = self.object.raw_questions.filter(language=models.LANG_EN).order_by('date', 'number')
         return context
 
 #RawCommittee
@@ -128,6 +127,7 @@ class RawCommitteeDetailView(DetailView):
 #RawCouncilQuestion
 class RawCouncilQuestionListView(ListView):
     model = RawCouncilQuestion
+    queryset = RawCouncilQuestion.objects.order_by('-date', 'number')
     template_name = 'raw/council_question_list.html'
     paginate_by = 100
     
@@ -195,6 +195,9 @@ class ParsedModelInstanceList(ListView):
 
     def get_context_data(self, **kwargs):
         context = super(ParsedModelInstanceList, self).get_context_data(**kwargs)
+        # Show the corrected values of the objects on this page
+        payloads = override_resolver.get_payloads(self.get_model())
+        context['object_list'] = [override_resolver.apply(xx, payloads.get(xx.uid, {})) for xx in context['object_list']]
         context['model'] = self.get_model()
         context['model_name'] = context['model']._meta.verbose_name.capitalize()
         context['path'] = self.kwargs['model']
@@ -207,27 +210,16 @@ class ParsedModelInstanceList(ListView):
         # instances we need to re-activate
         ids_to_deactivate = request.POST.getlist('deactivate')
         ids_to_reactivate = set(request.POST.getlist('overrides')) - set(ids_to_deactivate)
+        mdl = self.get_model()
         if len(ids_to_deactivate) > 0:
-            # Get the models that we want to deactivate.  ORM will coerce to ints for us
-            mdl = self.get_model()
-            instances_to_deactivate = mdl.objects.filter(id__in=ids_to_deactivate)
-            deactivate = {'deactivate': True}
-            for instance in instances_to_deactivate:
-                override = Override.objects.get_or_create_from_reference(instance)
-                override.merge_payload(deactivate)
-                override.save()
+            # Get the uids of the models that we want to deactivate.  ORM will coerce to ints for us
+            uids = mdl.objects.filter(id__in=ids_to_deactivate).values_list('uid', flat=True)
+            Override.objects.merge_payloads(mdl, uids, {'deactivate': True})
 
         if len(ids_to_reactivate) > 0:
             # Re-activate any existing overrides
-            mdl = self.get_model()
-            instances_to_reactivate = mdl.objects.filter(id__in=ids_to_reactivate)
-            reactivate = {'deactivate': False}
-            for instance in instances_to_reactivate:
-                override = Override.objects.get_from_reference(instance)
-                if override is None:
-                    continue
-                override.merge_payload(reactivate)
-                override.save()
+            uids = mdl.objects.filter(id__in=ids_to_reactivate).values_list('uid', flat=True)
+            Override.objects.merge_payloads(mdl, uids, {'deactivate': False}, create=False)
 
         return redirect(request.META['HTTP_REFERER'])
 
@@ -249,7 +241,7 @@ class ParsedModelDetailView(TemplateView):
             form_kwargs = None
         else:
             # An override exists, so we load it up and use the data as the initial data
-            form_kwargs = {'initial': json.loads(override.data)}
+            form_kwargs = {'initial': override.get_payload()}
         form = OverrideForm.from_model(model_instance, form_kwargs)
         return self.render_to_response(self.get_context_data(form=form))
 
@@ -314,18 +306,11 @@ class ParsedModelDetailView(TemplateView):
             name = relation.get_accessor_name()
             objs = getattr(model, name)
             # We also need to find out which instances of this relation are already deactivated
-            # So we get the uids, get all the overrides for them, and then deserialize the payload to check
-            uids = [xx.uid for xx in objs.all()]
-            overrides = {xx.ref_uid: xx for xx in Override.objects.filter(ref_uid__in=uids)}
+            # The payloads of all of the overrides of the related model are loaded and decoded once
+            payloads = override_resolver.get_payloads(relation.model)
             objects = []
             for obj in objs.all():
-                uid = obj.uid
-                override = overrides.get(uid, None)
-                if override is not None:
-                    is_deactivated = override.get_payload().get('deactivate', False)
-                else:
-                    is_deactivated = False
-                objects.append((obj, is_deactivated))
+                objects.append((obj, is_deactivated(payloads.get(obj.uid, {}))))
             res.append({'name': name.capitalize(), 'model_name': relation.var_name, 'objects': objects})
         return res
 